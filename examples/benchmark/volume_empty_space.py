@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the effect of empty space skipping on the rendering time of sparse
+volumes, for every render method of the Volume visual.
+
+The synthetic volumes hold a number of small random blobs in an otherwise
+empty (zero) volume; the fraction of occupied voxels is printed with the
+results. Frames are rendered offscreen and the average time per frame is
+reported with and without skipping.
+"""
+import sys
+import time
+
+import numpy as np
+
+from vispy import app, scene
+from vispy.color import BaseColormap
+
+size = 256  # edge length of the volumes
+n_frames = 10
+canvas_size = (800, 800)
+
+
+class TranslucentHot(BaseColormap):
+    """Hot colormap whose opacity increases with the value, so that empty
+    space is transparent for translucent rendering
+    """
+    glsl_map = """
+    vec4 translucent_hot(float t) {
+        vec3 rgb = vec3(3.0 * t, 3.0 * t - 1.0, 3.0 * t - 2.0);
+        return vec4(clamp(rgb, 0.0, 1.0), clamp(t, 0.0, 1.0));
+    }
+    """
+
+    def map(self, t):
+        rgb = np.hstack([3 * t, 3 * t - 1, 3 * t - 2])
+        return np.hstack([np.clip(rgb, 0, 1), np.clip(t, 0, 1)])
+
+
+def sparse_volume(n_blobs, radius=6, seed=0):
+    """Volume of *n_blobs* gaussian blobs at random positions"""
+    rng = np.random.RandomState(seed)
+    vol = np.zeros((size, size, size), np.float32)
+    z, y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1,
+                       -radius:radius + 1]
+    blob = np.exp(-(x ** 2 + y ** 2 + z ** 2) / (radius / 2.) ** 2)
+    blob[blob < 0.05] = 0
+    for pos in rng.randint(0, size - 2 * radius - 1, (n_blobs, 3)):
+        sl = tuple(slice(p, p + 2 * radius + 1) for p in pos)
+        np.maximum(vol[sl], blob, out=vol[sl])
+    return vol
+
+
+def time_render(canvas):
+    canvas.render()  # compile and upload
+    t0 = time.time()
+    for i in range(n_frames):
+        canvas.render()
+    return (time.time() - t0) / n_frames
+
+
+def main():
+    canvas = scene.SceneCanvas(size=canvas_size, bgcolor='black',
+                               show=False)
+    view = canvas.central_widget.add_view()
+    view.camera = scene.TurntableCamera(fov=60, elevation=30, azimuth=30)
+    cmap = TranslucentHot()
+    print('%-12s %8s %10s %10s %8s'
+          % ('method', 'occupied', 'full (ms)', 'skip (ms)', 'speedup'))
+    for n_blobs in (10, 100, 1000):
+        vol = sparse_volume(n_blobs)
+        occupied = (vol > 0).mean()
+        for method in ('mip', 'translucent', 'additive', 'iso'):
+            times = []
+            for skip in (False, True):
+                volume = scene.visuals.Volume(
+                    vol, clim=(0, 1), method=method, threshold=0.5,
+                    cmap='hot' if method != 'translucent' else cmap,
+                    empty_space_skipping=skip,
+                    parent=view.scene)
+                view.camera.set_range()
+                times.append(time_render(canvas))
+                volume.parent = None
+            print('%-12s %7.2f%% %10.1f %10.1f %7.1fx'
+                  % (method, 100 * occupied, 1000 * times[0],
+                     1000 * times[1], times[0] / times[1]))
+            sys.stdout.flush()
+    canvas.close()
+
+
+if __name__ == '__main__':
+    app.create()
+    main()
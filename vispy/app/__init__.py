@@ -13,6 +13,7 @@ from __future__ import division
 from .application import Application  # noqa
 from ._default_app import use_app, create, run, quit, process_events  # noqa
 from .canvas import Canvas, MouseEvent, KeyEvent  # noqa
+from .frame_stats import FrameStats  # noqa
 from .inputhook import set_interactive  # noqa
 from .timer import Timer  # noqa
 from . import base  # noqa
@@ -15,7 +15,7 @@ from ..util import config as util_config
 from ..ext.six import string_types
 from . import Application, use_app
 from ..gloo.context import (GLContext, set_current_canvas, forget_canvas)
-from ..gloo import FrameBuffer, RenderBuffer
+from .frame_stats import FrameStats, TimedEmitter
 
 
 # todo: add functions for asking about current mouse/keyboard state
@@ -131,6 +131,7 @@ class Canvas(object):
         self._backend = None
         self._closed = False
         self._fps_window = 0.
+        self._frame_stats = None
         self._px_scale = int(px_scale)
 
         if dpi is None:
@@ -139,20 +140,27 @@ class Canvas(object):
             dpi = get_dpi(raise_error=False)
         self.dpi = dpi
 
-        # Create events
+        # Create events, the input and draw events can be timed
+        def timed(type, event_class):
+            return TimedEmitter(source=self, type=type,
+                                event_class=event_class)
         self.events = EmitterGroup(source=self,
                                    initialize=Event,
-                                   resize=ResizeEvent,
-                                   draw=DrawEvent,
-                                   mouse_press=MouseEvent,
-                                   mouse_release=MouseEvent,
-                                   mouse_double_click=MouseEvent,
-                                   mouse_move=MouseEvent,
-                                   mouse_wheel=MouseEvent,
-                                   key_press=KeyEvent,
-                                   key_release=KeyEvent,
-                                   stylus=Event,
-                                   touch=Event,
+                                   resize=timed('resize', ResizeEvent),
+                                   draw=timed('draw', DrawEvent),
+                                   mouse_press=timed('mouse_press',
+                                                     MouseEvent),
+                                   mouse_release=timed('mouse_release',
+                                                       MouseEvent),
+                                   mouse_double_click=timed(
+                                       'mouse_double_click', MouseEvent),
+                                   mouse_move=timed('mouse_move', MouseEvent),
+                                   mouse_wheel=timed('mouse_wheel',
+                                                     MouseEvent),
+                                   key_press=timed('key_press', KeyEvent),
+                                   key_release=timed('key_release', KeyEvent),
+                                   stylus=timed('stylus', Event),
+                                   touch=timed('touch', Event),
                                    close=Event)
 
         # Deprecated paint emitter
@@ -414,7 +422,12 @@ class Canvas(object):
         event : None
             Not used.
         """
-        self._backend._vispy_swap_buffers()
+        if self._frame_stats is None:
+            self._backend._vispy_swap_buffers()
+        else:
+            t0 = time()
+            self._backend._vispy_swap_buffers()
+            self._frame_stats._add_swap(time() - t0)
 
     def show(self, visible=True, run=False):
         """Show or hide the canvas
@@ -498,6 +511,48 @@ class Canvas(object):
         else:
             self._fps_callback = None
 
+    @property
+    def frame_stats(self):
+        """The FrameStats collector of this canvas, or None if frame
+        statistics are not being measured (see ``measure_frame_stats``).
+        """
+        return self._frame_stats
+
+    def measure_frame_stats(self, history=1000, jank_threshold=1. / 30,
+                            enabled=True):
+        """Measure frame timing statistics
+
+        Records, for each draw event, the time spent processing input
+        events since the previous frame, drawing and swapping the buffers,
+        in a rolling history. The statistics (percentiles, jank counts,
+        ...) can be queried from the returned ``FrameStats`` object, which
+        is also available as ``Canvas.frame_stats``. All the callbacks of
+        these events are timed, including those connected later. When
+        disabled, no timing hooks are called.
+
+        Parameters
+        ----------
+        history : int
+            Number of frames to keep in the rolling history. Default 1000.
+        jank_threshold : float
+            Frame time in seconds above which a frame is counted as janky.
+            Default is 1/30 s.
+        enabled : bool
+            If False, stop measuring and detach the current collector.
+
+        Returns
+        -------
+        stats : instance of FrameStats | None
+            The statistics collector, or None if disabled.
+        """
+        if self._frame_stats is not None:
+            self._frame_stats._detach()
+            self._frame_stats = None
+        if enabled:
+            self._frame_stats = FrameStats(history, jank_threshold)
+            self._frame_stats._attach(self)
+        return self._frame_stats
+
     # ---------------------------------------------------------------- misc ---
     def __repr__(self):
         return ('<%s (%s) at %s>'
@@ -530,15 +585,13 @@ class Canvas(object):
         """
         self.set_current()
         size = self.physical_size
-        fbo = FrameBuffer(color=RenderBuffer(size[::-1]),
-                          depth=RenderBuffer(size[::-1]))
-
-        try:
-            fbo.activate()
-            self.events.draw()
-            return fbo.read()
-        finally:
-            fbo.deactivate()
+        with self.context.shared.fbo_pool.lease(size[::-1]) as fbo:
+            try:
+                fbo.activate()
+                self.events.draw()
+                return fbo.read()
+            finally:
+                fbo.deactivate()
 
 
 # Event subclasses specific to the Canvas
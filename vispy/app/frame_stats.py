@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Frame timing statistics for a Canvas.
+
+A ``FrameStats`` object is attached to a canvas with
+``Canvas.measure_frame_stats()``. It records, for every emitted draw event,
+how long was spent processing input events since the previous frame, how
+long the draw handlers took and how long swapping the buffers took. The
+records are kept in a fixed-size ring buffer so that recording a frame
+does not allocate.
+
+The input and draw events of a canvas are emitted by ``TimedEmitter``
+instances, which call the timing hooks of the attached ``FrameStats``
+around all their callbacks, whenever these were connected.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from ..util.event import EventEmitter
+from ..util.ptime import time
+
+
+# Events whose handlers count as "event processing" time
+_INPUT_EVENTS = ('resize', 'mouse_press', 'mouse_release',
+                 'mouse_double_click', 'mouse_move', 'mouse_wheel',
+                 'key_press', 'key_release', 'stylus', 'touch')
+
+
+class TimedEmitter(EventEmitter):
+    """EventEmitter calling timing hooks around all its callbacks
+
+    The hooks are set by ``FrameStats`` when it is attached to a canvas.
+    They are also called when the emission is blocked.
+    """
+
+    def __init__(self, *args, **kwargs):
+        EventEmitter.__init__(self, *args, **kwargs)
+        self._begin = self._end = None
+
+    def __call__(self, *args, **kwargs):
+        if self._begin is None:
+            return EventEmitter.__call__(self, *args, **kwargs)
+        self._begin()
+        try:
+            return EventEmitter.__call__(self, *args, **kwargs)
+        finally:
+            self._end()
+
+
+class FrameStats(object):
+    """Rolling frame timing statistics
+
+    Parameters
+    ----------
+    history : int
+        Number of frames kept in the rolling history. Default 1000.
+    jank_threshold : float
+        Frame time (in seconds) above which a frame is counted as janky.
+        Default is 1/30 s, i.e. two refreshes of a 60 Hz display.
+
+    Notes
+    -----
+    The history is a structured array with the following fields (all in
+    seconds):
+
+        * start : time at which the frame started drawing
+        * interval : time since the start of the previous frame
+          (NaN for the first frame)
+        * events : time spent in input event handlers since the previous
+          frame
+        * draw : time spent in draw handlers, excluding the swap
+        * swap : time spent swapping the buffers
+        * total : events + draw + swap
+    """
+
+    dtype = np.dtype([('start', np.float64), ('interval', np.float64),
+                      ('events', np.float64), ('draw', np.float64),
+                      ('swap', np.float64), ('total', np.float64)])
+
+    def __init__(self, history=1000, jank_threshold=1. / 30):
+        history = int(history)
+        if history < 1:
+            raise ValueError('history must be at least 1, got %s' % history)
+        self._data = np.zeros(history, dtype=self.dtype)
+        self.jank_threshold = jank_threshold
+        self._canvas = None
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded frames"""
+        self._index = 0
+        self._count = 0
+        self._jank_count = 0
+        self._last_start = None
+        self._frame_start = None
+        self._event_start = None
+        self._event_depth = 0
+        self._event_time = 0.
+        self._swap_time = 0.
+
+    @property
+    def jank_threshold(self):
+        """Frame time (in seconds) above which a frame counts as janky"""
+        return self._jank_threshold
+
+    @jank_threshold.setter
+    def jank_threshold(self, threshold):
+        threshold = float(threshold)
+        if threshold <= 0:
+            raise ValueError('jank_threshold must be positive')
+        self._jank_threshold = threshold
+
+    @property
+    def capacity(self):
+        """Maximum number of frames kept in the history"""
+        return len(self._data)
+
+    @property
+    def frame_count(self):
+        """Total number of frames recorded since the last reset"""
+        return self._count
+
+    @property
+    def jank_count(self):
+        """Total number of janky frames recorded since the last reset"""
+        return self._jank_count
+
+    @property
+    def history(self):
+        """Structured array of the recorded frames, oldest first"""
+        n = min(self._count, len(self._data))
+        if self._count <= len(self._data):
+            return self._data[:n].copy()
+        return np.roll(self._data, -self._index)
+
+    def percentile(self, q, field='total'):
+        """Percentile(s) of a timing field over the history
+
+        Parameters
+        ----------
+        q : float | array-like
+            Percentile(s) in the range [0, 100].
+        field : str
+            The field of the history to use. Default is 'total'.
+
+        Returns
+        -------
+        value : float | ndarray
+            The percentile(s) in seconds, NaN if no frames were recorded.
+        """
+        if field not in self.dtype.names:
+            raise ValueError('field must be one of %s, not %r'
+                             % (self.dtype.names, field))
+        values = self.history[field]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        return np.percentile(values, q)
+
+    def summary(self):
+        """Summarize the frames currently in the history
+
+        Returns
+        -------
+        summary : dict
+            Dictionary with the number of frames (``n_frames``), the
+            average frame rate (``fps``), the 50th, 95th and 99th
+            percentiles of the frame time (``p50``, ``p95``, ``p99``), the
+            number of janky frames in the history (``jank``), and the mean
+            time spent in event processing, drawing and swapping
+            (``events``, ``draw``, ``swap``). Times are in seconds.
+        """
+        hist = self.history
+        out = dict(n_frames=len(hist), fps=0., jank=0)
+        if len(hist) == 0:
+            for key in ('p50', 'p95', 'p99', 'events', 'draw', 'swap'):
+                out[key] = np.nan
+            return out
+        intervals = hist['interval'][~np.isnan(hist['interval'])]
+        if len(intervals) > 0 and intervals.sum() > 0:
+            out['fps'] = len(intervals) / intervals.sum()
+        p50, p95, p99 = np.percentile(hist['total'], [50, 95, 99])
+        out.update(p50=p50, p95=p95, p99=p99,
+                   jank=int((hist['total'] > self._jank_threshold).sum()),
+                   events=hist['events'].mean(), draw=hist['draw'].mean(),
+                   swap=hist['swap'].mean())
+        return out
+
+    # ------------------------------------------------------------- hooks ---
+    def _attach(self, canvas):
+        """Set the timing hooks of the events of a canvas"""
+        self._canvas = canvas
+        for name in _INPUT_EVENTS:
+            emitter = canvas.events[name]
+            emitter._begin, emitter._end = self._begin_events, self._end_events
+        emitter = canvas.events.draw
+        emitter._begin, emitter._end = self._begin_frame, self._end_frame
+
+    def _detach(self):
+        """Remove the timing hooks from the canvas"""
+        canvas, self._canvas = self._canvas, None
+        if canvas is None:
+            return
+        for name in _INPUT_EVENTS + ('draw',):
+            emitter = canvas.events[name]
+            emitter._begin = emitter._end = None
+
+    def _begin_events(self):
+        if self._event_depth == 0:
+            self._event_start = time()
+        self._event_depth += 1
+
+    def _end_events(self):
+        self._event_depth = max(self._event_depth - 1, 0)
+        if self._event_depth == 0 and self._event_start is not None:
+            self._event_time += time() - self._event_start
+            self._event_start = None
+
+    def _add_swap(self, duration):
+        self._swap_time += duration
+
+    def _begin_frame(self):
+        self._frame_start = time()
+        self._swap_time = 0.
+
+    def _end_frame(self):
+        if self._frame_start is None:
+            return
+        now = time()
+        start, self._frame_start = self._frame_start, None
+        swap = self._swap_time
+        draw = max(now - start - swap, 0.)
+        events = self._event_time
+        self._event_time = 0.
+        if self._last_start is None:
+            interval = np.nan
+        else:
+            interval = start - self._last_start
+        self._last_start = start
+        total = events + draw + swap
+
+        self._data[self._index] = (start, interval, events, draw, swap, total)
+        self._index = (self._index + 1) % len(self._data)
+        self._count += 1
+        if total > self._jank_threshold:
+            self._jank_count += 1
+
+    def __repr__(self):
+        return ('<%s with %d frames (%d janky) at %s>'
+                % (self.__class__.__name__, self._count, self._jank_count,
+                   hex(id(self))))
@@ -385,6 +385,53 @@ def test_event_order():
         gc.collect()
 
 
+@requires_application()
+def test_frame_stats():
+    """Test frame timing statistics"""
+    with Canvas(size=(20, 20)) as c:
+        assert_is(c.frame_stats, None)
+        stats = c.measure_frame_stats(history=4, jank_threshold=1e-9)
+        assert_is(c.frame_stats, stats)
+        assert_equal(stats.frame_count, 0)
+        assert_true(np.isnan(stats.summary()['p50']))
+        for _ in range(6):
+            c.events.mouse_move(pos=(1, 1))
+            c.events.draw()
+        assert_equal(stats.frame_count, 6)
+        assert_equal(stats.jank_count, 6)
+        hist = stats.history
+        assert_equal(len(hist), 4)
+        assert_true(np.all(np.diff(hist['start']) >= 0))
+        assert_true(np.all(hist['events'] >= 0))
+        assert_true(np.all(hist['swap'] >= 0))
+        assert_array_equal(hist['total'],
+                           hist['events'] + hist['draw'] + hist['swap'])
+        summary = stats.summary()
+        assert_equal(summary['n_frames'], 4)
+        assert_equal(summary['jank'], 4)
+        assert_true(summary['p50'] <= summary['p95'] <= summary['p99'])
+        assert_equal(len(stats.percentile([50, 99])), 2)
+        assert_raises(ValueError, stats.percentile, 50, 'foo')
+
+        # the handlers connected afterwards are timed
+        @c.events.mouse_move.connect
+        @c.events.draw.connect
+        def slow(event):
+            sleep(0.02)
+        c.events.mouse_move(pos=(1, 1))
+        c.events.draw()
+        assert_true(stats.history['events'][-1] >= 0.02)
+        assert_true(stats.history['draw'][-1] >= 0.02)
+        c.events.draw.disconnect(slow)
+        c.events.mouse_move.disconnect(slow)
+
+        # disabling removes the hooks
+        assert_is(c.measure_frame_stats(enabled=False), None)
+        assert_equal('swap_buffers', c.events.draw.callback_refs[-1])
+        c.events.draw()
+        assert_equal(stats.frame_count, 7)
+
+
 def test_abstract():
     """Test app abstract template"""
     app = BaseApplicationBackend()
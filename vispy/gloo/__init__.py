@@ -52,5 +52,5 @@ from .globject import GLObject  # noqa
 from .buffer import VertexBuffer, IndexBuffer  # noqa
 from .texture import Texture1D, Texture2D, TextureAtlas, Texture3D, TextureCube, TextureEmulated3D  # noqa
 from .program import Program  # noqa
-from .framebuffer import FrameBuffer, RenderBuffer  # noqa
+from .framebuffer import FrameBuffer, RenderBuffer, FrameBufferPool  # noqa
 from . import util  # noqa
@@ -208,6 +208,7 @@ class GLShared(object):
         self._parser = parser_cls()
         self._name = None
         self._refs = []
+        self._fbo_pool = None
     
     def __repr__(self):
         return "<GLShared of %s backend at 0x%x>" % (str(self.name), id(self))
@@ -222,6 +223,16 @@ class GLShared(object):
         assert isinstance(parser, BaseGlirParser) or parser is None
         self._parser = parser
     
+    @property
+    def fbo_pool(self):
+        """The pool of reusable framebuffers for this namespace (see
+        `FrameBufferPool`)
+        """
+        if self._fbo_pool is None:
+            from .framebuffer import FrameBufferPool
+            self._fbo_pool = FrameBufferPool()
+        return self._fbo_pool
+
     def add_ref(self, name, ref):
         """ Add a reference for the backend object that gives access
         to the low level context. Used in vispy.app.canvas.backends.
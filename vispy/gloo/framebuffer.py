@@ -4,6 +4,8 @@
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
 # -----------------------------------------------------------------------------
 
+from contextlib import contextmanager
+
 from .globject import GLObject
 from .texture import Texture2D
 from .wrappers import _check_valid, read_pixels
@@ -261,3 +263,202 @@ class FrameBuffer(GLObject):
         # todo: this is ostensibly required, but not available in gloo.gl
         #gl.glReadBuffer(buffer._target)
         return read_pixels(crop, alpha=alpha, mode=mode)
+
+
+# --------------------------------------------------- FrameBufferPool class ---
+
+# Bytes per channel of texture internal formats, for memory accounting
+_CHANNEL_BYTES = {'8': 1, '16': 2, '16f': 2, '32f': 4}
+
+
+class FrameBufferPool(object):
+    """ Pool of reusable framebuffers
+
+    Creating a FrameBuffer and its attachments for each offscreen render
+    causes GLIR CREATE/SIZE/DELETE traffic and GPU allocations every time.
+    This pool hands out framebuffers by shape and attachments, and keeps
+    released framebuffers around so that later requests with the same
+    configuration can reuse them. Idle framebuffers are deleted in least
+    recently used order when the pool exceeds its memory budget or its
+    maximum number of idle framebuffers.
+
+    Each GL context namespace has its own pool, available as
+    ``canvas.context.shared.fbo_pool``.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Approximate amount of GPU memory (in bytes) that the framebuffers
+        of the pool may use before idle framebuffers are evicted.
+        Default 256 MiB.
+    max_idle : int
+        Maximum number of idle framebuffers kept. Default 8.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, max_idle=8):
+        self.max_bytes = int(max_bytes)
+        self.max_idle = int(max_idle)
+        self._idle = []  # (key, fbo, nbytes), least recently used first
+        self._leased = {}  # id(fbo) -> (key, fbo, nbytes)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self):
+        """ Approximate GPU memory used by the framebuffers of the pool,
+        both leased and idle.
+        """
+        return (sum(item[2] for item in self._idle) +
+                sum(item[2] for item in self._leased.values()))
+
+    @property
+    def n_idle(self):
+        """ Number of idle framebuffers in the pool """
+        return len(self._idle)
+
+    @property
+    def n_leased(self):
+        """ Number of framebuffers currently handed out """
+        return len(self._leased)
+
+    def acquire(self, shape, color='renderbuffer', format=None, depth=True,
+                stencil=False):
+        """ Get a framebuffer from the pool
+
+        The framebuffer must be given back with `release` when it is no
+        longer used, or obtained with `lease` instead.
+
+        Parameters
+        ----------
+        shape : tuple
+            The shape (h, w) of the framebuffer.
+        color : {'renderbuffer', 'texture', None}
+            The type of color attachment. Texture attachments use nearest
+            interpolation and clamp-to-edge wrapping.
+        format : str | None
+            The format of a texture color attachment, e.g. 'rgba' (default)
+            or an internal format such as 'rgba32f'.
+        depth : bool
+            Whether to attach a depth render buffer.
+        stencil : bool
+            Whether to attach a stencil render buffer.
+
+        Returns
+        -------
+        fbo : instance of FrameBuffer
+            The framebuffer. Its contents are undefined.
+        """
+        shape = tuple(int(s) for s in shape[:2])
+        if len(shape) != 2 or min(shape) < 1:
+            raise ValueError('shape must be a 2-element tuple of positive '
+                             'integers, not %r' % (shape,))
+        if color not in ('renderbuffer', 'texture', None):
+            raise ValueError('color must be "renderbuffer", "texture" or '
+                             'None, not %r' % (color,))
+        if color == 'texture':
+            format = 'rgba' if format is None else format
+            if format not in Texture2D._inv_internalformats:
+                raise ValueError('Invalid texture format %r' % (format,))
+        key = (shape, color, format, bool(depth), bool(stencil))
+
+        # Most recently used match first
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i][0] == key:
+                item = self._idle.pop(i)
+                self._leased[id(item[1])] = item
+                self.hits += 1
+                return item[1]
+
+        self.misses += 1
+        nbytes = self._estimate_nbytes(key)
+        self._evict(self.max_bytes - nbytes, len(self._idle))
+        fbo = self._create(key)
+        self._leased[id(fbo)] = (key, fbo, nbytes)
+        return fbo
+
+    def release(self, fbo):
+        """ Give a framebuffer obtained with `acquire` back to the pool
+
+        Parameters
+        ----------
+        fbo : instance of FrameBuffer
+            The framebuffer.
+        """
+        try:
+            item = self._leased.pop(id(fbo))
+        except KeyError:
+            raise ValueError('%r was not acquired from this pool' % (fbo,))
+        self._idle.append(item)
+        self._evict(self.max_bytes, self.max_idle)
+
+    @contextmanager
+    def lease(self, *args, **kwargs):
+        """ Context manager that acquires a framebuffer and releases it on
+        exit. Takes the same arguments as `acquire`.
+        """
+        fbo = self.acquire(*args, **kwargs)
+        try:
+            yield fbo
+        finally:
+            self.release(fbo)
+
+    def trim(self, max_bytes=0):
+        """ Delete idle framebuffers until the pool uses at most *max_bytes*
+
+        Parameters
+        ----------
+        max_bytes : int
+            The memory budget to trim to. By default all idle framebuffers
+            are deleted.
+        """
+        self._evict(max_bytes, self.max_idle)
+
+    def _evict(self, max_bytes, max_idle):
+        nbytes = self.nbytes
+        while self._idle and (nbytes > max_bytes or
+                              len(self._idle) > max_idle):
+            key, fbo, size = self._idle.pop(0)
+            nbytes -= size
+            for buf in (fbo.color_buffer, fbo.depth_buffer,
+                        fbo.stencil_buffer):
+                if buf is not None:
+                    buf.delete()
+            fbo.delete()
+
+    @staticmethod
+    def _estimate_nbytes(key):
+        shape, color, format, depth, stencil = key
+        if color == 'renderbuffer':
+            nbytes = 4
+        elif color == 'texture':
+            suffix = format[len(format.rstrip('0123456789f')):]
+            nbytes = (Texture2D._inv_internalformats.get(format, 4) *
+                      _CHANNEL_BYTES.get(suffix, 1))
+        else:
+            nbytes = 0
+        nbytes += 4 * depth + stencil
+        return shape[0] * shape[1] * nbytes
+
+    @staticmethod
+    def _create(key):
+        shape, color, format, depth, stencil = key
+        if color == 'renderbuffer':
+            color = RenderBuffer(shape)
+        elif color == 'texture':
+            if format in Texture2D._inv_formats:
+                tex_format, internalformat = format, None
+            else:
+                tex_format, internalformat = None, format
+            nchannels = Texture2D._inv_internalformats[format]
+            color = Texture2D(shape + (nchannels,), format=tex_format,
+                              internalformat=internalformat,
+                              interpolation='nearest',
+                              wrapping='clamp_to_edge')
+        depth = RenderBuffer(shape) if depth else None
+        stencil = RenderBuffer(shape) if stencil else None
+        return FrameBuffer(color=color, depth=depth, stencil=stencil)
+
+    def __repr__(self):
+        return ('<%s with %d leased and %d idle framebuffers at 0x%x>'
+                % (self.__class__.__name__, len(self._leased),
+                   len(self._idle), id(self)))
@@ -273,7 +273,9 @@ Applies to: Texture2D, Texture3D
 
 Set the interpolation mode of the texture for minification and
 magnification. The min and mag argument can both be either 'nearest' or
-'linear'.
+'linear'. The min argument can also be a mipmap filter, e.g.
+'linear_mipmap_linear', in which case the mipmaps are generated whenever
+data is set.
 
 ATTACH
 ~~~~~~
@@ -666,6 +668,7 @@ class BaseGlirParser(object):
         self.capabilities = dict(
             gl_version='Unknown',
             max_texture_size=None,
+            max_renderbuffer_size=None,
         )
 
     def is_remote(self):
@@ -839,6 +842,8 @@ class GlirParser(BaseGlirParser):
             self.capabilities['gl_version'] = gl.glGetParameter(gl.GL_VERSION)
             self.capabilities['max_texture_size'] = \
                 gl.glGetParameter(gl.GL_MAX_TEXTURE_SIZE)
+            self.capabilities['max_renderbuffer_size'] = \
+                gl.glGetParameter(gl.GL_MAX_RENDERBUFFER_SIZE)
             this_version = self.capabilities['gl_version'].split(' ')
             if this_version[0] == "OpenGL":
                 # For OpenGL ES, the version string has the format:
@@ -1421,6 +1426,7 @@ class GlirTexture(GlirObject):
     def create(self):
         self._handle = gl.glCreateTexture()
         self._shape_formats = 0  # To make setting size cheap
+        self._mipmap = False
 
     def delete(self):
         gl.glDeleteTexture(self._handle)
@@ -1467,6 +1473,17 @@ class GlirTexture(GlirObject):
         min, mag = as_enum(min), as_enum(mag)
         gl.glTexParameterf(self._target, gl.GL_TEXTURE_MIN_FILTER, min)
         gl.glTexParameterf(self._target, gl.GL_TEXTURE_MAG_FILTER, mag)
+        self._mipmap = min in (gl.GL_NEAREST_MIPMAP_NEAREST,
+                               gl.GL_LINEAR_MIPMAP_NEAREST,
+                               gl.GL_NEAREST_MIPMAP_LINEAR,
+                               gl.GL_LINEAR_MIPMAP_LINEAR)
+        if self._shape_formats:
+            self.update_mipmap()
+
+    def update_mipmap(self):
+        """Regenerate the mipmaps from the base level, if used"""
+        if self._mipmap:
+            gl.glGenerateMipmap(self._target)
 
 # these should be auto generated in _constants.py. But that doesn't seem
 # to be happening. TODO - figure out why the C parser in (createglapi.py)
@@ -1511,6 +1528,7 @@ class GlirTexture1D(GlirTexture):
         # Set alignment back
         if alignment != 4:
             gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        self.update_mipmap()
 
 
 class GlirTexture2D(GlirTexture):
@@ -1544,6 +1562,7 @@ class GlirTexture2D(GlirTexture):
         # Set alignment back
         if alignment != 4:
             gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        self.update_mipmap()
 
 
 GL_SAMPLER_3D = gl.Enum('GL_SAMPLER_3D', 35679)
@@ -1632,8 +1651,7 @@ class GlirTexture3D(GlirTexture):
         if gtype is None:
             raise ValueError("Type not allowed for texture")
         # Set alignment (width is nbytes_per_pixel * npixels_per_line)
-        alignment = self._get_alignment(data.shape[-3] *
-                                        data.shape[-2] * data.shape[-1])
+        alignment = self._get_alignment(data.shape[-2] * data.shape[-1])
         if alignment != 4:
             gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, alignment)
         # Upload
@@ -1641,6 +1659,7 @@ class GlirTexture3D(GlirTexture):
         # Set alignment back
         if alignment != 4:
             gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        self.update_mipmap()
 
 
 class GlirTextureCube(GlirTexture):
@@ -471,8 +471,9 @@ class Program(GLObject):
         mode : str | GL_ENUM
             'points', 'lines', 'line_strip', 'line_loop', 'triangles',
             'triangle_strip', or 'triangle_fan'.
-        indices : array
-            Array of indices to draw.
+        indices : IndexBuffer | tuple | None
+            The indices of the vertices to draw, the (first, count) range
+            of the vertices to draw, or None to draw all the vertices.
         check_error:
             Check error after draw.
 
@@ -521,13 +522,17 @@ class Program(GLObject):
                        np.dtype(np.uint32): 'UNSIGNED_INT'}
             selection = indices.id, gltypes[indices.dtype], indices.size
             canvas.context.glir.command('DRAW', self._id, mode, selection)
-        elif indices is None:
-            selection = 0, attributes[0].size
+        elif indices is None or isinstance(indices, tuple):
+            selection = (0, attributes[0].size) if indices is None else \
+                tuple(int(i) for i in indices)
+            if len(selection) != 2:
+                raise ValueError('the range of vertices to draw must be '
+                                 '(first, count), not %r' % (indices,))
             logger.debug("Program drawing %r with %r" % (mode, selection))
             canvas.context.glir.command('DRAW', self._id, mode, selection)
         else:
-            raise TypeError("Invalid index: %r (must be IndexBuffer)" %
-                            indices)
+            raise TypeError("Invalid index: %r (must be IndexBuffer or "
+                            "tuple)" % indices)
 
         # Process GLIR commands
         canvas.context.flush_commands()
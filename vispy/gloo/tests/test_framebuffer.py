@@ -3,7 +3,7 @@
 from vispy.testing import run_tests_if_main, assert_raises
 
 from vispy import gloo
-from vispy.gloo import FrameBuffer, RenderBuffer
+from vispy.gloo import FrameBuffer, RenderBuffer, FrameBufferPool
 
 
 def test_renderbuffer():
@@ -192,4 +192,50 @@ def test_framebuffer():
     assert_raises(ValueError, F. resize, 'FOO')
 
 
+def test_framebuffer_pool():
+    pool = FrameBufferPool(max_bytes=100 * 100 * 8, max_idle=2)
+    F1 = pool.acquire((10, 20))
+    assert F1.shape == (10, 20)
+    assert isinstance(F1.color_buffer, RenderBuffer)
+    assert F1.depth_buffer is not None and F1.stencil_buffer is None
+    assert (pool.n_leased, pool.n_idle, pool.misses) == (1, 0, 1)
+    assert pool.nbytes == 10 * 20 * 8
+
+    # Released framebuffers are reused for the same configuration only
+    pool.release(F1)
+    assert (pool.n_leased, pool.n_idle) == (0, 1)
+    assert pool.acquire((10, 20)) is F1
+    assert pool.hits == 1
+    F2 = pool.acquire((10, 20))
+    assert F2 is not F1
+    with pool.lease((10, 20), depth=False) as F3:
+        assert F3 is not F1 and F3 is not F2
+        assert F3.depth_buffer is None
+    assert pool.n_idle == 1
+    assert_raises(ValueError, pool.release, F3)
+    assert_raises(ValueError, pool.acquire, (0, 10))
+    assert_raises(ValueError, pool.acquire, (10, 10), color='foo')
+    assert_raises(ValueError, pool.acquire, (10, 10), color='texture',
+                  format='foo')
+
+    # Texture attachments
+    with pool.lease((10, 20), color='texture', depth=False) as F4:
+        assert isinstance(F4.color_buffer, gloo.Texture2D)
+        assert F4.color_buffer.shape == (10, 20, 4)
+    with pool.lease((10, 20), color='texture', format='r32f') as F5:
+        assert F5.color_buffer.shape == (10, 20, 1)
+        assert F5.color_buffer._internalformat == 'r32f'
+
+    # LRU eviction by number of idle framebuffers and by memory budget
+    pool.release(F1)
+    pool.release(F2)
+    assert pool.n_idle == 2
+    big = pool.acquire((100, 100))
+    assert pool.n_idle == 0  # evicted to make room
+    assert not hasattr(F1, '_glir')
+    pool.release(big)
+    pool.trim()
+    assert pool.n_idle == 0 and pool.nbytes == 0
+
+
 run_tests_if_main()
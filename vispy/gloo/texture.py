@@ -13,6 +13,10 @@ from .globject import GLObject
 from ..ext.six import string_types
 from .util import check_enum
 
+# Minification filters using mipmaps
+_mipmap_interpolations = ('nearest_mipmap_nearest', 'linear_mipmap_nearest',
+                          'nearest_mipmap_linear', 'linear_mipmap_linear')
+
 
 # ----------------------------------------------------------- Texture class ---
 class BaseTexture(GLObject):
@@ -32,9 +36,10 @@ class BaseTexture(GLObject):
         When the data has one channel, 'luminance' is assumed.
     resizable : bool
         Indicates whether texture can be resized. Default True.
-    interpolation : str | None
-        Interpolation mode, must be one of: 'nearest', 'linear'.
-        Default 'nearest'.
+    interpolation : str | tuple | None
+        Interpolation mode, must be one of: 'nearest', 'linear', or a
+        (minification, magnification) tuple, see the `interpolation`
+        property. Default 'nearest'.
     wrapping : str | None
         Wrapping mode, must be one of: 'repeat', 'clamp_to_edge',
         'mirrored_repeat'. Default 'clamp_to_edge'.
@@ -178,7 +183,13 @@ class BaseTexture(GLObject):
 
     @property
     def interpolation(self):
-        """ Texture interpolation for minification and magnification. """
+        """ Texture interpolation for minification and magnification.
+
+        Either 'nearest' or 'linear' for both, or a (min, mag) tuple. The
+        minification can also use mipmaps, which are generated when the
+        data is set: 'nearest_mipmap_nearest', 'linear_mipmap_nearest',
+        'nearest_mipmap_linear' or 'linear_mipmap_linear' (trilinear).
+        """
         value = self._interpolation
         return value[0] if value[0] == value[1] else value
 
@@ -194,7 +205,8 @@ class BaseTexture(GLObject):
             raise ValueError('Invalid value for interpolation: %r' % value)
         # Check and set
         valid = 'nearest', 'linear'
-        value = (check_enum(value[0], 'tex interpolation', valid),
+        value = (check_enum(value[0], 'tex interpolation',
+                            valid + _mipmap_interpolations),
                  check_enum(value[1], 'tex interpolation', valid))
         self._interpolation = value
         self._glir.command('INTERPOLATION', self._id, *value)
@@ -400,9 +412,10 @@ class Texture1D(BaseTexture):
         When the data has one channel, 'luminance' is assumed.
     resizable : bool
         Indicates whether texture can be resized. Default True.
-    interpolation : str | None
-        Interpolation mode, must be one of: 'nearest', 'linear'.
-        Default 'nearest'.
+    interpolation : str | tuple | None
+        Interpolation mode, must be one of: 'nearest', 'linear', or a
+        (minification, magnification) tuple, see the `interpolation`
+        property. Default 'nearest'.
     wrapping : str | None
         Wrapping mode, must be one of: 'repeat', 'clamp_to_edge',
         'mirrored_repeat'. Default 'clamp_to_edge'.
@@ -532,9 +545,10 @@ class Texture3D(BaseTexture):
         When the data has one channel, 'luminance' is assumed.
     resizable : bool
         Indicates whether texture can be resized. Default True.
-    interpolation : str | None
-        Interpolation mode, must be one of: 'nearest', 'linear'.
-        Default 'nearest'.
+    interpolation : str | tuple | None
+        Interpolation mode, must be one of: 'nearest', 'linear', or a
+        (minification, magnification) tuple, see the `interpolation`
+        property. Default 'nearest'.
     wrapping : str | None
         Wrapping mode, must be one of: 'repeat', 'clamp_to_edge',
         'mirrored_repeat'. Default 'clamp_to_edge'.
@@ -606,9 +620,10 @@ class TextureCube(BaseTexture):
         When the data has one channel, 'luminance' is assumed.
     resizable : bool
         Indicates whether texture can be resized. Default True.
-    interpolation : str | None
-        Interpolation mode, must be one of: 'nearest', 'linear'.
-        Default 'nearest'.
+    interpolation : str | tuple | None
+        Interpolation mode, must be one of: 'nearest', 'linear', or a
+        (minification, magnification) tuple, see the `interpolation`
+        property. Default 'nearest'.
     wrapping : str | None
         Wrapping mode, must be one of: 'repeat', 'clamp_to_edge',
         'mirrored_repeat'. Default 'clamp_to_edge'.
@@ -683,9 +698,10 @@ class TextureEmulated3D(Texture2D):
         When the data has one channel, 'luminance' is assumed.
     resizable : bool
         Indicates whether texture can be resized. Default True.
-    interpolation : str | None
-        Interpolation mode, must be one of: 'nearest', 'linear'.
-        Default 'nearest'.
+    interpolation : str | tuple | None
+        Interpolation mode, must be one of: 'nearest', 'linear', or a
+        (minification, magnification) tuple, see the `interpolation`
+        property. Default 'nearest'.
     wrapping : str | None
         Wrapping mode, must be one of: 'repeat', 'clamp_to_edge',
         'mirrored_repeat'. Default 'clamp_to_edge'.
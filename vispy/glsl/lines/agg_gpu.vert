@@ -0,0 +1,53 @@
+// Computes the attributes of agg.vert from the vertices of the line, read
+// from a texture, instead of baking them on the CPU. Each corner of the
+// quad of a segment looks up the vertices around it.
+// This is appended to agg.vert, whose attributes are made global
+// variables and whose main() is renamed agg_main().
+
+uniform sampler2D u_vertices;  // x, y and distance along the line
+uniform sampler2D u_colors;
+uniform vec2 u_vertices_shape;  // (width, height) of the textures
+uniform vec2 u_colors_shape;
+uniform float u_n_vertices;
+uniform float u_length;
+
+attribute vec3 a_corner;  // index of the vertex, then texcoords
+
+#include "misc/texel.glsl"
+
+vec4 vertex(float i) {
+    return texel(u_vertices, u_vertices_shape,
+                 clamp(i, 0.0, u_n_vertices - 1.0));
+}
+
+// The tangents before and after the vertex i, which are the same at the
+// ends of the line
+vec4 tangents(float i) {
+    vec2 curr = vertex(i).xy;
+    vec2 t1 = curr - vertex(i - 1.0).xy;
+    vec2 t2 = vertex(i + 1.0).xy - curr;
+    if (i <= 0.0) t1 = t2;
+    if (i >= u_n_vertices - 1.0) t2 = t1;
+    return vec4(t1, t2);
+}
+
+float tangents_angle(vec4 t) {
+    return atan(t.x * t.w - t.y * t.z, t.x * t.z + t.y * t.w);
+}
+
+void main() {
+    float i = a_corner.x;
+    // the segment starts at the vertex i or ends at it
+    float k = a_corner.y < 0.0 ? i : i - 1.0;
+
+    a_position = vertex(i).xy;
+    a_tangents = tangents(i);
+    a_segment = vec2(vertex(k).z, vertex(k + 1.0).z);
+    a_angles = vec2(tangents_angle(tangents(k)),
+                    tangents_angle(tangents(k + 1.0)));
+    a_texcoord = a_corner.yz;
+    alength = u_length;
+    color = texel(u_colors, u_colors_shape,
+                  min(i, u_colors_shape.x * u_colors_shape.y - 1.0));
+    agg_main();
+}
@@ -0,0 +1,11 @@
+// ----------------------------------------------------------------------------
+// Copyright (c) Vispy Development Team. All Rights Reserved.
+// Distributed under the (new) BSD License.
+// ----------------------------------------------------------------------------
+
+// The item i of an array stored row after row in a texture of size shape
+vec4 texel(sampler2D tex, vec2 shape, float i)
+{
+    float row = floor((i + 0.5) / shape.x);
+    return texture2D(tex, (vec2(i - row * shape.x, row) + 0.5) / shape);
+}
@@ -7,7 +7,6 @@ from __future__ import division
 import weakref
 import numpy as np
 
-from .. import gloo
 from .. import app
 from .visuals import VisualNode
 from ..visuals.transforms import TransformSystem
@@ -15,6 +14,7 @@ from ..color import Color
 from ..util import logger, Frozen
 from ..util.profiler import Profiler
 from .subscene import SubScene
+from .capture import FrameCapture
 from .events import SceneMouseEvent
 from .widgets import Widget
 
@@ -241,7 +241,12 @@ class SceneCanvas(app.Canvas, Frozen):
         image : array
             Numpy array of type ubyte and shape (h, w, 4). Index [0, 0] is the 
             upper-left corner of the rendered region.
-        
+
+        Notes
+        -----
+        If *size* exceeds the maximum renderbuffer size supported by the
+        OpenGL implementation (and no *crop* is given), the image is
+        rendered in tiles with `render_tiled`.
         """
         self.set_current()
         # Set up a framebuffer to render to
@@ -249,16 +254,157 @@ class SceneCanvas(app.Canvas, Frozen):
         csize = self.size if region is None else region[2:]
         s = self.pixel_scale
         size = tuple([x * s for x in csize]) if size is None else size
-        fbo = gloo.FrameBuffer(color=gloo.RenderBuffer(size[::-1]),
-                               depth=gloo.RenderBuffer(size[::-1]))
+        max_size = self.context.shared.parser.capabilities.get(
+            'max_renderbuffer_size')
+        if crop is None and max_size and max(size) > max_size:
+            return self.render_tiled(size, region=region, bgcolor=bgcolor)
+        with self.context.shared.fbo_pool.lease(size[::-1]) as fbo:
+            return self._render_fbo(fbo, offset, csize, bgcolor=bgcolor,
+                                    crop=crop)
+
+    def render_tiled(self, size, region=None, tile_size=None, bgcolor=None,
+                     alpha=True, out=None):
+        """Render the scene tile by tile and return the image array.
+
+        This allows rendering images that are larger than the maximum
+        renderbuffer size supported by the OpenGL implementation, while
+        bounding the GPU memory used: a single framebuffer of *tile_size*
+        (from the framebuffer pool of the context) is reused for all
+        tiles, and the pixels of each tile are written into *out* as soon
+        as the tile is drawn.
+
+        Parameters
+        ----------
+        size : tuple
+            The size (w, h) of the image to render.
+        region : tuple | None
+            Specifies the region of the canvas to render. Format is
+            (x, y, w, h). By default, the entire canvas is rendered.
+        tile_size : int | tuple | None
+            The size (w, h) of the tiles. By default 2048, or the maximum
+            renderbuffer size if that is smaller.
+        bgcolor : instance of Color | None
+            The background color to use.
+        alpha : bool
+            If True (default), return an RGBA image. Otherwise RGB.
+        out : array | None
+            Array of type ubyte and shape (h, w, 4) (or (h, w, 3) if alpha
+            is False) to write the image into, e.g. a ``np.memmap``. If None,
+            a new array is allocated.
+
+        Returns
+        -------
+        image : array
+            Numpy array of type ubyte and shape (h, w, 4). Index [0, 0] is
+            the upper-left corner of the rendered region.
+        """
+        self.set_current()
+        offset = (0, 0) if region is None else region[:2]
+        csize = self.size if region is None else region[2:]
+        w, h = int(size[0]), int(size[1])
+        if w < 1 or h < 1:
+            raise ValueError('size must be positive, got %s' % (size,))
+        shape = (h, w, 4 if alpha else 3)
+        if out is None:
+            out = np.empty(shape, np.ubyte)
+        elif out.shape != shape or out.dtype != np.ubyte:
+            raise ValueError('out must be a ubyte array of shape %s, got %s '
+                             'array of shape %s' % (shape, out.dtype,
+                                                    out.shape))
+
+        if tile_size is None:
+            max_size = self.context.shared.parser.capabilities.get(
+                'max_renderbuffer_size') or 2048
+            tile_size = min(2048, max_size)
+        if np.isscalar(tile_size):
+            tile_size = (tile_size, tile_size)
+        # No need for tiles larger than the image itself
+        tw, th = min(int(tile_size[0]), w), min(int(tile_size[1]), h)
+
+        # Size of one tile in canvas coordinates
+        sx, sy = csize[0] / float(w), csize[1] / float(h)
+        tile_csize = (tw * sx, th * sy)
+        with self.context.shared.fbo_pool.lease((th, tw)) as fbo:
+            for y in range(0, h, th):
+                for x in range(0, w, tw):
+                    # Tiles at the right / bottom edges may be partially
+                    # outside of the image; those pixels are drawn but not
+                    # read.
+                    cw, ch = min(tw, w - x), min(th, h - y)
+                    tile_offset = (offset[0] + x * sx, offset[1] + y * sy)
+                    out[y:y + ch, x:x + cw] = self._render_fbo(
+                        fbo, tile_offset, tile_csize, bgcolor=bgcolor,
+                        crop=(0, th - ch, cw, ch), alpha=alpha)
+        return out
+
+    def capture_frames(self, consumer, size=None, region=None, bgcolor=None,
+                       alpha=True, queue_size=4):
+        """Start capturing successive frames of the scene
+
+        Each call to ``capture()`` on the returned object renders the scene
+        into a framebuffer that is reused for all frames, and hands the
+        image to *consumer* (e.g. a video encoder or PNG writer) on a
+        background thread, so that rendering and encoding overlap.
 
-        self.push_fbo(fbo, offset, csize)
+        Parameters
+        ----------
+        consumer : callable
+            Called as ``consumer(index, image)`` on a background thread for
+            each frame, in order.
+        size : tuple | None
+            The size (w, h) of the frames. By default the size of the
+            region multiplied by the pixel scaling factor of the canvas.
+        region : tuple | None
+            The region (x, y, w, h) of the canvas to render. By default,
+            the entire canvas is rendered.
+        bgcolor : instance of Color | None
+            The background color to use.
+        alpha : bool
+            If True (default), frames are RGBA. Otherwise RGB.
+        queue_size : int
+            Maximum number of rendered frames waiting for the consumer.
+            When reached, capturing blocks. Default 4.
+
+        Returns
+        -------
+        capture : instance of FrameCapture
+            Call ``capture()`` on it for each frame, and ``close()`` (or use
+            it as a context manager) to wait for the consumer to finish.
+
+        Examples
+        --------
+        >>> with canvas.capture_frames(writer) as capture:  # doctest: +SKIP
+        ...     for t in times:
+        ...         update_scene(t)
+        ...         capture.capture()
+        """
+        return FrameCapture(self, consumer, size=size, region=region,
+                            bgcolor=bgcolor, alpha=alpha,
+                            queue_size=queue_size)
+
+    def _render_fbo(self, fbo, offset, csize, bgcolor=None, crop=None,
+                    alpha=True):
+        """Draw the region (offset, csize) of the scene, given in logical
+        canvas coordinates, into *fbo* and return its pixels.
+        """
+        self.push_fbo(fbo, *self._region_to_framebuffer(offset, csize))
         try:
             self._draw_scene(bgcolor=bgcolor)
-            return fbo.read(crop=crop)
+            return fbo.read(alpha=alpha, crop=crop)
         finally:
             self.pop_fbo()
 
+    def _region_to_framebuffer(self, offset, csize):
+        """Convert a region of the canvas, given in logical pixels with the
+        origin at the top-left, into the (offset, size) of the same region
+        in the canvas's framebuffer, as expected by `push_fbo`.
+        """
+        sx = self.physical_size[0] / float(self.size[0])
+        sy = self.physical_size[1] / float(self.size[1])
+        fb_offset = (offset[0] * sx,
+                     self.physical_size[1] - (offset[1] + csize[1]) * sy)
+        return fb_offset, (csize[0] * sx, csize[1] * sy)
+
     def _draw_scene(self, bgcolor=None):
         if bgcolor is None:
             bgcolor = self._bgcolor
@@ -616,8 +762,9 @@ class SceneCanvas(app.Canvas, Frozen):
         if len(self._fb_stack) == 0:
             fb_size = fb_rect = None
         else:
-            fb, origin, fb_size = self._fb_stack[-1]
-            fb_rect = origin + fb_size
+            fb, origin, csize = self._fb_stack[-1]
+            fb_size = fb.shape[::-1]
+            fb_rect = tuple(origin) + tuple(csize)
             
         if len(self._vp_stack) == 0:
             viewport = None
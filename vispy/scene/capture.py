@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Capture of successive frames of a SceneCanvas, e.g. for exporting videos
+or animations.
+"""
+
+from __future__ import division
+
+import sys
+import threading
+
+from ..ext.six import reraise
+from ..ext.six.moves import queue
+
+
+class FrameCapture(object):
+    """Render successive frames of a SceneCanvas and pass them to a consumer
+
+    A single framebuffer, taken from the framebuffer pool of the canvas
+    context, is reused for every frame. The frames
+    are handed to *consumer* on a background thread through a bounded
+    queue, so that encoding or writing a frame overlaps with rendering the
+    next ones. When the queue is full, `capture` blocks until the consumer
+    catches up.
+
+    Usually created with `SceneCanvas.capture_frames`.
+
+    Parameters
+    ----------
+    canvas : instance of SceneCanvas
+        The canvas to render.
+    consumer : callable
+        Called as ``consumer(index, image)`` from the background thread for
+        every captured frame, in order. *image* is a ubyte array of shape
+        (h, w, 4) (or (h, w, 3) if *alpha* is False).
+    size : tuple | None
+        The size (w, h) of the frames. By default the size of the region
+        multiplied by the pixel scale of the canvas.
+    region : tuple | None
+        The region (x, y, w, h) of the canvas to render. By default the
+        entire canvas.
+    bgcolor : instance of Color | None
+        The background color to use.
+    alpha : bool
+        Whether to capture RGBA (default) or RGB frames.
+    queue_size : int
+        Maximum number of frames waiting to be consumed. Default 4.
+
+    Notes
+    -----
+    Reading back the pixels of a frame is synchronous, as the OpenGL ES 2.0
+    API used by gloo has no pixel buffer objects; the overlap is between
+    the GPU and Python work of rendering and the work done by the consumer.
+    Exceptions raised by the consumer are re-raised by the next call to
+    `capture` or by `close`.
+    """
+
+    def __init__(self, canvas, consumer, size=None, region=None,
+                 bgcolor=None, alpha=True, queue_size=4):
+        if not callable(consumer):
+            raise TypeError('consumer must be callable')
+        self._canvas = canvas
+        self._consumer = consumer
+        self._offset = (0, 0) if region is None else tuple(region[:2])
+        self._csize = canvas.size if region is None else tuple(region[2:])
+        if size is None:
+            s = canvas.pixel_scale
+            size = tuple([x * s for x in self._csize])
+        self._size = (int(size[0]), int(size[1]))
+        self._bgcolor = bgcolor
+        self._alpha = alpha
+
+        canvas.set_current()
+        self._pool = canvas.context.shared.fbo_pool
+        self._fbo = self._pool.acquire(self._size[::-1])
+        self._queue = queue.Queue(maxsize=int(queue_size))
+        self._count = 0
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._consume,
+                                        name='FrameCapture')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def size(self):
+        """The size (w, h) of the captured frames"""
+        return self._size
+
+    @property
+    def frame_count(self):
+        """The number of frames captured so far"""
+        return self._count
+
+    @property
+    def closed(self):
+        """Whether the capture has been closed"""
+        return self._closed
+
+    def capture(self):
+        """Render the current state of the scene as the next frame
+
+        Returns
+        -------
+        index : int
+            The index of the captured frame.
+        """
+        if self._closed:
+            raise RuntimeError('Cannot capture frames after close()')
+        self._check_error()
+        image = self._canvas._render_fbo(self._fbo, self._offset,
+                                         self._csize, bgcolor=self._bgcolor,
+                                         alpha=self._alpha)
+        index = self._count
+        self._queue.put((index, image))
+        self._count += 1
+        return index
+
+    def close(self):
+        """Wait for all captured frames to be consumed and release the
+        framebuffer
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._pool.release(self._fbo)
+        self._fbo = None
+        self._check_error()
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # drain the queue without processing
+            try:
+                self._consumer(*item)
+            except Exception:
+                self._error = sys.exc_info()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            reraise(*error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        try:
+            self.close()
+        except Exception:
+            # Don't mask the original exception with a consumer error
+            if type is None:
+                raise
+
+    def __repr__(self):
+        return ('<%s %dx%d, %d frames at %s>'
+                % (self.__class__.__name__, self._size[0], self._size[1],
+                   self._count, hex(id(self))))
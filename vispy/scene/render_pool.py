@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+A pool of warm offscreen canvases for server-side (headless) rendering.
+
+Each worker of a ``RenderPool`` is a separate process that owns one
+``SceneCanvas`` for its whole lifetime, so the cost of creating the GL
+context, compiling programs and uploading shared data is paid once per
+worker instead of once per rendered image. Separate processes are used
+because GL contexts, and vispy's notion of the current canvas, are bound
+to a single thread; they also let jobs run concurrently despite the GIL.
+"""
+
+from __future__ import division
+
+import multiprocessing
+
+from ..ext.six import string_types
+
+
+# State of the canvas owned by a worker process
+_worker_state = {}
+
+
+def _init_worker(backend, size, bgcolor, initializer, initargs):
+    """Create the canvas of a worker process and warm it up"""
+    from .. import app
+    from .canvas import SceneCanvas
+    app.use_app(backend)
+    canvas = SceneCanvas(size=size, bgcolor=bgcolor, show=False)
+    view = canvas.central_widget.add_view()
+    # Initialize the GL context (and the framebuffer pool)
+    canvas.render()
+    _worker_state.update(canvas=canvas, view=view, data=None)
+    if initializer is not None:
+        _worker_state['data'] = initializer(canvas, *initargs)
+
+
+def _run_job(job, args, kwargs):
+    """Run a job in a worker process"""
+    canvas = _worker_state['canvas']
+    if not callable(job):
+        return _render_description(job)
+    if _worker_state['data'] is not None:
+        kwargs = dict(kwargs, data=_worker_state['data'])
+    return job(canvas, *args, **kwargs)
+
+
+def _render_description(description):
+    """Build the scene given by a description, render it and tear it down
+    """
+    from . import visuals
+    canvas = _worker_state['canvas']
+    view = _worker_state['view']
+    nodes = []
+    try:
+        for name, node_kwargs in description.get('visuals', ()):
+            cls = getattr(visuals, name)
+            nodes.append(cls(parent=view.scene, **node_kwargs))
+        view.camera = description.get('camera', 'panzoom')
+        view.camera.set_range()
+        return canvas.render(size=description.get('size'),
+                             bgcolor=description.get('bgcolor'))
+    finally:
+        for node in nodes:
+            node.parent = None
+
+
+class RenderPool(object):
+    """Pool of warm offscreen canvases executing rendering jobs concurrently
+
+    Each worker process creates a ``SceneCanvas`` with the requested
+    backend once, and then executes the jobs it receives on that canvas.
+    Use a headless backend such as 'osmesa' (which works without a GPU)
+    or 'egl'.
+
+    Parameters
+    ----------
+    n_workers : int | None
+        Number of worker processes (and thus GL contexts). Defaults to the
+        number of CPUs.
+    backend : str
+        The app backend used by the workers. Default 'osmesa'.
+    size : tuple
+        The size (w, h) of the canvases. Default (800, 600).
+    bgcolor : Color
+        The background color of the canvases.
+    initializer : callable | None
+        If given, called as ``initializer(canvas, *initargs)`` once in every
+        worker after its canvas is created, e.g. to create visuals (and thus
+        compile their programs) that all jobs reuse. The returned value is
+        passed to callable jobs as the ``data`` keyword argument.
+    initargs : tuple
+        Arguments for *initializer*.
+
+    Notes
+    -----
+    Jobs, their arguments and their results are sent between processes, so
+    they must be picklable; callable jobs must be module-level functions.
+
+    A job is either:
+
+        * a callable, called as ``job(canvas, *args, **kwargs)`` in a worker.
+          Its return value (typically ``canvas.render()``) is the result.
+        * a scene description, i.e. a dict with the keys ``visuals`` (a list
+          of ``(name, kwargs)`` pairs naming classes of
+          ``vispy.scene.visuals``), and optionally ``camera`` (default
+          'panzoom'), ``size`` and ``bgcolor``. The visuals are added to a
+          view filling the canvas, the camera range is set to fit them, and
+          the rendered image is the result.
+
+    Examples
+    --------
+    >>> with RenderPool(2) as pool:  # doctest: +SKIP
+    ...     thumb = pool.render(dict(visuals=[('Image', dict(data=img))]))
+    """
+
+    def __init__(self, n_workers=None, backend='osmesa', size=(800, 600),
+                 bgcolor='black', initializer=None, initargs=()):
+        if not isinstance(backend, string_types):
+            raise TypeError('backend must be a string')
+        if initializer is not None and not callable(initializer):
+            raise TypeError('initializer must be callable')
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        n_workers = int(n_workers)
+        if n_workers < 1:
+            raise ValueError('n_workers must be at least 1')
+        self._n_workers = n_workers
+        # Fresh processes: a forked copy of an initialized GL state (or of
+        # a process with threads) is not safe to use
+        try:
+            ctx = multiprocessing.get_context('spawn')
+        except AttributeError:  # Python 2
+            ctx = multiprocessing
+        self._pool = ctx.Pool(n_workers, _init_worker,
+                              (backend, tuple(size), bgcolor, initializer,
+                               tuple(initargs)))
+        self._closed = False
+
+    @property
+    def n_workers(self):
+        """The number of worker processes"""
+        return self._n_workers
+
+    def submit(self, job, *args, **kwargs):
+        """Queue a job for execution by one of the workers
+
+        Parameters
+        ----------
+        job : callable | dict
+            The job (see the class documentation).
+        *args, **kwargs
+            Arguments passed to a callable job.
+
+        Returns
+        -------
+        result : instance of multiprocessing.pool.AsyncResult
+            Call ``result.get()`` to wait for and obtain the result.
+        """
+        if self._closed:
+            raise RuntimeError('Cannot submit jobs to a closed RenderPool')
+        if not callable(job) and not isinstance(job, dict):
+            raise TypeError('job must be callable or a scene description '
+                            'dict, not %s' % type(job))
+        return self._pool.apply_async(_run_job, (job, args, kwargs))
+
+    def map(self, job, iterable):
+        """Run a job for every item of *iterable*, concurrently, and return
+        the list of results. Callable jobs are called as
+        ``job(canvas, item)``; if *job* is None, the items must be scene
+        descriptions.
+        """
+        results = [self.submit(item) if job is None else
+                   self.submit(job, item) for item in iterable]
+        return [result.get() for result in results]
+
+    def render(self, description):
+        """Render a scene description and return the image"""
+        return self.submit(description).get()
+
+    def close(self):
+        """Wait for the queued jobs to finish and stop the workers"""
+        if not self._closed:
+            self._closed = True
+            self._pool.close()
+            self._pool.join()
+
+    def terminate(self):
+        """Stop the workers immediately, discarding queued jobs"""
+        self._closed = True
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def __repr__(self):
+        return ('<%s with %d workers at %s>'
+                % (self.__class__.__name__, self._n_workers, hex(id(self))))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy import scene
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises)
+
+
+def _make_scene(canvas):
+    data = np.random.RandomState(0).rand(8, 10, 3).astype(np.float32)
+    image = scene.visuals.Image(data, interpolation='nearest',
+                                parent=canvas.scene)
+    image.transform = scene.STTransform(scale=(10, 10))
+    scene.visuals.Line(np.array([[0, 20.5], [50, 60.5]]), color='red',
+                       method='gl', parent=canvas.scene)
+
+
+@requires_application()
+def test_render_region():
+    with TestingCanvas(size=(100, 80)) as c:
+        _make_scene(c)
+        full = c.render()
+        assert full.shape == (80, 100, 4)
+        # region rendering at native resolution matches the full render
+        region = c.render(region=(10, 20, 50, 40))
+        assert region.shape == (40, 50, 4)
+        assert_array_equal(region, full[20:60, 10:60])
+        # upscaled rendering repeats pixels of the nearest-sampled image
+        big = c.render(size=(200, 160))
+        assert big.shape == (160, 200, 4)
+        assert_array_equal(big[1::20, 1::20, :3], full[::10, ::10, :3])
+
+
+@requires_application()
+def test_render_tiled():
+    with TestingCanvas(size=(100, 80)) as c:
+        _make_scene(c)
+        for region, size in [(None, (300, 240)),
+                             ((10, 10, 50, 40), (100, 80))]:
+            expected = c.render(region=region, size=size)
+            for tile_size in (32, (37, 23), 1000):
+                img = c.render_tiled(size, region=region,
+                                     tile_size=tile_size)
+                assert_array_equal(img, expected)
+
+        out = np.zeros((80, 100, 3), np.ubyte)
+        img = c.render_tiled((100, 80), tile_size=30, alpha=False, out=out)
+        assert img is out
+        assert_array_equal(out, c.render()[..., :3])
+        assert_raises(ValueError, c.render_tiled, (100, 80), out=out)
+        assert_raises(ValueError, c.render_tiled, (0, 80))
+
+
+@requires_application()
+def test_capture_frames():
+    with TestingCanvas(size=(100, 80)) as c:
+        _make_scene(c)
+        expected = [c.render(bgcolor='blue'), c.render(bgcolor='green')]
+        frames = []
+        with c.capture_frames(lambda i, im: frames.append((i, im)),
+                              queue_size=1) as capture:
+            for i, color in enumerate(('blue', 'green')):
+                c.bgcolor = color
+                assert capture.capture() == i
+        assert capture.closed
+        assert capture.frame_count == 2
+        assert [i for i, _ in frames] == [0, 1]
+        for (_, im), exp in zip(frames, expected):
+            assert_array_equal(im, exp)
+        assert_raises(RuntimeError, capture.capture)
+
+        # errors in the consumer are re-raised
+        def bad_consumer(index, image):
+            raise IOError('disk full')
+        capture = c.capture_frames(bad_consumer, size=(50, 40), alpha=False)
+        capture.capture()
+        assert_raises(IOError, capture.close)
+        assert_raises(TypeError, c.capture_frames, None)
+
+
+run_tests_if_main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+
+from vispy import app
+from vispy.scene import RenderPool
+from vispy.testing import (requires_application, run_tests_if_main,
+                           assert_raises)
+
+
+def _make_image(canvas, value):
+    return dict(image=canvas.render(bgcolor=(value, 0, 0, 1)),
+                shared=value)
+
+
+def _render_job(canvas, value, data=None):
+    return canvas.render(bgcolor=(value, 0, 0, 1))[0, 0], data
+
+
+@requires_application()
+def test_render_pool():
+    backend = app.use_app().backend_name
+    with RenderPool(2, backend=backend, size=(40, 30),
+                    initializer=_make_image, initargs=(0.,)) as pool:
+        assert pool.n_workers == 2
+        results = pool.map(_render_job, [0., 1.])
+        assert [tuple(r[0]) for r in results] == [(0, 0, 0, 255),
+                                                  (255, 0, 0, 255)]
+        # the value returned by the initializer is passed to the jobs
+        assert results[0][1]['shared'] == 0.
+        assert results[0][1]['image'].shape == (30, 40, 4)
+
+        data = np.zeros((10, 10), np.float32)
+        data[:, 5:] = 1
+        description = dict(visuals=[('Image', dict(data=data,
+                                                   cmap='grays'))],
+                           size=(20, 20))
+        img = pool.render(description)
+        assert img.shape == (20, 20, 4)
+        assert img[10, 2, 0] == 0 and img[10, 17, 0] == 255
+        assert_raises(TypeError, pool.submit, 'foo')
+    assert_raises(RuntimeError, pool.submit, _render_job, 0.)
+    assert_raises(ValueError, RenderPool, 0)
+
+
+run_tests_if_main()
@@ -229,9 +229,11 @@ def generate_docstring(subclass, clsname):
 Arrow = create_visual_node(visuals.ArrowVisual)
 Axis = create_visual_node(visuals.AxisVisual)
 Box = create_visual_node(visuals.BoxVisual)
+BrickedVolume = create_visual_node(visuals.BrickedVolumeVisual)
 ColorBar = create_visual_node(visuals.ColorBarVisual)
 Compound = create_visual_node(visuals.CompoundVisual)
 Cube = create_visual_node(visuals.CubeVisual)
+Density = create_visual_node(visuals.DensityVisual)
 Ellipse = create_visual_node(visuals.EllipseVisual)
 Graph = create_visual_node(visuals.GraphVisual)
 GridLines = create_visual_node(visuals.GridLinesVisual)
@@ -247,6 +249,8 @@ LinearRegion = create_visual_node(visuals.LinearRegionVisual)
 LinePlot = create_visual_node(visuals.LinePlotVisual)
 Markers = create_visual_node(visuals.MarkersVisual)
 Mesh = create_visual_node(visuals.MeshVisual)
+MultiChannelImage = create_visual_node(visuals.MultiChannelImageVisual)
+MultiLine = create_visual_node(visuals.MultiLineVisual)
 Plane = create_visual_node(visuals.PlaneVisual)
 Polygon = create_visual_node(visuals.PolygonVisual)
 Rectangle = create_visual_node(visuals.RectangleVisual)
@@ -256,9 +260,11 @@ Spectrogram = create_visual_node(visuals.SpectrogramVisual)
 Sphere = create_visual_node(visuals.SphereVisual)
 SurfacePlot = create_visual_node(visuals.SurfacePlotVisual)
 Text = create_visual_node(visuals.TextVisual)
+TiledImage = create_visual_node(visuals.TiledImageVisual)
 Tube = create_visual_node(visuals.TubeVisual)
 # Visual = create_visual_node(visuals.Visual)  # Should not be created
 Volume = create_visual_node(visuals.VolumeVisual)
+VolumeSeries = create_visual_node(visuals.VolumeSeriesVisual)
 Windbarb = create_visual_node(visuals.WindbarbVisual)
 XYZAxis = create_visual_node(visuals.XYZAxisVisual)
 
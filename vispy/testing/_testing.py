@@ -11,6 +11,7 @@ import sys
 import os
 import inspect
 import gc
+from contextlib import contextmanager
 
 from distutils.version import LooseVersion
 
@@ -381,6 +382,51 @@ def TestingCanvas(bgcolor='black', size=(100, 100), dpi=None, decorate=False,
     return TestingCanvas(bgcolor, size, dpi, decorate, **kwargs)
 
 
+def _recording_command(commands, name, command):
+    """Wrap a GLIR command function to append its commands to a list"""
+    def record(*args):
+        commands.append(args if name is None else (name,) + args)
+        return command(*args)
+    return record
+
+
+@contextmanager
+def record_glir(glir_objects):
+    """Record the GLIR commands issued by gloo objects
+
+    Parameters
+    ----------
+    glir_objects : instance of GLObject | dict
+        The gloo object, or a dict of gloo objects by name. With a dict,
+        each recorded command is prefixed with the name of its object.
+
+    Returns
+    -------
+    commands : list
+        The list of commands, as (command, id, args...) tuples, filled
+        until the end of the ``with`` block. The commands are still issued,
+        and the GLIR queues are restored on exit.
+    """
+    if isinstance(glir_objects, dict):
+        items = list(glir_objects.items())
+    else:
+        items = [(None, glir_objects)]
+    commands = []
+    patched = []
+    try:
+        for name, glir_object in items:
+            glir = glir_object._glir
+            patched.append((glir, glir.__dict__.get('command')))
+            glir.command = _recording_command(commands, name, glir.command)
+        yield commands
+    finally:
+        for glir, command in reversed(patched):
+            if command is None:
+                del glir.command
+            else:
+                glir.command = command
+
+
 @nottest
 def save_testing_image(image, location):
     from ..gloo.util import _screenshot
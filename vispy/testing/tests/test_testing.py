@@ -3,8 +3,11 @@
 # Copyright (c) Vispy Development Team. All Rights Reserved.
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
 # -----------------------------------------------------------------------------
+import numpy as np
+
+from vispy.gloo import VertexBuffer
 from vispy.testing import (assert_in, assert_not_in, assert_is,
-                           run_tests_if_main, assert_raises)
+                           run_tests_if_main, assert_raises, record_glir)
 
 
 def test_testing():
@@ -17,4 +20,21 @@ def test_testing():
     assert_is(None, None)
 
 
+def test_record_glir():
+    """Test recording GLIR commands"""
+    vbo, vbo2 = VertexBuffer(np.zeros(4, np.float32)), VertexBuffer()
+    with record_glir(vbo) as commands:
+        vbo.set_subdata(np.ones(2, np.float32), offset=1)
+    assert [cmd[:3] for cmd in commands] == [('DATA', vbo.id, 4)]
+    with record_glir({'a': vbo, 'b': vbo2}) as commands:
+        vbo2.set_data(np.zeros(2, np.float32))
+        vbo.set_subdata(np.ones(2, np.float32))
+    assert [cmd[:2] for cmd in commands] == [('b', 'SIZE'), ('b', 'DATA'),
+                                             ('a', 'DATA')]
+    # the commands are still issued, and no longer recorded once restored
+    assert 'command' not in vbo._glir.__dict__
+    vbo.set_subdata(np.ones(2, np.float32))
+    assert len(commands) == 3
+    assert [cmd[0] for cmd in vbo._glir.clear()].count('DATA') == 4
+
 run_tests_if_main()
@@ -14,6 +14,7 @@ defined in vispy.scene.
 from .axis import AxisVisual  # noqa
 from .box import BoxVisual  # noqa
 from .cube import CubeVisual  # noqa
+from .density import DensityVisual  # noqa
 from .ellipse import EllipseVisual  # noqa
 from .gridlines import GridLinesVisual  # noqa
 from .image import ImageVisual  # noqa
@@ -28,6 +29,8 @@ from .linear_region import LinearRegionVisual  # noqa
 from .line_plot import LinePlotVisual  # noqa
 from .markers import MarkersVisual, marker_types  # noqa
 from .mesh import MeshVisual  # noqa
+from .multi_line import MultiLineVisual  # noqa
+from .multichannel_image import MultiChannelImageVisual  # noqa
 from .plane import PlaneVisual  # noqa
 from .polygon import PolygonVisual  # noqa
 from .rectangle import RectangleVisual  # noqa
@@ -37,9 +40,12 @@ from .spectrogram import SpectrogramVisual  # noqa
 from .sphere import SphereVisual  # noqa
 from .surface_plot import SurfacePlotVisual  # noqa
 from .text import TextVisual  # noqa
+from .tiled_image import TiledImageVisual  # noqa
 from .tube import TubeVisual  # noqa
 from .visual import BaseVisual, Visual, CompoundVisual  # noqa
 from .volume import VolumeVisual  # noqa
+from .bricked_volume import BrickedVolumeVisual  # noqa
+from .volume_series import VolumeSeriesVisual  # noqa
 from .xyz_axis import XYZAxisVisual  # noqa
 from .border import _BorderVisual  # noqa
 from .colorbar import ColorBarVisual  # noqa
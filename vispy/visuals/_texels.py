@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Arrays of float vectors stored row after row in RGBA float textures, for
+vertex shaders looking up items by index.
+
+The shaders read item ``i`` with the ``texel(tex, shape, i)`` function of
+``misc/texel.glsl``, *shape* being the (width, height) of the texture.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+# The width of the textures, in texels
+TEXTURE_WIDTH = 4096
+# The maximum number of items: the textures are at most 4096 texels high,
+# and the float32 indices of the items are exact up to 2 ** 24
+MAX_TEXELS = TEXTURE_WIDTH ** 2
+
+
+def upload_texels(tex, data, width=TEXTURE_WIDTH):
+    """Upload the rows of *data* to the texture *tex*, *width* rows per
+    texture row, and return the (width, height) of the texture"""
+    width = max(min(len(data), width), 1)
+    height = max(-(-len(data) // width), 1)
+    texels = np.zeros((height * width, 4), np.float32)
+    texels[:len(data)] = data
+    tex.set_data(texels.reshape(height, width, 4))
+    return width, height
+
+
+def write_texels(tex, start, data):
+    """Write the rows of *data* to the texels of *tex* from the index
+    *start*, in as few rectangles as possible"""
+    width = tex.shape[1]
+    row, col = divmod(start, width)
+    if col:
+        # the end of the first row
+        n = min(width - col, len(data))
+        tex.set_data(data[np.newaxis, :n], offset=(row, col))
+        data = data[n:]
+        row += 1
+    n = len(data) // width
+    if n:
+        tex.set_data(data[:n * width].reshape(n, width, -1), offset=(row, 0))
+        data = data[n * width:]
+        row += n
+    if len(data):
+        tex.set_data(data[np.newaxis], offset=(row, 0))
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Out-of-core volume rendering with a cache of bricks.
+
+The volume is represented by a pyramid of levels, level 0 being the full
+resolution, each of which is partitioned into cubic bricks. The bricks
+visible from the camera, at the level of detail matching the zoom, are
+read from the data in background threads and uploaded into a 3D texture
+atlas that acts as a LRU cache. An indirection texture gives, for every
+brick of the rendered level, where in the atlas to find it, or the brick of
+a coarser level covering it while it is being loaded. The ray casting is
+the one of `VolumeVisual`, with the texture lookup replaced by a lookup
+through the indirection texture.
+"""
+
+from __future__ import division
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from ..gloo import Texture3D
+from ..ext.six import reraise
+from .shaders import Function
+from .volume import VolumeVisual, _subsample
+from .tiled_image import _TileLoader
+
+
+_SAMPLE_BRICK = """
+vec4 sample_brick(sampler3D atlas, vec3 loc) {
+    // Position in voxels of the full resolution volume
+    vec3 pos = loc * $shape - 0.5;
+    // Brick of the rendered level, and the cached brick covering it
+    vec3 brick = floor((pos / $level_scale + 0.5) / $brick_size);
+    brick = clamp(brick, vec3(0.0), $grid_shape - 1.0);
+    vec4 entry = texture3D($indirection, (brick + 0.5) / $grid_shape);
+    if (entry.a == 0.0) {
+        return vec4(0.0);
+    }
+    // entry.xyz is the position of the brick in the atlas, and entry.a the
+    // downsampling factor of its level
+    vec3 origin = floor(brick * $level_scale / entry.a) * $brick_size;
+    // Don't go past the border of the brick (like clamp_to_edge)
+    vec3 local = clamp(pos / entry.a - origin, -1.0, $brick_size);
+    vec3 index = entry.xyz + 1.0 + local;
+    return texture3D(atlas, (index + 0.5) / $atlas_shape);
+}
+"""
+
+
+def _read_brick(data, step, region, shape, dtype):
+    """Read a brick of a pyramid level, given as the (start, stop) voxel
+    ranges of its z, y and x axes including the border, which may extend
+    outside of the level *shape*
+    """
+    clipped = [(max(start, 0), min(stop, n))
+               for (start, stop), n in zip(region, shape)]
+    index = tuple(slice(start * step, stop * step, step)
+                  for start, stop in clipped)
+    brick = np.asarray(data[index], dtype=dtype)
+    pad = [(c[0] - r[0], r[1] - c[1]) for r, c in zip(region, clipped)]
+    pad += [(0, 0)] * (brick.ndim - 3)
+    return np.ascontiguousarray(np.pad(brick, pad, mode='edge'))
+
+
+class BrickedVolumeVisual(VolumeVisual):
+    """Displays a 3D volume too large for a single texture, from a cache
+    of bricks
+
+    Only the bricks visible from the camera, at the resolution needed for
+    the current zoom level, are read from the data and kept on the GPU. The
+    data can be a `np.memmap` or any lazily sliceable array (e.g. an HDF5 or
+    zarr dataset), so the volume does not need to fit in memory either.
+    While bricks are loading, the corresponding bricks of coarser levels
+    are rendered instead.
+
+    Parameters
+    ----------
+    vol : array-like | list of array-like
+        The volume of shape (Z, Y, X) or (Z, Y, X, C), which can be any
+        object supporting numpy-style slicing. If a single array is given,
+        the coarser levels are obtained by subsampling it by powers of two.
+        Alternatively, a list of arrays can be given, the first one being
+        the full resolution volume and each level being the previous one
+        downsampled by two along every axis.
+    clim : tuple of two floats | None
+        The contrast limits. By default they are estimated from a
+        subsample of the volume.
+    method : {'mip', 'translucent', 'additive', 'iso'}
+        The render method to use. See `VolumeVisual`. Default 'mip'.
+    threshold : float | None
+        The threshold to use for the isosurface render method, in units of
+        the contrast limits. By default (None) the mean of the coarsest
+        level is used.
+    relative_step_size : float
+        The relative step size to step through the volume. Default 0.8.
+    cmap : str
+        Colormap to use.
+    brick_size : int
+        The size of the (cubic) bricks, in voxels. Default 32.
+    cache_size : tuple
+        The number of (z, y, x) bricks held in the texture cache. Default
+        (8, 8, 8). The level of detail is lowered if the visible bricks do
+        not fit in the cache.
+    n_workers : int
+        The number of threads reading bricks. Default 2.
+    async_load : bool
+        If True (default), bricks are read in background threads and
+        rendered once available. If False, the visible bricks are read
+        before drawing, e.g. for rendering a complete image offscreen.
+    texture_format : str | None
+        Internal format of the brick cache. See `VolumeVisual`.
+
+    Notes
+    -----
+    Requires 3D and float textures, i.e. desktop OpenGL.
+    """
+
+    def __init__(self, vol, clim=None, method='mip', threshold=None,
+                 relative_step_size=0.8, cmap='grays', brick_size=32,
+                 cache_size=(8, 8, 8), n_workers=2, async_load=True,
+                 texture_format=None):
+        self._brick_size = int(brick_size)
+        if self._brick_size < 1:
+            raise ValueError('brick_size must be positive')
+        self._cache_size = tuple(int(n) for n in cache_size)
+        if len(self._cache_size) != 3 or min(self._cache_size) < 1:
+            raise ValueError('cache_size must be 3 positive integers')
+        self._async_load = bool(async_load)
+        self._loader = _TileLoader(int(n_workers))
+        self._levels = []
+        self._dtype = None
+        self._bricks = OrderedDict()  # (level, z, y, x) -> cache slot
+        self._free_slots = []
+        # incremented by set_data, to drop the bricks of the previous data
+        # that are still being read
+        self._generation = 0
+        self._level = None
+        self._need_table_update = True
+        self._indirection = Texture3D((1, 1, 1, 4), interpolation='nearest',
+                                      internalformat='rgba32f')
+        self._brick_fun = Function(_SAMPLE_BRICK)
+        self._brick_fun['indirection'] = self._indirection
+        self._brick_fun['brick_size'] = float(self._brick_size)
+
+        VolumeVisual.__init__(self, vol, clim=clim, method=method,
+                              threshold=threshold,
+                              relative_step_size=relative_step_size,
+                              cmap=cmap, texture_format=texture_format)
+
+    def _threshold_sample(self, vol):
+        data, step, _ = self._levels[-1]
+        return _subsample(data[::step, ::step, ::step])
+
+    def _make_levels(self, vol):
+        if isinstance(vol, (list, tuple)):
+            levels = [(level, 1) for level in vol]
+        else:
+            n = max(int(math.ceil(math.log(max(vol.shape[:3]) /
+                                           self._brick_size, 2))), 0) + 1
+            levels = [(vol, 2 ** i) for i in range(n)]
+        if len(levels) == 0:
+            raise ValueError('vol must contain at least one level')
+        self._check_shape(levels[0][0].shape)
+        return [(data, step, tuple(-(-s // step) for s in data.shape[:3]))
+                for data, step in levels]
+
+    def set_data(self, vol, clim=None):
+        """ Set the volume data.
+
+        Parameters
+        ----------
+        vol : array-like | list of array-like
+            The full resolution volume, or the list of levels of a volume
+            pyramid, full resolution first.
+        clim : tuple | None
+            Colormap limits to use. None will estimate the min and max
+            values from a subsample of the volume.
+        """
+        self._levels = self._make_levels(vol)
+        data = self._levels[0][0]
+        self._set_clim(data, clim)
+        self._dtype, internalformat = self._texture_format_for(data)
+
+        # (Re)create the brick cache
+        n_channels = self._n_channels_of(data)
+        size = self._brick_size + 2
+        atlas_shape = tuple(n * size for n in self._cache_size)
+        self._tex.resize(atlas_shape + (n_channels,),
+                         internalformat=internalformat)
+        self._brick_fun['atlas_shape'] = tuple(map(float, atlas_shape[::-1]))
+        self._brick_fun['shape'] = tuple(map(float, data.shape[:3][::-1]))
+        self._bricks.clear()
+        self._free_slots = list(range(np.prod(self._cache_size)))[::-1]
+        self._level = None
+        self._need_table_update = True
+        self._generation += 1
+        self._loader.request([])
+        self._loader.results()
+
+        self._set_volume_shape(data.shape, self._brick_fun)
+        self._kb_for_texture = (np.prod(atlas_shape) * n_channels *
+                                self._dtype.itemsize / 1024)
+        self.update()
+
+    @property
+    def n_levels(self):
+        """The number of levels of the volume pyramid"""
+        return len(self._levels)
+
+    @property
+    def level(self):
+        """The level of detail used for the last draw (0 is full
+        resolution)
+        """
+        return self._level
+
+    @property
+    def brick_size(self):
+        """The size of the bricks in voxels"""
+        return self._brick_size
+
+    def wait(self, timeout=None):
+        """Wait for the bricks being read in the background
+
+        The bricks are uploaded and rendered on the next draw.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Maximum time to wait, in seconds.
+        """
+        self._loader.wait(timeout)
+
+    # ------------------------------------------------------------ bricks ---
+    def _grid_shape(self, level):
+        """The number of (z, y, x) bricks of a level"""
+        b = self._brick_size
+        return tuple(-(-s // b) for s in self._levels[level][2])
+
+    def _load_func(self, key):
+        data, step, shape = self._levels[key[0]]
+        b = self._brick_size
+        region = [(i * b - 1, (i + 1) * b + 1) for i in key[1:]]
+        dtype = self._dtype
+        return ((self._generation, key),
+                lambda: _read_brick(data, step, region, shape, dtype))
+
+    def _store_brick(self, key, brick, pinned):
+        """Upload a brick into a free (or the least recently used) slot"""
+        if key in self._bricks:
+            return
+        if not self._free_slots:
+            for old in self._bricks:
+                if old not in pinned:
+                    self._free_slots.append(self._bricks.pop(old))
+                    break
+            else:
+                return  # all slots are in use by visible bricks
+        slot = self._free_slots.pop()
+        size = self._brick_size + 2
+        offset = tuple(i * size for i in np.unravel_index(slot,
+                                                          self._cache_size))
+        self._tex.set_data(brick, offset=offset)
+        self._bricks[key] = slot
+        self._need_table_update = True
+
+    def _visible_bricks(self, view, level):
+        """The keys of the bricks of *level* in the view frustum, closest to
+        the center of the view first
+        """
+        grid = self._grid_shape(level)
+        index = np.indices(grid).reshape(3, -1).T
+        size = self._brick_size * 2 ** level  # in full resolution voxels
+        lo = index * size - 0.5
+        hi = np.minimum((index + 1) * size, self._levels[0][2]) - 0.5
+        corners = np.array([np.where([i & 4, i & 2, i & 1], hi, lo)
+                            for i in range(8)])  # (8, n, zyx)
+        tr = view.transforms.get_transform('visual', 'render')
+        pts = tr.map(corners[..., ::-1].reshape(-1, 3)).reshape(8, -1, 4)
+        behind = (pts[..., 3] <= 0).any(axis=0)
+        ndc = pts[..., :2] / np.where(pts[..., 3:] <= 0, 1, pts[..., 3:])
+        inside = ((ndc.min(axis=0) <= 1) & (ndc.max(axis=0) >= -1)).all(-1)
+        visible = behind | inside
+        dist = (ndc.mean(axis=0) ** 2).sum(-1)
+        order = np.argsort(dist[visible], kind='mergesort')
+        return [(level,) + tuple(i) for i in index[visible][order]]
+
+    def _choose_level(self, view):
+        """The level whose voxels best match the size of the pixels"""
+        z, y, x = [s / 2. for s in self._levels[0][2]]
+        tr = view.transforms.get_transform('visual', 'framebuffer')
+        pts = tr.map([[x, y, z], [x + 1, y, z], [x, y + 1, z],
+                      [x, y, z + 1]])
+        pts = pts[:, :2] / pts[:, 3:4]
+        footprint = np.hypot(*(pts[1:] - pts[0]).T).max()
+        if not np.isfinite(footprint) or footprint <= 0:
+            footprint = 1.
+        level = int(math.floor(math.log(1. / footprint, 2)))
+        return min(max(level, 0), len(self._levels) - 1)
+
+    def _update_bricks(self, view):
+        """Collect loaded bricks, request the missing ones and update the
+        indirection table
+        """
+        capacity = np.prod(self._cache_size)
+        top = len(self._levels) - 1
+        level = self._choose_level(view)
+        coarse = self._visible_bricks(view, top)
+        if len(coarse) > capacity // 2:
+            coarse = []
+        wanted = self._visible_bricks(view, level)
+        while level < top and len(wanted) + len(coarse) > capacity:
+            level += 1
+            wanted = self._visible_bricks(view, level)
+        if level == top:
+            coarse = []
+        if level != self._level:
+            self._level = level
+            self._need_table_update = True
+        pinned = set(wanted + coarse)
+
+        # Upload the bricks read since the last draw
+        for (generation, key), brick, error in self._loader.results():
+            if generation != self._generation:
+                continue  # read from the previous data
+            if error is not None:
+                reraise(*error)
+            self._store_brick(key, brick, pinned)
+
+        missing = [key for key in coarse + wanted if key not in self._bricks]
+        if not self._async_load:
+            for key in missing:
+                self._store_brick(key, self._load_func(key)[1](), pinned)
+            missing = []
+        self._loader.request([self._load_func(key) for key in missing])
+        for key in wanted:  # mark as recently used
+            if key in self._bricks:
+                self._bricks[key] = self._bricks.pop(key)
+
+        if self._need_table_update:
+            self._build_table(level)
+
+    def _build_table(self, level):
+        """Build the indirection table of *level*: the atlas position of
+        each brick, or of the cached brick of the finest coarser level
+        covering it
+        """
+        size = self._brick_size + 2
+        table = None
+        for lev in range(len(self._levels) - 1, level - 1, -1):
+            grid = self._grid_shape(lev)
+            if table is None:
+                table = np.zeros(grid + (4,), np.float32)
+            else:
+                # Bricks inherit the entry of their parent brick
+                index = [np.minimum(np.arange(n) // 2, m - 1)
+                         for n, m in zip(grid, table.shape[:3])]
+                table = table[np.ix_(*index)]
+            for key, slot in self._bricks.items():
+                if key[0] == lev:
+                    pos = np.unravel_index(slot, self._cache_size)
+                    table[key[1:]] = [pos[2] * size, pos[1] * size,
+                                      pos[0] * size, 2 ** lev]
+        self._indirection.set_data(table)
+        self._brick_fun['grid_shape'] = tuple(map(float,
+                                                  table.shape[:3][::-1]))
+        self._brick_fun['level_scale'] = float(2 ** level)
+        self._need_table_update = False
+
+    def _prepare_draw(self, view):
+        self._update_bricks(view)
+        if self._loader.busy:
+            # Draw again when more bricks are available
+            self.update()
+        return VolumeVisual._prepare_draw(self, view)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+A visual displaying the density of huge scatter plots.
+
+Drawing tens of millions of markers is bound by the fill rate, and saturates
+the plot where markers overlap. Instead, the points (or a weight per point)
+are summed into bins of screen pixels, and the sums are displayed through a
+colormap. The sums are computed again only when the view changes.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from .. import gloo
+from ..gloo import Texture2D, VertexBuffer, FrameBuffer
+from ..color import get_colormap
+from ..ext.six import string_types
+from .shaders import Function, ModularProgram
+from .visual import Visual
+
+# Sums the points in bins, drawn as single-pixel points into a float
+# framebuffer with additive blending
+AGG_VERT_SHADER = """
+attribute vec2 a_position;
+attribute float a_weight;
+varying float v_weight;
+
+void main() {
+    v_weight = a_weight;
+    gl_Position = $transform(vec4(a_position, 0., 1.));
+    gl_PointSize = 1.0;
+}
+"""
+
+AGG_FRAG_SHADER = """
+varying float v_weight;
+
+void main() {
+    gl_FragColor = vec4(v_weight, 0., 0., 1.);
+}
+"""
+
+# Displays the sums through the colormap, on a quad covering the region of
+# the canvas they were computed for
+VERT_SHADER = """
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+varying vec2 v_texcoord;
+
+void main() {
+    v_texcoord = a_texcoord;
+    gl_Position = $transform(vec4(a_position, 0., 1.));
+}
+"""
+
+FRAG_SHADER = """
+uniform sampler2D u_density;
+uniform vec2 u_clim;
+uniform float u_log;
+varying vec2 v_texcoord;
+
+void main() {
+    float value = texture2D(u_density, v_texcoord).r;
+    if (value <= 0.0) {
+        discard;
+    }
+    vec2 clim = u_clim;
+    if (u_log > 0.5) {
+        value = log(value);
+        clim = log(max(clim, vec2(1e-30)));
+    }
+    float t = clim.y > clim.x ? (value - clim.x) / (clim.y - clim.x) : 1.0;
+    gl_FragColor = $cmap(clamp(t, 0.0, 1.0));
+}
+"""
+
+# Number of points mapped at once by the 'cpu' method
+_CHUNK_SIZE = 1 << 20
+
+
+def _bin_points(pos, weights, tr, origin, csize, shape):
+    """Sum the points (or their weights) in bins of the region of the canvas
+    at *origin* of size *csize*, from its bottom row up
+
+    Parameters
+    ----------
+    pos : ndarray
+        The (N, 2) positions of the points.
+    weights : ndarray | None
+        The weights of the points, or None to count them.
+    tr : BaseTransform
+        The transform from the coordinates of the points to the canvas.
+    origin : tuple
+        The (x, y) position of the region in the canvas.
+    csize : tuple
+        The (width, height) of the region in the canvas.
+    shape : tuple
+        The (rows, columns) of bins.
+    """
+    ny, nx = shape
+    density = np.zeros(ny * nx)
+    for start in range(0, len(pos), _CHUNK_SIZE):
+        stop = start + _CHUNK_SIZE
+        mapped = tr.map(pos[start:stop])
+        x = (mapped[:, 0] / mapped[:, 3] - origin[0]) * (nx / csize[0])
+        y = (mapped[:, 1] / mapped[:, 3] - origin[1]) * (ny / csize[1])
+        inside = (x >= 0) & (x < nx) & (y >= 0) & (y < ny)
+        index = ((ny - 1 - y[inside].astype(np.intp)) * nx +
+                 x[inside].astype(np.intp))
+        w = None if weights is None else weights[start:stop][inside]
+        density += np.bincount(index, w, minlength=ny * nx)
+    return density.reshape(ny, nx).astype(np.float32)
+
+
+class DensityVisual(Visual):
+    """Visual displaying the density of points, for huge scatter plots
+
+    The points, or their weights, are summed in bins of screen pixels and
+    the sums are displayed through a colormap. The sums are computed again
+    when the view changes (panning, zooming, resizing the canvas), not on
+    every draw.
+
+    Parameters
+    ----------
+    pos : array | None
+        The (N, 2) positions of the points.
+    weights : array | None
+        A weight per point, summed instead of counting the points. They
+        must be positive with the 'log' norm.
+    bin_size : int
+        The size of the (square) bins in framebuffer pixels. Default 1.
+    cmap : str | Colormap
+        The colormap. Default 'viridis'. Empty bins are transparent.
+    clim : str | tuple
+        The sums mapped to the ends of the colormap. 'auto' (default) uses
+        the smallest and largest sums of the non-empty bins in view.
+    norm : str
+        'log' (default) or 'linear' mapping of the sums to the colormap.
+    method : str
+        How the sums are computed:
+
+            * 'gpu': Default, the points are uploaded once, and drawn
+              with additive blending into a framebuffer with a float
+              texture. This requires float render targets (desktop OpenGL
+              3 or OpenGL ES 3 with EXT_color_buffer_float).
+            * 'cpu': the points are mapped to the screen and summed with
+              `np.bincount`, in chunks. This works with any backend, and
+              does not use GPU memory for the points.
+
+    **kwargs : dict
+        Keyword arguments to pass to `Visual`.
+
+    Notes
+    -----
+    The view is considered unchanged when the transform maps a few
+    reference points to the same position in the canvas, which is exact
+    for linear transforms. Call `update` after modifying the parameters of
+    a nonlinear transform in place, or set the data again.
+
+    With the 'gpu' method and 'auto' contrast limits, the sums are read
+    back from the GPU after they are computed, which stalls the pipeline
+    once per view change.
+    """
+
+    def __init__(self, pos=None, weights=None, bin_size=1, cmap='viridis',
+                 clim='auto', norm='log', method='gpu', **kwargs):
+        if method not in ('gpu', 'cpu'):
+            raise ValueError("method must be 'gpu' or 'cpu', not %r"
+                             % (method,))
+        self._method = method
+        self._bin_size = int(bin_size)
+        if self._bin_size < 1:
+            raise ValueError('bin_size must be at least 1')
+        self._pos = None
+        self._weights = None
+        self._generation = 0
+        self._view_key = None
+        self._density_clim = None  # not computed yet
+        self._pos_vbo = VertexBuffer(np.zeros((0, 2), np.float32))
+        self._weight_vbo = VertexBuffer(np.zeros(0, np.float32))
+        self._density = Texture2D(np.zeros((1, 1, 1), np.float32),
+                                  internalformat='r32f',
+                                  interpolation='nearest')
+        self._fbo = FrameBuffer(color=self._density)
+        self._agg_program = ModularProgram(AGG_VERT_SHADER, AGG_FRAG_SHADER)
+        self._quad_pos = VertexBuffer(np.zeros((4, 2), np.float32))
+
+        super(DensityVisual, self).__init__(vcode=VERT_SHADER,
+                                            fcode=FRAG_SHADER, **kwargs)
+        self.set_gl_state('translucent', depth_test=False, cull_face=False)
+        self._draw_mode = 'triangle_strip'
+        self.shared_program['a_position'] = self._quad_pos
+        self.shared_program['a_texcoord'] = np.array(
+            [[0, 1], [1, 1], [0, 0], [1, 0]], np.float32)
+        self.shared_program['u_density'] = self._density
+
+        self.cmap = cmap
+        self.clim = clim
+        self.norm = norm
+        if pos is not None:
+            self.set_data(pos, weights)
+        self.freeze()
+
+    def set_data(self, pos, weights=None):
+        """Set the points
+
+        Parameters
+        ----------
+        pos : array
+            The (N, 2) positions of the points.
+        weights : array | None
+            A weight per point, or None to count the points.
+        """
+        pos = np.ascontiguousarray(pos, np.float32)
+        if pos.ndim != 2 or pos.shape[1] != 2:
+            raise ValueError('pos must have shape (N, 2), not %s'
+                             % (pos.shape,))
+        if weights is not None:
+            weights = np.ascontiguousarray(weights, np.float32)
+            if weights.shape != (len(pos),):
+                raise ValueError('weights must have one value per point')
+        self._pos = pos
+        self._weights = weights
+        if self._method == 'gpu':
+            self._pos_vbo.set_data(pos)
+            if weights is not None:
+                self._weight_vbo.set_data(weights)
+            self._agg_program['a_position'] = self._pos_vbo
+            self._agg_program['a_weight'] = (1. if weights is None else
+                                             self._weight_vbo)
+        self._generation += 1
+        self._bounds_changed()
+        self.update()
+
+    @property
+    def bin_size(self):
+        """The size of the bins in framebuffer pixels"""
+        return self._bin_size
+
+    @bin_size.setter
+    def bin_size(self, bin_size):
+        bin_size = int(bin_size)
+        if bin_size < 1:
+            raise ValueError('bin_size must be at least 1')
+        self._bin_size = bin_size
+        self._view_key = None
+        self.update()
+
+    @property
+    def method(self):
+        """How the sums are computed, 'gpu' or 'cpu'"""
+        return self._method
+
+    @property
+    def cmap(self):
+        return self._cmap
+
+    @cmap.setter
+    def cmap(self, cmap):
+        self._cmap = get_colormap(cmap)
+        self.shared_program.frag['cmap'] = Function(self._cmap.glsl_map)
+        self.shared_program['texture2D_LUT'] = (
+            self._cmap.texture_lut() if hasattr(self._cmap, 'texture_lut')
+            else None)
+        self.update()
+
+    @property
+    def clim(self):
+        """The sums mapped to the ends of the colormap, or 'auto'"""
+        return (self._clim if isinstance(self._clim, string_types) else
+                tuple(self._clim))
+
+    @clim.setter
+    def clim(self, clim):
+        if isinstance(clim, string_types):
+            if clim != 'auto':
+                raise ValueError('clim must be "auto" if a string')
+        else:
+            clim = np.array(clim, float)
+            if clim.shape != (2,):
+                raise ValueError('clim must have two elements')
+        self._clim = clim
+        if isinstance(clim, string_types) and self._density_clim is None:
+            self._view_key = None  # the sums were not read back
+        self._update_clim()
+        self.update()
+
+    @property
+    def density_clim(self):
+        """The smallest and largest sums of the non-empty bins, as of the
+        last draw, or None if they were not computed (with the 'gpu' method
+        and a fixed clim)
+        """
+        return self._density_clim
+
+    @property
+    def norm(self):
+        """The mapping of the sums to the colormap, 'log' or 'linear'"""
+        return self._norm
+
+    @norm.setter
+    def norm(self, norm):
+        if norm not in ('log', 'linear'):
+            raise ValueError("norm must be 'log' or 'linear', not %r"
+                             % (norm,))
+        self._norm = norm
+        self.shared_program['u_log'] = float(norm == 'log')
+        self.update()
+
+    def _update_clim(self):
+        clim = self._clim
+        if isinstance(clim, string_types):
+            clim = (0., 1.) if self._density_clim is None else \
+                self._density_clim
+        self.shared_program['u_clim'] = clim
+
+    # --------------------------------------------------------- drawing ---
+    def _aggregate(self, view, canvas, origin, csize, shape):
+        """Compute the sums of the bins and upload them into the texture"""
+        if self._method == 'cpu':
+            tr = view.transforms.get_transform('visual', 'canvas')
+            density = _bin_points(self._pos, self._weights, tr, origin,
+                                  csize, shape)
+            self._density.set_data(density[..., np.newaxis])
+            values = density[density > 0]
+            extent = ((values.min(), values.max()) if len(values) else
+                      (0., 1.))
+        else:
+            if self._density.shape[:2] != shape:
+                self._density.resize(shape + (1,))
+            canvas.push_fbo(self._fbo, origin, csize)
+            try:
+                gloo.set_state(blend=True, blend_func=('one', 'one'),
+                               depth_test=False, cull_face=False)
+                gloo.clear(color=(0., 0., 0., 0.))
+                self._agg_program.vert['transform'] = \
+                    view.transforms.get_transform()
+                self._agg_program.draw('points')
+                extent = None
+                if isinstance(self._clim, string_types):
+                    extent = (0., 1.)
+                    values = gloo.read_pixels((0, 0, shape[1], shape[0]),
+                                              out_type='float')[..., 0]
+                    values = values[values > 0]
+                    if len(values):
+                        extent = (values.min(), values.max())
+            finally:
+                canvas.pop_fbo()
+                self._configure_gl_state()
+        self._density_clim = (None if extent is None else
+                              tuple(float(v) for v in extent))
+        self._update_clim()
+
+    def _compute_bounds(self, axis, view):
+        if self._pos is None or len(self._pos) == 0 or axis > 1:
+            return None if axis < 2 else (0, 0)
+        return (self._pos[:, axis].min(), self._pos[:, axis].max())
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = \
+            view.transforms.get_transform('canvas', 'render')
+
+    def _prepare_draw(self, view):
+        if self._pos is None or len(self._pos) == 0:
+            return False
+        canvas = view.transforms.canvas
+        # The bins cover the region of the canvas drawn in the current
+        # framebuffer, at its resolution
+        fbo, origin, csize = canvas._current_framebuffer()
+        fb_size = (canvas.physical_size if fbo is None else
+                   fbo.shape[1::-1])
+        shape = tuple(-(-int(s) // self._bin_size) for s in fb_size[::-1])
+
+        tr = view.transforms.get_transform('visual', 'canvas')
+        ref = tr.map([[0, 0], [1, 0], [0, 1], [1, 1]])
+        key = (self._generation, self._bin_size, tuple(origin), tuple(csize),
+               shape, tuple(np.round(ref.ravel(), 6)))
+        if key != self._view_key:
+            self._view_key = key
+            self._aggregate(view, canvas, origin, csize, shape)
+            x0, y0 = origin
+            x1, y1 = x0 + csize[0], y0 + csize[1]
+            self._quad_pos.set_data(np.array(
+                [[x0, y0], [x1, y0], [x0, y1], [x1, y1]], np.float32))
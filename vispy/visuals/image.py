@@ -72,7 +72,7 @@ _interpolation_template = """
         texcoord.y < 0.0 || texcoord.y > 1.0) {
             discard;
         }
-        return %s($texture, $shape, texcoord);
+        return %s($texture, $shape, texcoord * $texcoord_scale);
     }"""
 
 _texture_lookup = """
@@ -81,22 +81,69 @@ _texture_lookup = """
         texcoord.y < 0.0 || texcoord.y > 1.0) {
             discard;
         }
-        return texture2D($texture, texcoord);
+        return texture2D($texture, texcoord * $texcoord_scale);
     }"""
 
 
 _null_color_transform = 'vec4 pass(vec4 color) { return color; }'
-_c2l = 'float cmap(vec4 color) { return (color.r + color.g + color.b) / 3.; }'
+# single-channel textures are 'luminance' or 'r*': the value is in .r
+_c2l = 'float cmap(vec4 color) { return color.r; }'
+
+_apply_clim = """
+    float apply_clim(float data) {
+        if ($cmax == $cmin) {
+            return data == $cmin ? 0.0 : 1.0;
+        }
+        return (data - $cmin) / ($cmax - $cmin);
+    }"""
+
+_apply_gamma = """
+    float apply_gamma(float data) {
+        return pow(clamp(data, 0.0, 1.0), $gamma);
+    }"""
+
+# Texture internal format and the factor by which the values of each
+# native dtype are divided when sampled (normalized integer formats)
+_texture_formats = {
+    np.dtype(np.uint8): ('luminance', 255.),
+    np.dtype(np.uint16): ('r16', 65535.),
+    np.dtype(np.float32): ('r32f', 1.),
+}
 
 
-def _build_color_transform(data, cmap):
+def _build_color_transform(data, clim_fun, gamma_fun, cmap):
     if data.ndim == 2 or data.shape[2] == 1:
-        fun = FunctionChain(None, [Function(_c2l), Function(cmap.glsl_map)])
+        fun = FunctionChain(None, [Function(_c2l), clim_fun, gamma_fun,
+                                   Function(cmap.glsl_map)])
     else:
         fun = Function(_null_color_transform)
     return fun
 
 
+def _is_mono(data):
+    return data.ndim == 2 or data.shape[2] == 1
+
+
+def _downsample(data, factor):
+    """Mean of *data* over blocks of factor x factor pixels
+
+    The blocks of the last rows and columns are smaller when the shape is
+    not a multiple of *factor*. Integer data are rounded to their dtype.
+    """
+    out = data
+    for axis in (0, 1):
+        n = data.shape[axis]
+        starts = np.arange(0, n, factor)
+        counts = np.diff(np.append(starts, n)).astype(np.float32)
+        out = np.add.reduceat(out, starts, axis=axis, dtype=np.float32)
+        shape = [1] * out.ndim
+        shape[axis] = len(counts)
+        out /= counts.reshape(shape)
+    if np.issubdtype(data.dtype, np.integer):
+        out = np.round(out).astype(data.dtype)
+    return out
+
+
 class ImageVisual(Visual):
     """Visual subclass displaying an image.
 
@@ -127,6 +174,9 @@ class ImageVisual(Visual):
     clim : str | tuple
         Limits to use for the colormap. Can be 'auto' to auto-set bounds to
         the min and max of the data.
+    gamma : float
+        Gamma to use during colormap lookup. Final color will be
+        cmap(val**gamma), with val normalized by clim. Default 1.
     interpolation : str
         Selects method of image interpolation. Makes use of the two Texture2D
         interpolation methods and the available interpolation methods defined
@@ -138,18 +188,57 @@ class ImageVisual(Visual):
                 'catrom', 'mitchell', 'spline16', 'spline36', 'gaussian',
                 'bessel', 'sinc', 'lanczos', 'blackman'
 
+    texture_format : str | None
+        Internal format of the texture of single-channel data. By default
+        (None) it is chosen from the dtype of the data: uint8 and uint16
+        data are uploaded as-is as normalized integers ('luminance' and
+        'r16'), and all other data as float32 ('r32f'). Another format such
+        as 'r16f' can be given to save GPU memory, or 'luminance' if
+        the OpenGL implementation lacks float textures (at the cost of
+        precision).
+    downsampling : str | None
+        How the image is sampled when it is drawn smaller than its size in
+        pixels:
+
+            * None: Default, the image is uploaded at full resolution and
+              sampled with the texture interpolation, which aliases.
+            * 'auto': a copy of the image reduced by the mean over blocks of
+              pixels is uploaded instead, with the largest power of two
+              block size for which the copy still has at least as many
+              pixels as its footprint on the screen. A finer copy is
+              uploaded when zooming in. This avoids aliasing, and saves
+              GPU memory and bandwidth for large images. The copies are
+              cached until the data changes.
+            * 'mipmap': the image is uploaded at full resolution with its
+              mipmaps, which are sampled according to the zoom (trilinear
+              filtering). This avoids aliasing at the cost of a third more
+              GPU memory, and requires power of two image sizes on
+              OpenGL ES 2.0.
+
     **kwargs : dict
         Keyword arguments to pass to `Visual`.
 
     Notes
     -----
-    The colormap functionality through ``cmap`` and ``clim`` are only used
-    if the data are 2D.
+    The colormap functionality through ``cmap``, ``clim`` and ``gamma`` are
+    only used if the data are 2D. The contrast limits and gamma are applied
+    on the GPU, so changing them does not upload the data again.
     """
     def __init__(self, data=None, method='auto', grid=(1, 1),
-                 cmap='viridis', clim='auto',
-                 interpolation='nearest', **kwargs):
+                 cmap='viridis', clim='auto', gamma=1.,
+                 interpolation='nearest', texture_format=None,
+                 downsampling=None, **kwargs):
+        if downsampling not in (None, 'auto', 'mipmap'):
+            raise ValueError("downsampling must be None, 'auto' or "
+                             "'mipmap', not %r" % (downsampling,))
         self._data = None
+        self._downsampling = downsampling
+        self._proxy_factor = 1
+        self._proxies = {}  # downsampling factor -> reduced data
+        self._texture_format = texture_format
+        self._texture_scale = 1.
+        self._clim_fun = Function(_apply_clim)
+        self._gamma_fun = Function(_apply_gamma)
 
         # load 'float packed rgba8' interpolation kernel
         # to load float interpolation kernel use
@@ -186,20 +275,17 @@ class ImageVisual(Visual):
 
         self._interpolation = interpolation
 
-        # check texture interpolation
-        if self._interpolation == 'bilinear':
-            texture_interpolation = 'linear'
-        else:
-            texture_interpolation = 'nearest'
-
         self._method = method
         self._grid = grid
         self._need_texture_upload = True
+        self._data_owned = False
+        self._dirty_region = None
         self._need_vertex_update = True
         self._need_colortransform_update = True
         self._need_interpolation_update = True
         self._texture = Texture2D(np.zeros((1, 1, 4)),
-                                  interpolation=texture_interpolation)
+                                  interpolation=self._texture_interpolation())
+        self._texcoord_scale = (1., 1.)
         self._subdiv_position = VertexBuffer()
         self._subdiv_texcoord = VertexBuffer()
 
@@ -220,25 +306,70 @@ class ImageVisual(Visual):
         self._data_lookup_fn = None
 
         self.clim = clim
+        self.gamma = gamma
         self.cmap = cmap
         if data is not None:
             self.set_data(data)
         self.freeze()
 
-    def set_data(self, image):
+    def set_data(self, image, offset=None):
         """Set the data
 
         Parameters
         ----------
         image : array-like
             The image data.
+        offset : tuple | None
+            If given, the (row, col) offset at which *image* is written
+            into the current data, e.g. to update a strip or a region of
+            interest. Only the modified region is uploaded to the GPU, and
+            the regions modified between two draws are uploaded at once.
+            The contrast limits are left unchanged.
         """
+        if offset is not None:
+            return self._set_region(image, offset)
         data = np.asarray(image)
         if self._data is None or self._data.shape != data.shape:
             self._need_vertex_update = True
+            if self._data is None or _is_mono(self._data) != _is_mono(data):
+                self._need_colortransform_update = True
         self._data = data
+        self._data_owned = False
+        self._proxies.clear()
+        self._dirty_region = None
         self._need_texture_upload = True
 
+    def _set_region(self, image, offset):
+        if self._data is None:
+            raise RuntimeError('set_data() must be called without offset '
+                               'before updating a region')
+        data = np.asarray(image)
+        if data.ndim != self._data.ndim:
+            data = data.reshape(data.shape[:2] + self._data.shape[2:])
+        offset = tuple(int(o) for o in offset)
+        if len(offset) != 2 or min(offset) < 0:
+            raise ValueError('offset must be a (row, col) tuple of '
+                             'non-negative integers, got %r' % (offset,))
+        y0, x0 = offset
+        y1, x1 = y0 + data.shape[0], x0 + data.shape[1]
+        if y1 > self._data.shape[0] or x1 > self._data.shape[1]:
+            raise ValueError('Region of shape %s at offset %s does not fit '
+                             'in the image of shape %s'
+                             % (data.shape[:2], offset, self._data.shape[:2]))
+        if not self._data_owned:
+            # Don't modify the array passed to set_data
+            self._data = np.array(self._data)
+            self._data_owned = True
+        self._data[y0:y1, x0:x1] = data
+        self._proxies.clear()
+        if not self._need_texture_upload:
+            region = self._dirty_region
+            if region is not None:
+                y0, x0 = min(y0, region[0]), min(x0, region[1])
+                y1, x1 = max(y1, region[2]), max(x1, region[3])
+            self._dirty_region = (y0, x0, y1, x1)
+        self.update()
+
     def view(self):
         v = Visual.view(self)
         self._init_view(v)
@@ -264,7 +395,21 @@ class ImageVisual(Visual):
             if clim.shape != (2,):
                 raise ValueError('clim must have two elements')
         self._clim = clim
-        self._need_texture_upload = True
+        self._need_clim_update = True
+        self.update()
+
+    @property
+    def gamma(self):
+        """The gamma applied after normalizing the data by clim"""
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, gamma):
+        gamma = float(gamma)
+        if gamma <= 0:
+            raise ValueError('gamma must be > 0')
+        self._gamma = gamma
+        self._gamma_fun['gamma'] = gamma
         self.update()
 
     @property
@@ -310,6 +455,36 @@ class ImageVisual(Visual):
     def interpolation_functions(self):
         return self._interpolation_names
 
+    @property
+    def downsampling(self):
+        """How the image is sampled when drawn smaller than its size: None,
+        'auto' or 'mipmap'
+        """
+        return self._downsampling
+
+    @downsampling.setter
+    def downsampling(self, downsampling):
+        if downsampling not in (None, 'auto', 'mipmap'):
+            raise ValueError("downsampling must be None, 'auto' or "
+                             "'mipmap', not %r" % (downsampling,))
+        if self._downsampling != downsampling:
+            self._downsampling = downsampling
+            self._proxies.clear()
+            if self._proxy_factor != 1:
+                self._proxy_factor = 1
+                self._need_texture_upload = True
+            self._need_interpolation_update = True
+            self.update()
+
+    def _texture_interpolation(self):
+        """The interpolation of the texture"""
+        # only 'bilinear' uses 'linear' texture interpolation, the other
+        # filters sample the texels in spatial-filters.frag
+        mag = 'linear' if self._interpolation == 'bilinear' else 'nearest'
+        if self._downsampling == 'mipmap':
+            return 'linear_mipmap_linear', mag
+        return mag
+
     # The interpolation code could be transferred to a dedicated filter
     # function in visuals/filters as discussed in #1051
     def _build_interpolation(self):
@@ -320,21 +495,17 @@ class ImageVisual(Visual):
         self._data_lookup_fn = self._interpolation_fun[interpolation]
         self.shared_program.frag['get_data'] = self._data_lookup_fn
 
-        # only 'bilinear' uses 'linear' texture interpolation
-        if interpolation == 'bilinear':
-            texture_interpolation = 'linear'
-        else:
-            # 'nearest' (and also 'bilinear') doesn't use spatial_filters.frag
-            # so u_kernel and shape setting is skipped
-            texture_interpolation = 'nearest'
-            if interpolation != 'nearest':
-                self.shared_program['u_kernel'] = self._kerneltex
-                self._data_lookup_fn['shape'] = self._data.shape[:2][::-1]
+        # 'nearest' and 'bilinear' don't use spatial_filters.frag so
+        # u_kernel and shape setting is skipped
+        if interpolation not in ('nearest', 'bilinear'):
+            self.shared_program['u_kernel'] = self._kerneltex
 
+        texture_interpolation = self._texture_interpolation()
         if self._texture.interpolation != texture_interpolation:
             self._texture.interpolation = texture_interpolation
 
         self._data_lookup_fn['texture'] = self._texture
+        self._set_lookup_shape()
 
         self._need_interpolation_update = False
 
@@ -391,27 +562,99 @@ class ImageVisual(Visual):
         view._need_method_update = False
         self._prepare_transforms(view)
 
-    def _build_texture(self):
-        data = self._data
-        if data.dtype == np.float64:
-            data = data.astype(np.float32)
-
-        if data.ndim == 2 or data.shape[2] == 1:
-            # deal with clim on CPU b/c of texture depth limits :(
-            # can eventually do this by simulating 32-bit float... maybe
-            clim = self._clim
-            if isinstance(clim, string_types) and clim == 'auto':
-                clim = np.min(data), np.max(data)
-            clim = np.asarray(clim, dtype=np.float32)
-            data = data - clim[0]  # not inplace so we don't modify orig data
-            if clim[1] - clim[0] > 0:
-                data /= clim[1] - clim[0]
-            else:
-                data[:] = 1 if data[0, 0] != 0 else 0
-            self._clim = np.array(clim)
+    def _texture_dtype(self):
+        """The dtype in which the data is uploaded"""
+        dtype = self._data.dtype
+        if _is_mono(self._data):
+            # upload in the native dtype when possible, clim is applied
+            # in the shader
+            if dtype not in _texture_formats:
+                dtype = np.dtype(np.float32)
+        elif dtype == np.float64:
+            dtype = np.dtype(np.float32)
+        return dtype
+
+    def _set_lookup_shape(self):
+        """Set the shape of the texture and the scale from texture
+        coordinates of the image to those of the texture
+        """
+        fn = self._data_lookup_fn
+        if fn is None:
+            return
+        if self._interpolation not in ('nearest', 'bilinear'):
+            fn['shape'] = self._texture.shape[:2][::-1]
+        fn['texcoord_scale'] = self._texcoord_scale
+
+    def _lod_factor(self, view):
+        """The downsampling factor (a power of two) for which the image has
+        about as many pixels as its footprint in *view*
+        """
+        tr = view.transforms.get_transform('visual', 'framebuffer')
+        if not tr.Linear:
+            return 1
+        x, y = self.size[0] / 2., self.size[1] / 2.
+        pts = tr.map([[x, y], [x + 1, y], [x, y + 1]])
+        pts = pts[:, :2] / pts[:, 3:4]
+        # Framebuffer pixels per image pixel, along the most magnified axis
+        scale = np.hypot(*(pts[1:] - pts[0]).T).max()
+        if not np.isfinite(scale) or scale <= 0:
+            return 1
+        factor = 2 ** max(int(np.floor(np.log2(1. / scale))), 0)
+        return min(factor, 2 ** int(np.log2(max(self.size))))
+
+    def _proxy(self, factor):
+        """The data reduced by *factor*, cached"""
+        if factor not in self._proxies:
+            self._proxies[factor] = _downsample(self._data, factor)
+        return self._proxies[factor]
 
+    def _build_texture(self):
+        factor = self._proxy_factor
+        data = self._data if factor == 1 else self._proxy(factor)
+        data = data.astype(self._texture_dtype(), copy=False)
+        internalformat = None
+        if _is_mono(data):
+            internalformat, scale = _texture_formats[data.dtype]
+            if self._texture_format is not None:
+                internalformat = self._texture_format
+            if scale != self._texture_scale:
+                self._texture_scale = scale
+                self._need_clim_update = True
+
+        self._texture.resize(data.shape, internalformat=internalformat)
         self._texture.set_data(data)
+        # The blocks of the last row and column of the proxy can be smaller
+        self._texcoord_scale = tuple(float(n) / (m * factor) for n, m in
+                                     zip(self.size, data.shape[1::-1]))
+        self._set_lookup_shape()
         self._need_texture_upload = False
+        self._dirty_region = None
+
+    def _upload_region(self):
+        """Upload the region of the data modified since the last draw"""
+        y0, x0, y1, x1 = self._dirty_region
+        factor = self._proxy_factor
+        # Update the blocks of the proxy covering the region
+        y0, x0 = y0 // factor, x0 // factor
+        y1, x1 = -(-y1 // factor), -(-x1 // factor)
+        data = self._data[y0 * factor:y1 * factor, x0 * factor:x1 * factor]
+        if factor > 1:
+            data = _downsample(data, factor)
+        data = np.array(data, self._texture_dtype())
+        self._texture.set_data(data, offset=(y0, x0))
+        self._dirty_region = None
+
+    def _build_clim(self):
+        clim = self._clim
+        if isinstance(clim, string_types):
+            if not _is_mono(self._data):
+                return
+            clim = np.min(self._data), np.max(self._data)
+            self._clim = clim = np.array(clim, float)
+        clim = clim / self._texture_scale
+        self._clim_fun['cmin'] = float(clim[0])
+        self._clim_fun['cmax'] = float(clim[1])
+        self._need_clim_update = False
 
     def _compute_bounds(self, axis, view):
         if axis > 1:
@@ -434,20 +677,32 @@ class ImageVisual(Visual):
         if self._data is None:
             return False
 
+        if self._downsampling == 'auto':
+            factor = self._lod_factor(view)
+            if factor != self._proxy_factor:
+                self._proxy_factor = factor
+                self._need_texture_upload = True
+
         if self._need_interpolation_update:
             self._build_interpolation()
 
         if self._need_texture_upload:
             self._build_texture()
+        elif self._dirty_region is not None:
+            self._upload_region()
 
         if self._need_colortransform_update:
             prg = view.view_program
             self.shared_program.frag['color_transform'] = \
-                _build_color_transform(self._data, self.cmap)
+                _build_color_transform(self._data, self._clim_fun,
+                                       self._gamma_fun, self.cmap)
             self._need_colortransform_update = False
             prg['texture2D_LUT'] = self.cmap.texture_lut() \
                 if (hasattr(self.cmap, 'texture_lut')) else None
 
+        if self._need_clim_update:
+            self._build_clim()
+
         if self._need_vertex_update:
             self._build_vertex_data()
 
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+"""
+Min/max (M4) decimation of lines with monotonic x coordinates.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+
+class MinMaxPyramid(object):
+    """Pyramid of the indices of the minima and maxima of blocks of values
+
+    The level k of the pyramid holds the indices of the smallest and the
+    largest values of the blocks of ``block_size * 2 ** k`` values, which
+    answers the minimum and maximum of any range of values in O(log(N)).
+
+    Parameters
+    ----------
+    values : ndarray
+        The 1D array of values.
+    block_size : int
+        The number of values of the blocks of the first level. Shorter
+        ranges, at the ends of the queried ones, are read from the values.
+    """
+
+    def __init__(self, values, block_size=16):
+        self.values = values
+        self.block_size = block_size
+        n = len(values) // block_size
+        dtype = np.int32 if len(values) < 2 ** 31 else np.int64
+        blocks = values[:n * block_size].reshape(n, block_size)
+        offsets = np.arange(0, n * block_size, block_size, dtype=dtype)
+        argmin = blocks.argmin(axis=1).astype(dtype) + offsets
+        argmax = blocks.argmax(axis=1).astype(dtype) + offsets
+        self.levels = [(argmin, argmax)]
+        while len(argmin) > 1:
+            n = len(argmin) // 2
+            argmin = _pick(values, argmin[:2 * n:2], argmin[1:2 * n:2],
+                           np.less)
+            argmax = _pick(values, argmax[:2 * n:2], argmax[1:2 * n:2],
+                           np.greater)
+            self.levels.append((argmin, argmax))
+
+    def argminmax(self, starts, stops):
+        """The indices of the minima and maxima of the ranges of values
+
+        Parameters
+        ----------
+        starts : ndarray
+            The indices of the first values of the ranges.
+        stops : ndarray
+            The indices after the last values of the ranges, which must not
+            be empty.
+
+        Returns
+        -------
+        argmin : ndarray
+            The indices of the smallest values of the ranges.
+        argmax : ndarray
+            The indices of the largest values of the ranges.
+        """
+        values, size = self.values, self.block_size
+        starts = np.asarray(starts, np.int64)
+        stops = np.asarray(stops, np.int64)
+        # the whole blocks of the ranges
+        lo = -(-starts // size)
+        hi = np.maximum(stops // size, lo)
+        # the values before and after them
+        left = np.minimum(lo * size, stops)
+        right = np.maximum(hi * size, left)
+        argmin, argmax = _fringe(values, starts, left, size)
+        right_min, right_max = _fringe(values, right, stops, size)
+        argmin = _pick(values, argmin, right_min, np.less)
+        argmax = _pick(values, argmax, right_max, np.greater)
+
+        # The blocks at odd ends of the ranges are not part of the blocks of
+        # the next level, which cover the rest
+        for level_min, level_max in self.levels:
+            take = (lo < hi) & (lo % 2 == 1)
+            blocks = [(take, lo[take])]
+            lo[take] += 1
+            take = (lo < hi) & (hi % 2 == 1)
+            hi[take] -= 1
+            blocks.append((take, hi[take]))
+            for take, block in blocks:
+                argmin[take] = _pick(values, argmin[take], level_min[block],
+                                     np.less)
+                argmax[take] = _pick(values, argmax[take], level_max[block],
+                                     np.greater)
+            lo //= 2
+            hi //= 2
+        return argmin, argmax
+
+
+def _pick(values, a, b, op):
+    """The indices *a* or *b* of the values for which op(b, a) is True
+
+    Negative indices are missing values.
+    """
+    take = (a < 0) | ((b >= 0) & op(values[b], values[a]))
+    return np.where(take, b, a)
+
+
+def _fringe(values, starts, stops, size):
+    """The indices of the minima and maxima of ranges shorter than *size*
+    values, -1 for empty ranges"""
+    index = starts[:, np.newaxis] + np.arange(size - 1)
+    valid = index < stops[:, np.newaxis]
+    index = np.where(valid, index, 0)
+    data = values[index]
+    empty = ~valid.any(axis=1)
+    argmin = index[np.arange(len(index)),
+                   np.where(valid, data, np.inf).argmin(axis=1)]
+    argmax = index[np.arange(len(index)),
+                   np.where(valid, data, -np.inf).argmax(axis=1)]
+    argmin[empty] = -1
+    argmax[empty] = -1
+    return argmin, argmax
+
+
+def m4_indices(x, edges, pyramid):
+    """The indices of the vertices of a line drawn exactly in columns
+
+    Keeps the first, last, lowest and highest vertices of each column,
+    which draws the same pixels as all the vertices of a line with
+    monotonic x coordinates when the columns are the pixel columns.
+
+    Parameters
+    ----------
+    x : ndarray
+        The increasing x coordinates of the vertices.
+    edges : ndarray
+        The increasing x coordinates of the edges of the columns.
+    pyramid : MinMaxPyramid
+        The pyramid of the y coordinates of the vertices.
+
+    Returns
+    -------
+    indices : ndarray
+        The increasing indices of the kept vertices, including the
+        vertices just outside of the columns.
+    """
+    bounds = np.searchsorted(x, edges)
+    start = max(bounds[0] - 1, 0)
+    stop = min(bounds[-1] + 1, len(x))
+    if stop - start <= 4 * (len(edges) - 1):
+        # not worth it
+        return np.arange(start, stop)
+    starts, stops = bounds[:-1], bounds[1:]
+    full = stops > starts
+    starts, stops = starts[full], stops[full]
+    argmin, argmax = pyramid.argminmax(starts, stops)
+    indices = np.column_stack([starts, argmin, argmax, stops - 1])
+    indices.sort(axis=1)
+    indices = np.concatenate([[start], indices.ravel(), [stop - 1]])
+    keep = np.ones(len(indices), bool)
+    keep[1:] = indices[1:] != indices[:-1]
+    return indices[keep]
@@ -14,9 +14,11 @@ from ...color import Color, ColorArray, get_colormap
 from ...ext.six import string_types
 from ..shaders import Function
 from ..visual import Visual, CompoundVisual
+from .._texels import MAX_TEXELS, upload_texels
 from ...util.profiler import Profiler
 
 from .dash_atlas import DashAtlas
+from .decimation import MinMaxPyramid, m4_indices
 
 
 vec2to4 = Function("""
@@ -80,6 +82,12 @@ class LineVisual(CompoundVisual):
 
             * "agg" uses anti-grain geometry to draw nicely antialiased lines
               with proper joins and endcaps.
+            * "agg_gpu" draws the same lines as "agg", but computes their
+              geometry in the vertex shader from the vertices, which are
+              uploaded to a texture, so changing the vertices is much
+              faster. This needs textures in vertex shaders, which are not
+              supported by all OpenGL ES 2.0 implementations, and is
+              limited to 2 ** 24 vertices.
             * "gl" uses OpenGL's built-in line rendering. This is much faster,
               but produces much lower-quality results and is not guaranteed to
               obey the requested line width or join/endcap styles.
@@ -88,9 +96,14 @@ class LineVisual(CompoundVisual):
         Enables or disables antialiasing.
         For method='gl', this specifies whether to use GL's line smoothing,
         which may be unavailable or inconsistent on some platforms.
+    decimate : bool
+        Whether to only draw the vertices needed at the current zoom level,
+        for lines with increasing x coordinates (see the `decimate`
+        property).
     """
     def __init__(self, pos=None, color=(0.5, 0.5, 0.5, 1), width=1,
-                 connect='strip', method='gl', antialias=False):
+                 connect='strip', method='gl', antialias=False,
+                 decimate=False):
         self._line_visual = None
 
         self._changed = {'pos': False, 'color': False, 'width': False,
@@ -103,6 +116,17 @@ class LineVisual(CompoundVisual):
         self._bounds = None
         self._antialias = None
         self._method = 'none'
+        self._decimate = False
+        self._pyramid = None
+        # the indices of the vertices drawn, None to draw all of them
+        self._decimated = None
+        self._decimate_key = None
+        # Arrays larger than the line when vertices are appended to it,
+        # whose first vertices are the ones of the line, and the index of
+        # the first vertex appended since the last draw
+        self._pos_buffer = None
+        self._color_buffer = None
+        self._appended = None
 
         CompoundVisual.__init__(self, [])
 
@@ -112,6 +136,7 @@ class LineVisual(CompoundVisual):
                             connect=connect)
         self.antialias = antialias
         self.method = method
+        self.decimate = decimate
 
     @property
     def antialias(self):
@@ -129,8 +154,9 @@ class LineVisual(CompoundVisual):
 
     @method.setter
     def method(self, method):
-        if method not in ('agg', 'gl'):
-            raise ValueError('method argument must be "agg" or "gl".')
+        if method not in ('agg', 'agg_gpu', 'gl'):
+            raise ValueError('method argument must be "agg", "agg_gpu" or '
+                             '"gl".')
         if method == self._method:
             return
 
@@ -142,11 +168,60 @@ class LineVisual(CompoundVisual):
             self._line_visual = _GLLineVisual(self)
         elif method == 'agg':
             self._line_visual = _AggLineVisual(self)
+        elif method == 'agg_gpu':
+            self._line_visual = _AggGPULineVisual(self)
         self.add_subvisual(self._line_visual)
 
         for k in self._changed:
             self._changed[k] = True
 
+    @property
+    def decimate(self):
+        """Whether to only draw the vertices needed at the current zoom level
+
+        For lines with increasing x coordinates (like time series) drawn
+        as a strip, only the first, last, lowest and highest vertices in
+        each column of pixels are drawn (M4 decimation), which covers the
+        same pixels as all the vertices. The vertices outside of the view
+        are not drawn either, so the number of vertices drawn is at most
+        four times the width of the view in pixels.
+
+        The minima and maxima of the y coordinates are found in a pyramid
+        of the minima and maxima of blocks of vertices, built on the first
+        draw, and the vertices are only selected again when the x range of
+        the view changes.
+
+        Notes
+        -----
+        All the vertices are drawn in views where the x axis of the line
+        is not horizontal. OpenGL does not light the pixels that lines
+        only touch, so the lowest or highest pixel of a column can be
+        missing (or the line can be drawn a little differently with the
+        'agg' method, or if wider than one pixel).
+        """
+        return self._decimate
+
+    @decimate.setter
+    def decimate(self, decimate):
+        decimate = bool(decimate)
+        if decimate:
+            self._check_decimate(self._pos, self._connect)
+        self._decimate = decimate
+        self._decimated = None
+        self._decimate_key = None
+        self._changed['pos'] = self._changed['color'] = True
+        self.update()
+
+    @staticmethod
+    def _check_decimate(pos, connect):
+        """Check that the line can be decimated"""
+        if not (isinstance(connect, string_types) and connect == 'strip'):
+            raise ValueError("only lines with connect='strip' can be "
+                             "decimated")
+        if pos is not None and (np.diff(pos[:, 0]) < 0).any():
+            raise ValueError('only lines with increasing x coordinates can '
+                             'be decimated')
+
     def set_data(self, pos=None, color=None, width=None, connect=None):
         """Set the data used to draw this visual.
 
@@ -172,10 +247,24 @@ class LineVisual(CompoundVisual):
                 * bool numpy arrays specify which _adjacent_ pairs to connect.
 
         """
+        if self._decimate and (pos is not None or connect is not None):
+            self._check_decimate(self._pos if pos is None else pos,
+                                 self._connect if connect is None
+                                 else connect)
         if pos is not None:
             self._bounds = None
+            self._bounds_changed()
             self._pos = pos
             self._changed['pos'] = True
+            self._pyramid = None
+            self._decimate_key = None
+
+        if self._pos_buffer is not None and (pos is not None or
+                                             color is not None):
+            # vertices and colors of different lengths cannot be drawn
+            self._pos_buffer = self._color_buffer = None
+            self._appended = None
+            self._changed['pos'] = True
 
         if color is not None:
             self._color = color
@@ -191,6 +280,93 @@ class LineVisual(CompoundVisual):
 
         self.update()
 
+    def append(self, pos, color=None):
+        """Add vertices at the end of the line
+
+        Only the new vertices are uploaded when drawing, and the bounds of
+        the line are updated from them. The vertices are kept in arrays
+        larger than the line, which are doubled in size when full.
+
+        Parameters
+        ----------
+        pos : array
+            Array of shape (..., 2) or (..., 3) of the new vertices, with
+            as many coordinates as the others.
+        color : Color, tuple, or array | None
+            The color of the new vertices, or an array of shape (..., 4)
+            with one rgba color per new vertex. Must be given for lines
+            with one color per vertex, and only for them.
+
+        Notes
+        -----
+        Only lines with connect='strip' or 'segments' can be appended to.
+        The 'agg' method bakes the whole line again.
+        """
+        pos = np.asarray(pos)
+        if self._pos is None or len(self._pos) == 0:
+            self.set_data(pos=pos, color=color)
+            return
+        if pos.ndim != 2 or pos.shape[1] != self._pos.shape[1]:
+            raise ValueError('pos must have shape (N, %d), not %s'
+                             % (self._pos.shape[1], pos.shape))
+        if not (isinstance(self._connect, string_types) and
+                self._connect in ('strip', 'segments')):
+            raise ValueError("only lines with connect='strip' or "
+                             "'segments' can be appended to")
+        if self._decimate:
+            self._check_decimate(np.concatenate([self._pos[-1:], pos]),
+                                 self._connect)
+
+        n, m = len(self._pos), len(pos)
+        colors = None
+        if self._color_buffer is None:
+            colors = self._interpret_color()[0]
+            if not (isinstance(colors, np.ndarray) and colors.ndim == 2):
+                colors = None
+        per_vertex = self._color_buffer is not None or colors is not None
+        if per_vertex != (color is not None):
+            raise ValueError('color must be given for the lines with one '
+                             'color per vertex, and only for them')
+        if per_vertex:
+            color = ColorArray(color).rgba
+            if len(color) not in (1, m):
+                raise ValueError('got %d colors for %d vertices'
+                                 % (len(color), m))
+
+        capacity = 0 if self._pos_buffer is None else len(self._pos_buffer)
+        grow = n + m > capacity
+        if grow:
+            capacity = 2 * (n + m)
+            buf = np.empty((capacity, pos.shape[1]),
+                           np.result_type(self._pos, pos))
+            buf[:n] = self._pos
+            self._pos_buffer = buf
+            self._changed['pos'] = True
+        if per_vertex and (grow or self._color_buffer is None):
+            buf = np.zeros((capacity, 4), np.float32)
+            buf[:n] = self._color_buffer[:n] if colors is None else colors
+            self._color_buffer = buf
+            self._changed['color'] = True
+        self._pos_buffer[n:n + m] = pos
+        self._pos = self._pos_buffer[:n + m]
+        if per_vertex:
+            self._color_buffer[n:n + m] = color
+            self._color = self._color_buffer[:n + m]
+        if self._appended is None:
+            self._appended = n
+
+        if self._bounds is not None:
+            self._bounds = [(min(lo, pos[:, d].min()), max(hi, pos[:, d].max()))
+                            for d, (lo, hi) in enumerate(self._bounds)]
+        self._bounds_changed()
+        self._pyramid = None
+        self._decimate_key = None
+        self.update()
+
+    def _buffered(self):
+        """Whether the arrays larger than the line are uploaded"""
+        return self._pos_buffer is not None and self._decimated is None
+
     @property
     def color(self):
         return self._color
@@ -267,9 +443,53 @@ class LineVisual(CompoundVisual):
             else:
                 return (0, 0)
 
+    def _drawn(self, data):
+        """The values of *data* of the vertices drawn"""
+        if self._decimated is None or getattr(data, 'ndim', 0) < 2 or \
+                len(data) != len(self._pos):
+            return data
+        return data[self._decimated]
+
+    def _decimate_columns(self, view):
+        """The x coordinates of the edges of the pixel columns of the view,
+        or None if they cannot be computed"""
+        tr = view.transforms.get_transform('visual', 'framebuffer')
+        if not tr.Linear:
+            return None
+        mapped = tr.map([[0, 0], [1, 0], [0, 1]])
+        # the x coordinates must map to columns independently of y
+        if not np.allclose(mapped[:, 3], 1) or mapped[2, 0] != mapped[0, 0]:
+            return None
+        scale = mapped[1, 0] - mapped[0, 0]
+        if scale == 0 or not np.isfinite(mapped).all():
+            return None
+        fb = view.transforms.get_transform('render', 'framebuffer')
+        x0, x1 = np.sort(fb.map([[-1, -1], [1, 1]])[:, 0])
+        edges = (np.arange(np.floor(x0), np.ceil(x1) + 1) -
+                 mapped[0, 0]) / scale
+        return edges[::-1] if scale < 0 else edges
+
+    def _update_decimation(self, view):
+        """Select the vertices to draw at this zoom level"""
+        pos = self._pos
+        edges = self._decimate_columns(view)
+        key = () if edges is None else (edges[0], edges[-1], len(edges))
+        if key == self._decimate_key:
+            return
+        self._decimate_key = key
+        if edges is None:
+            self._decimated = None
+        else:
+            if self._pyramid is None:
+                self._pyramid = MinMaxPyramid(pos[:, 1])
+            self._decimated = m4_indices(pos[:, 0], edges, self._pyramid)
+        self._changed['pos'] = self._changed['color'] = True
+
     def _prepare_draw(self, view):
         if self._width == 0:
             return False
+        if self._decimate and self._pos is not None and len(self._pos):
+            self._update_decimation(view)
         CompoundVisual._prepare_draw(self, view)
 
 
@@ -308,11 +528,16 @@ class _GLLineVisual(Visual):
     def _prepare_draw(self, view):
         prof = Profiler()
 
-        if self._parent._changed['pos']:
-            if self._parent._pos is None:
+        parent = self._parent
+        buffered = parent._buffered()
+        appended = parent._appended
+        if parent._changed['pos']:
+            if parent._pos is None:
                 return False
             # todo: does this result in unnecessary copies?
-            pos = np.ascontiguousarray(self._parent._pos.astype(np.float32))
+            pos = parent._pos_buffer if buffered else \
+                parent._drawn(parent._pos)
+            pos = np.ascontiguousarray(pos.astype(np.float32))
             self._pos_vbo.set_data(pos)
             self._program.vert['position'] = self._pos_vbo
             if pos.shape[-1] == 2:
@@ -322,9 +547,17 @@ class _GLLineVisual(Visual):
             else:
                 raise TypeError("Got bad position array shape: %r"
                                 % (pos.shape,))
-
-        if self._parent._changed['color']:
+        elif appended is not None and buffered:
+            pos = parent._pos[appended:].astype(np.float32)
+            self._pos_vbo.set_subdata(pos, offset=appended)
+
+        if parent._changed['color'] and buffered and \
+                parent._color_buffer is not None:
+            self._color_vbo.set_data(parent._color_buffer)
+            self._program.vert['color'] = self._color_vbo
+        elif parent._changed['color']:
             color, cmap = self._parent._interpret_color()
+            color = self._parent._drawn(color)
             # If color is not visible, just quit now
             if isinstance(color, Color) and color.is_blank:
                 return False
@@ -341,6 +574,11 @@ class _GLLineVisual(Visual):
 
             self.shared_program['texture2D_LUT'] = cmap.texture_lut() \
                 if (hasattr(cmap, 'texture_lut')) else None
+        elif appended is not None and buffered and \
+                parent._color_buffer is not None:
+            self._color_vbo.set_subdata(
+                parent._color_buffer[appended:len(parent._pos)],
+                offset=appended)
 
         # Do we want to use OpenGL, and can we?
         GL = None
@@ -372,20 +610,25 @@ class _GLLineVisual(Visual):
         prof('prepare')
 
         # Draw
+        # the vertices of the line, at the start of the larger arrays
+        selection = (0, len(parent._pos)) if buffered else None
         if isinstance(self._connect, string_types) and \
                 self._connect == 'strip':
             self._draw_mode = 'line_strip'
-            self._index_buffer = None
+            self._index_buffer = selection
         elif isinstance(self._connect, string_types) and \
                 self._connect == 'segments':
             self._draw_mode = 'lines'
-            self._index_buffer = None
+            self._index_buffer = selection
         elif isinstance(self._connect, np.ndarray):
             self._draw_mode = 'lines'
             self._index_buffer = self._connect_ibo
         else:
             raise ValueError("Invalid line connect mode: %r" % self._connect)
 
+        parent._appended = None
+        for k in parent._changed:
+            parent._changed[k] = False
         prof('draw')
 
 
@@ -435,17 +678,18 @@ class _AggLineVisual(Visual):
 
     def _prepare_draw(self, view):
         bake = False
-        if self._parent._changed['pos']:
+        appended = self._parent._appended is not None
+        if self._parent._changed['pos'] or appended:
             if self._parent._pos is None:
                 return False
             # todo: does this result in unnecessary copies?
             self._pos = np.ascontiguousarray(
-                self._parent._pos.astype(np.float32))
+                self._parent._drawn(self._parent._pos).astype(np.float32))
             bake = True
 
-        if self._parent._changed['color']:
+        if self._parent._changed['color'] or appended:
             color, cmap = self._parent._interpret_color()
-            self._color = color
+            self._color = self._parent._drawn(color)
             bake = True
 
         if self._parent._changed['connect']:
@@ -457,6 +701,9 @@ class _AggLineVisual(Visual):
             V, idxs = self._agg_bake(self._pos, self._color)
             self._vbo.set_data(V)
             self._index_buffer.set_data(idxs)
+        self._parent._appended = None
+        for k in self._parent._changed:
+            self._parent._changed[k] = False
 
         # self._program.prepare()
         self.shared_program.bind(self._vbo)
@@ -548,3 +795,99 @@ class _AggLineVisual(Visual):
         V['color'] = color
 
         return V, idxs
+
+
+class _AggGPULineVisual(_AggLineVisual):
+    """Agg line drawn from the vertices of the line in a texture
+
+    Instead of the four vertices of the quad of each segment, with the
+    tangents, angles and distances baked by `_agg_bake`, only the vertices
+    and their distances along the line are uploaded, and the vertex shader
+    computes the rest from the vertices around each corner of the quads.
+    """
+
+    VERTEX_SHADER = (_AggLineVisual.VERTEX_SHADER
+                     .replace('attribute ', '')
+                     .replace('void main()', 'void agg_main()') +
+                     glsl.get('lines/agg_gpu.vert'))
+
+    def __init__(self, parent):
+        self._vertices_tex = gloo.Texture2D(
+            shape=(1, 1, 4), internalformat='rgba32f',
+            interpolation='nearest')
+        self._colors_tex = gloo.Texture2D(
+            shape=(1, 1, 4), internalformat='rgba32f',
+            interpolation='nearest')
+        self._corners = gloo.VertexBuffer()
+        self._n_vertices = None
+        _AggLineVisual.__init__(self, parent)
+        self.shared_program['u_vertices'] = self._vertices_tex
+        self.shared_program['u_colors'] = self._colors_tex
+        self.shared_program['a_corner'] = self._corners
+
+    def _upload(self, tex, data, uniform):
+        """Upload the rows of *data* to the texture *tex*"""
+        self.shared_program[uniform] = upload_texels(tex, data)
+
+    def _prepare_draw(self, view):
+        parent = self._parent
+        if parent._changed['pos'] or parent._changed['color'] or \
+                parent._appended is not None:
+            if parent._pos is None:
+                return False
+            pos = np.asarray(parent._drawn(parent._pos), np.float64)[:, :2]
+            n = len(pos)
+            if n < 2:
+                return False
+            if n > MAX_TEXELS:
+                raise ValueError('too many vertices (%d) for the agg_gpu '
+                                 'method, the maximum is %d'
+                                 % (n, MAX_TEXELS))
+            vertices = np.zeros((n, 4))
+            vertices[:, :2] = pos
+            lengths = np.sqrt((np.diff(pos, axis=0) ** 2).sum(axis=1))
+            np.cumsum(lengths, out=vertices[1:, 2])
+            self._upload(self._vertices_tex, vertices, 'u_vertices_shape')
+            self.shared_program['u_n_vertices'] = n
+            self.shared_program['u_length'] = vertices[-1, 2]
+
+            color = parent._drawn(parent._interpret_color()[0])
+            if color.ndim == 1:
+                color = color[np.newaxis]
+            elif len(color) != n:
+                raise ValueError('Color length %s does not match number of '
+                                 'vertices %s' % (len(color), n))
+            self._upload(self._colors_tex, color, 'u_colors_shape')
+
+            if n != self._n_vertices:
+                # the corners of the quads only depend on the number of
+                # vertices
+                self._n_vertices = n
+                corners = np.empty((n - 1, 4, 3), np.float32)
+                corners[:, :, 0] = np.arange(n - 1)[:, np.newaxis]
+                corners[:, 2:, 0] += 1
+                corners[:, :, 1] = [-1, -1, 1, 1]
+                corners[:, :, 2] = [-1, 1, -1, 1]
+                self._corners.set_data(corners.reshape(-1, 3))
+                index = np.resize(np.array([0, 1, 2, 1, 2, 3], np.uint32),
+                                  (n - 1) * 6)
+                index += np.repeat(4 * np.arange(n - 1, dtype=np.uint32), 6)
+                self._index_buffer.set_data(index)
+
+        if parent._changed['connect']:
+            if parent._connect not in [None, 'strip']:
+                raise NotImplementedError("Only 'strip' connection mode "
+                                          "allowed for agg-method lines.")
+        if self._n_vertices is None:
+            return False
+
+        uniforms = dict(closed=False, miter_limit=4.0, dash_phase=0.0,
+                        linewidth=parent._width)
+        for n, v in uniforms.items():
+            self.shared_program[n] = v
+        for n, v in self._U.items():
+            self.shared_program[n] = v
+        self.shared_program['u_dash_atlas'] = self._dash_atlas
+        parent._appended = None
+        for k in parent._changed:
+            parent._changed[k] = False
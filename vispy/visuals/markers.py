@@ -7,10 +7,12 @@
 Marker Visual and shader definitions.
 """
 
+import threading
+
 import numpy as np
 
 from ..color import ColorArray
-from ..gloo import VertexBuffer, _check_valid
+from ..gloo import IndexBuffer, VertexBuffer, _check_valid
 from .shaders import Function, Variable
 from .visual import Visual
 
@@ -482,15 +484,252 @@ _marker_dict = {
 marker_types = tuple(sorted(list(_marker_dict.keys())))
 
 
+# Per-marker attributes and their number of components, each stored in its
+# own vertex buffer so that they can be updated separately
+_attributes = (
+    ('a_position', 3),
+    ('a_fg_color', 4),
+    ('a_bg_color', 4),
+    ('a_size', 1),
+    ('a_edgewidth', 1),
+)
+
+
+def _parse_colors(color):
+    """RGBA colors from a color, a list of colors or an (N, 3) or (N, 4)
+    array, skipping the parsing of ColorArray for numeric arrays
+    """
+    if isinstance(color, np.ndarray) and color.ndim == 2 and \
+            color.shape[1] in (3, 4) and color.dtype.kind in 'fiu' and \
+            len(color) != 1:
+        if color.size and (color.min() < 0 or color.max() > 1):
+            raise ValueError('Color values must be between 0 and 1')
+        if color.shape[1] == 4:
+            return color
+        rgba = np.ones((len(color), 4), np.float32)
+        rgba[:, :3] = color
+        return rgba
+    color = ColorArray(color).rgba
+    return color[0] if len(color) == 1 else color
+
+
+def _interleave(x):
+    """Spread the 16 lower bits of the integers *x* to the even bits"""
+    x = x & 0xFFFF
+    x = (x | (x << 8)) & 0x00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F
+    x = (x | (x << 2)) & 0x33333333
+    x = (x | (x << 1)) & 0x55555555
+    return x
+
+
+def _ranges(starts, stops):
+    """The concatenation of the ranges from *starts* to *stops*"""
+    lengths = stops - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    if len(starts) == 0:
+        return np.zeros(0, np.intp)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class _MarkersLOD(object):
+    """Quadtree over 2D points for level-of-detail drawing
+
+    The points are ranked by the coarsest level of the quadtree at which
+    they are the first point (in Morton order) of their cell, so the points
+    of rank <= l are one point per occupied cell of the level l grid, which
+    has 2 ** l cells along each axis. Within a rank, the points are sorted
+    in Morton order, so the points of a cell are contiguous.
+
+    Parameters
+    ----------
+    pos : ndarray
+        The (N, 2) positions of the points.
+    """
+
+    # Maximum number of cells looked up to cull the points of a rank
+    max_cells = 1 << 22
+
+    def __init__(self, pos):
+        n = len(pos)
+        # the finest grid has about 4 points per cell on average
+        self.max_level = int(np.clip(np.ceil(np.log2(max(n, 1)) / 2) - 1,
+                                     0, 16))
+        res = 1 << self.max_level
+        self.lo = pos.min(axis=0).astype(np.float64)
+        self.extent = pos.max(axis=0) - self.lo
+        self.extent[self.extent == 0] = 1.
+        ij = np.minimum(((pos - self.lo) * (res / self.extent)
+                         ).astype(np.uint32), res - 1)
+        morton = _interleave(ij[:, 0]) | (_interleave(ij[:, 1]) << 1)
+        del ij
+        sort = np.argsort(morton)
+        morton = morton[sort]
+
+        # The level at which consecutive points fall in different cells is
+        # given by the highest differing pair of bits of their codes
+        rank = np.zeros(n, np.uint8)
+        diff = morton[1:] ^ morton[:-1]
+        bit = np.frexp(diff.astype(np.float64))[1] - 1
+        rank[1:] = np.where(diff == 0, self.max_level + 1,
+                            self.max_level - bit // 2)
+        del diff, bit
+
+        # a stable sort keeps the Morton order within ranks
+        key = np.argsort(rank, kind='stable')
+        rank = rank[key]
+        self.order = sort[key].astype(np.uint32)
+        # the code of the cell of each point at the level of its rank
+        shift = 2 * (self.max_level - np.minimum(rank, self.max_level))
+        self.cells = morton[key] >> shift.astype(np.uint32)
+        self.starts = np.searchsorted(rank, np.arange(self.max_level + 3))
+
+    def indices(self, level, rect=None):
+        """The indices of the points of rank <= *level* in the cells
+        intersecting *rect*
+
+        Parameters
+        ----------
+        level : int
+            The level of detail, up to ``max_level + 1`` for all points.
+        rect : tuple | None
+            The (x0, y0, x1, y1) rectangle, or None for all points.
+        """
+        parts = []
+        for rank in range(min(level, self.max_level + 1) + 1):
+            a, b = self.starts[rank], self.starts[rank + 1]
+            if a == b:
+                continue
+            n = 1 << min(rank, self.max_level)
+            if rect is not None:
+                c0, r0 = np.floor((np.asarray(rect[:2]) - self.lo) *
+                                  (n / self.extent)).astype(np.int64)
+                c1, r1 = np.floor((np.asarray(rect[2:]) - self.lo) *
+                                  (n / self.extent)).astype(np.int64)
+                if c1 < 0 or r1 < 0 or c0 >= n or r0 >= n:
+                    continue
+                c0, r0 = max(c0, 0), max(r0, 0)
+                c1, r1 = min(c1, n - 1), min(r1, n - 1)
+            if rect is None or (c1 - c0 + 1 == n and r1 - r0 + 1 == n) or \
+                    (c1 - c0 + 1) * (r1 - r0 + 1) > self.max_cells:
+                parts.append(self.order[a:b])
+                continue
+            cols = _interleave(np.arange(c0, c1 + 1, dtype=np.uint32))
+            rows = _interleave(np.arange(r0, r1 + 1, dtype=np.uint32)) << 1
+            codes = np.sort((rows[:, np.newaxis] | cols).ravel()
+                            ).astype(np.int64)
+            cells = self.cells[a:b]
+            index = _ranges(np.searchsorted(cells, codes),
+                            np.searchsorted(cells, codes + 1))
+            parts.append(self.order[a + index])
+        if not parts:
+            return np.zeros(0, np.uint32)
+        return np.concatenate(parts)
+
+
+class _DepthSorter(object):
+    """Sort markers back to front, starting from their previous order
+
+    Sorting from the previous order is fast when the view changed a little,
+    as the markers are then nearly sorted.
+
+    Parameters
+    ----------
+    threaded : bool
+        Whether to sort in a worker thread.
+    """
+
+    def __init__(self, threaded):
+        self.threaded = threaded
+        self.order = None
+        self._thread = None
+        self._result = None
+
+    @property
+    def busy(self):
+        """Whether a sort is in progress"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def sort(self, depth):
+        """Start sorting the markers by decreasing *depth()*"""
+        order = self.order
+        if not self.threaded:
+            self._result = _depth_order(depth(), order)
+            return
+
+        def run():
+            self._result = _depth_order(depth(), order)
+        self._thread = threading.Thread(target=run, name='MarkersSorter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def collect(self):
+        """Return True if a new order is available in `order`"""
+        if self.busy or self._result is None:
+            return False
+        self.order, self._result = self._result, None
+        self._thread = None
+        return True
+
+    def wait(self):
+        """Wait for the sort in progress to finish"""
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _depth_order(depth, order):
+    """The indices of the markers by decreasing *depth*, sorted from
+    *order*"""
+    if order is None or len(order) != len(depth):
+        order = np.arange(len(depth), dtype=np.uint32)
+    # timsort, which numpy uses for stable sorts, is fast on nearly sorted
+    # data
+    return order[np.argsort(-depth[order], kind='stable')]
+
+
+def _linear_depth(pos, matrix):
+    """The normalized depth of *pos* mapped by the 4x4 *matrix*"""
+    zw = np.dot(pos, matrix[:3, 2:]) + matrix[3, 2:]
+    return zw[:, 0] / zw[:, 1]
+
+
 class MarkersVisual(Visual):
     """ Visual displaying marker symbols.
+
+    Parameters
+    ----------
+    lod : float | None
+        If not None, only draw about one marker per square of `lod` pixels
+        (see the `lod` property).
+    depth_sort : bool | str
+        Whether to draw the markers back to front (see the `depth_sort`
+        property).
+    **kwargs : dict
+        Keyword arguments to pass to `set_data`.
     """
-    def __init__(self, **kwargs):
-        self._vbo = VertexBuffer()
+    def __init__(self, lod=None, depth_sort=False, **kwargs):
+        self._vbos = dict((name, VertexBuffer()) for name, _ in _attributes)
         self._v_size_var = Variable('varying float v_size')
         self._symbol = None
         self._marker_fun = None
         self._data = None
+        # attributes to upload entirely, and (start, stop) ranges of the
+        # others to upload on the next draw
+        self._need_upload = set()
+        self._dirty_ranges = {}
+        self._lod_size = None
+        self._lod = None
+        self._lod_key = None
+        self._lod_indices = None
+        self._sorter = None
+        self._sort_key = None
+        self._depth_sort_angle = 1.
+        # incremented when the positions change
+        self._generation = 0
+        # the number of indices uploaded, None if they must be uploaded
+        self._index_count = None
         self.antialias = 1
         self.scaling = False
         Visual.__init__(self, vcode=vert, fcode=frag)
@@ -502,6 +741,8 @@ class MarkersVisual(Visual):
         if len(kwargs) > 0:
             self.set_data(**kwargs)
         self.freeze()
+        self.lod = lod
+        self.depth_sort = depth_sort
 
     def set_data(self, pos=None, symbol='o', size=10., edge_width=1.,
                  edge_width_rel=None, edge_color='black', face_color='white',
@@ -533,6 +774,9 @@ class MarkersVisual(Visual):
         Allowed style strings are: disc, arrow, ring, clobber, square, diamond,
         vbar, hbar, cross, tailed_arrow, x, triangle_up, triangle_down,
         and star.
+
+        To move the markers or change some of their attributes without
+        uploading the others, use `update_data`.
         """
         if (edge_width is not None) + (edge_width_rel is not None) != 1:
             raise ValueError('exactly one of edge_width and edge_width_rel '
@@ -546,43 +790,204 @@ class MarkersVisual(Visual):
         self.symbol = symbol
         self.scaling = scaling
 
-        edge_color = ColorArray(edge_color).rgba
-        if len(edge_color) == 1:
-            edge_color = edge_color[0]
-
-        face_color = ColorArray(face_color).rgba
-        if len(face_color) == 1:
-            face_color = face_color[0]
+        edge_color = _parse_colors(edge_color)
+        face_color = _parse_colors(face_color)
 
         if pos is not None:
             assert (isinstance(pos, np.ndarray) and
                     pos.ndim == 2 and pos.shape[1] in (2, 3))
 
             n = len(pos)
-            data = np.zeros(n, dtype=[('a_position', np.float32, 3),
-                                      ('a_fg_color', np.float32, 4),
-                                      ('a_bg_color', np.float32, 4),
-                                      ('a_size', np.float32),
-                                      ('a_edgewidth', np.float32)])
-            data['a_fg_color'] = edge_color
-            data['a_bg_color'] = face_color
+            data = dict((name, np.zeros((n, c) if c > 1 else n, np.float32))
+                        for name, c in _attributes)
+            data['a_fg_color'][:] = edge_color
+            data['a_bg_color'][:] = face_color
             if edge_width is not None:
-                data['a_edgewidth'] = edge_width
+                data['a_edgewidth'][:] = edge_width
             else:
-                data['a_edgewidth'] = size*edge_width_rel
+                data['a_edgewidth'][:] = size*edge_width_rel
             data['a_position'][:, :pos.shape[1]] = pos
-            data['a_size'] = size
+            data['a_size'][:] = size
             self.shared_program['u_antialias'] = self.antialias  # XXX make prop
             self._data = data
-            if self._symbol is not None:
-                # If we have no symbol set, we skip drawing (_prepare_draw
-                # returns False). This causes the GLIR queue to not flush,
-                # and thus the GLIR queue fills with VBO DATA commands, resulting
-                # in a "memory leak". Thus only set the VertexBuffer data if we
-                # are actually going to draw.
-                self._vbo.set_data(data)
-                self.shared_program.bind(self._vbo)
+            # The data is uploaded when drawing: if no symbol is set, drawing
+            # is skipped (_prepare_draw returns False), which does not flush
+            # the GLIR queue, so uploading here would fill the queue with
+            # VBO DATA commands (a "memory leak").
+            self._need_upload = set(data)
+            self._dirty_ranges.clear()
+            self._lod = None
+            self._generation += 1
+            self._index_count = None
+
+        self.update()
+
+    def update_data(self, pos=None, size=None, edge_width=None,
+                    edge_color=None, face_color=None, offset=0):
+        """ Update some attributes of the markers, leaving the others as is.
+
+        Only the given attributes of the updated markers are uploaded, e.g.
+        updating the positions of points with fixed sizes and colors does
+        not upload the sizes and colors again. The updates made between two
+        draws are uploaded at once.
+
+        Parameters
+        ----------
+        pos : array | None
+            The new locations of the markers.
+        size : float | array | None
+            The new sizes, in px.
+        edge_width : float | array | None
+            The new widths of the outlines, in px.
+        edge_color : Color | ColorArray | None
+            The new colors of the outlines.
+        face_color : Color | ColorArray | None
+            The new colors of the interiors.
+        offset : int
+            The index of the first marker to update. The markers from
+            `offset` to `offset` plus the length of the given arrays are
+            updated, or to the last marker if only single values are given.
 
+        Notes
+        -----
+        The number of markers cannot be changed, use `set_data` for that.
+        """
+        if self._data is None:
+            raise RuntimeError('set_data() must be called before '
+                               'update_data()')
+        values = {}
+        if pos is not None:
+            pos = np.asarray(pos)
+            if pos.ndim != 2 or pos.shape[1] not in (2, 3):
+                raise ValueError('pos must have shape (N, 2) or (N, 3), '
+                                 'not %s' % (pos.shape,))
+            values['a_position'] = pos
+            self._lod = None
+            self._generation += 1
+        if size is not None:
+            values['a_size'] = np.asarray(size)
+        if edge_width is not None:
+            edge_width = np.asarray(edge_width)
+            if (edge_width < 0).any():
+                raise ValueError('edge_width cannot be negative')
+            values['a_edgewidth'] = edge_width
+        if edge_color is not None:
+            values['a_fg_color'] = _parse_colors(edge_color)
+        if face_color is not None:
+            values['a_bg_color'] = _parse_colors(face_color)
+
+        n = len(self._data['a_position'])
+        offset = int(offset)
+        # single values have one dimension less than per-marker arrays
+        components = dict(_attributes)
+        lengths = set(len(v) for name, v in values.items()
+                      if v.ndim == (2 if components[name] > 1 else 1))
+        if len(lengths) > 1:
+            raise ValueError('the arrays must have the same length, got %s'
+                             % sorted(lengths))
+        stop = offset + lengths.pop() if lengths else n
+        if offset < 0 or stop > n:
+            raise ValueError('markers %d to %d are out of range for %d '
+                             'markers' % (offset, stop, n))
+
+        for name, value in values.items():
+            column = self._data[name]
+            if name == 'a_position':
+                column[offset:stop, pos.shape[1]:] = 0
+                column[offset:stop, :pos.shape[1]] = value
+            else:
+                column[offset:stop] = value
+            if name in self._need_upload:
+                continue
+            if name in self._dirty_ranges:
+                start, end = self._dirty_ranges[name]
+                self._dirty_ranges[name] = (min(start, offset),
+                                            max(end, stop))
+            else:
+                self._dirty_ranges[name] = (offset, stop)
+        if pos is not None:
+            self._bounds_changed()
+        self.update()
+
+    @property
+    def lod(self):
+        """The size in pixels of the squares of which one marker is drawn
+
+        If not None, a quadtree of the markers is built on the next draw
+        and the markers are drawn from its finest level whose cells are at
+        most `lod` pixels wide on screen, so zooming out draws fewer markers
+        and zooming in draws more of them, until all are drawn. In 2D views
+        the markers outside of the view are not drawn either. Only the
+        indices of the drawn markers are uploaded when the view changes.
+
+        Notes
+        -----
+        The quadtree is built in the x-y plane of the markers, so this is
+        meant for 2D plots. Building it takes a few seconds for tens of
+        millions of markers, and is done again when the positions change.
+        The indices are 32-bit integers, which OpenGL ES 2.0 only supports
+        with the OES_element_index_uint extension.
+        """
+        return self._lod_size
+
+    @lod.setter
+    def lod(self, lod):
+        if lod is not None:
+            lod = float(lod)
+            if lod <= 0:
+                raise ValueError('lod must be positive, not %s' % lod)
+        self._lod_size = lod
+        self._lod_key = None
+        self._lod_indices = None
+        self._reset_indices()
+
+    @property
+    def depth_sort(self):
+        """Whether the markers are drawn back to front
+
+        Translucent markers are only blended correctly when drawn from the
+        farthest to the nearest. If True, the markers are sorted by depth
+        when drawing and again when the direction of view changes by more
+        than `depth_sort_angle` degrees, starting from the previous order.
+        If 'thread', the markers are sorted in a worker thread, and drawn
+        in their previous order until it is done. Only the indices of the
+        markers are uploaded when the order changes.
+        """
+        if self._sorter is None:
+            return False
+        return 'thread' if self._sorter.threaded else True
+
+    @depth_sort.setter
+    def depth_sort(self, depth_sort):
+        if depth_sort not in (False, True, 'thread'):
+            raise ValueError("depth_sort must be True, False or 'thread', "
+                             "not %r" % (depth_sort,))
+        self._sorter = None
+        if depth_sort:
+            self._sorter = _DepthSorter(threaded=depth_sort == 'thread')
+        self._sort_key = None
+        self._reset_indices()
+
+    @property
+    def depth_sort_angle(self):
+        """The change of the direction of view, in degrees, above which the
+        markers are sorted again"""
+        return self._depth_sort_angle
+
+    @depth_sort_angle.setter
+    def depth_sort_angle(self, angle):
+        angle = float(angle)
+        if angle < 0:
+            raise ValueError('depth_sort_angle cannot be negative')
+        self._depth_sort_angle = angle
+        self.update()
+
+    def _reset_indices(self):
+        """Select the markers to draw again on the next draw"""
+        self._index_buffer = None
+        if self._lod_size is not None or self._sorter is not None:
+            self._index_buffer = IndexBuffer()
+        self._index_count = None
         self.update()
 
     @property
@@ -593,16 +998,6 @@ class MarkersVisual(Visual):
     def symbol(self, symbol):
         if symbol == self._symbol:
             return
-        if (symbol is not None and self._symbol is None and
-                self._data is not None):
-            # Allow user to configure symbol after a set_data call with
-            # symbol=None. This can break down if the user does a consecutive
-            # marker.symbol = 'disc'
-            # marker.symbol = None
-            # without drawing. At this point the memory leaking ensues
-            # but this case is unlikely/makes no sense.
-            self._vbo.set_data(self._data)
-            self.shared_program.bind(self._vbo)
         self._symbol = symbol
         if symbol is None:
             self._marker_fun = None
@@ -617,16 +1012,152 @@ class MarkersVisual(Visual):
         xform = view.transforms.get_transform()
         view.view_program.vert['transform'] = xform
 
+    def _upload_data(self):
+        """Upload the attributes set or updated since the last draw"""
+        for name in self._need_upload:
+            self._vbos[name].set_data(self._data[name])
+            self.shared_program[name] = self._vbos[name]
+        for name, (start, stop) in self._dirty_ranges.items():
+            self._vbos[name].set_subdata(self._data[name][start:stop],
+                                         offset=start)
+        self._need_upload = set()
+        self._dirty_ranges.clear()
+
+    def _update_lod(self, view, scale):
+        """Select the markers to draw at this zoom level
+
+        Returns True if the selection changed.
+        """
+        if self._lod is None:
+            self._lod = _MarkersLOD(self._data['a_position'][:, :2])
+            self._lod_key = None
+        lod = self._lod
+        lo, extent = lod.lo, lod.extent
+
+        # the mapping of the bounding box of the markers to the framebuffer
+        tr = view.transforms.get_transform('visual', 'framebuffer')
+        mapped = tr.map(np.array([lo, lo + (extent[0], 0.),
+                                  lo + (0., extent[1])]))
+        affine = np.allclose(mapped[:, 3], mapped[0, 3])
+        mapped = mapped[:, :2] / mapped[:, 3:]
+        axes = mapped[1:] - mapped[0]
+        size = np.sqrt((axes ** 2).sum(axis=1)).max()
+        if not np.isfinite(size):
+            level = lod.max_level + 1
+        else:
+            level = int(np.ceil(np.log2(max(size / self._lod_size, 1))))
+            level = min(level, lod.max_level + 1)
+
+        # Without perspective, the x-y plane of the markers is mapped to the
+        # framebuffer by an affine transform, which is inverted to find the
+        # part of the plane in the view, plus the half size of the markers
+        # (which are drawn in squares 4 pixels larger than their size).
+        rect = None
+        axes = axes.T / extent
+        if affine and abs(np.linalg.det(axes)) > 1e-30:
+            margin = (self._data['a_size'].max() *
+                      view.transforms.pixel_scale * scale + 4) / 2. + 1
+            fb = view.transforms.get_transform('render', 'framebuffer')
+            bounds = fb.map([[-1, -1], [1, 1]])[:, :2]
+            x0, y0 = bounds.min(axis=0) - margin
+            x1, y1 = bounds.max(axis=0) + margin
+            corners = np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]])
+            corners = lo + np.linalg.solve(axes, (corners - mapped[0]).T).T
+            if np.isfinite(corners).all():
+                rect = np.concatenate([corners.min(axis=0),
+                                       corners.max(axis=0)])
+
+        if rect is not None:
+            # snap the rectangle to cells 16 times as large as the drawn
+            # ones, so panning only uploads indices once in a while
+            cell = extent / (1 << max(min(level, lod.max_level) - 4, 0))
+            r0 = np.floor((rect[:2] - lo) / cell)
+            r1 = np.ceil((rect[2:] - lo) / cell)
+            key = (level,) + tuple(r0.astype(int)) + tuple(r1.astype(int))
+            rect = tuple(lo + r0 * cell) + tuple(lo + r1 * cell)
+        else:
+            key = (level,)
+        if key == self._lod_key:
+            return False
+        self._lod_indices = lod.indices(level, rect)
+        self._lod_key = key
+        return True
+
+    def _update_order(self, view):
+        """Sort the markers by depth when the direction of view changed
+
+        Returns True if the order changed.
+        """
+        sorter = self._sorter
+        tr = view.transforms.get_transform('visual', 'render')
+        ray = tr.imap([[0, 0, -1], [0, 0, 1]])
+        ray = ray[1, :3] / ray[1, 3] - ray[0, :3] / ray[0, 3]
+        direction = ray / np.sqrt((ray ** 2).sum())
+        key = self._sort_key
+        if not sorter.busy and (
+                key is None or key[0] != self._generation or
+                np.dot(key[1], direction) <
+                np.cos(np.radians(self._depth_sort_angle))):
+            pos = self._data['a_position']
+            if tr.Linear:
+                # the mapping is done in the sorting thread, if any
+                matrix = tr.map(np.eye(4))
+                sorter.sort(lambda: _linear_depth(pos, matrix))
+            else:
+                mapped = tr.map(pos)
+                depth = mapped[:, 2] / mapped[:, 3]
+                sorter.sort(lambda: depth)
+            self._sort_key = (self._generation, direction)
+        if sorter.busy:
+            # Draw again when the markers are sorted
+            self.update()
+        return sorter.collect()
+
+    def _update_indices(self, view, scale):
+        """Upload the indices of the markers to draw, selected by level of
+        detail and sorted by depth
+
+        Returns False if no marker is to be drawn.
+        """
+        changed = False
+        if self._lod_size is not None:
+            changed |= self._update_lod(view, scale)
+        if self._sorter is not None:
+            changed |= self._update_order(view)
+        if not changed and self._index_count is not None:
+            return self._index_count > 0
+
+        indices, order = self._lod_indices, None
+        if self._sorter is not None:
+            order = self._sorter.order
+        if order is not None and len(order) == len(self._data['a_size']):
+            if indices is None:
+                indices = order
+            else:
+                selected = np.zeros(len(order), bool)
+                selected[indices] = True
+                indices = order[selected[order]]
+        elif indices is None:
+            indices = np.arange(len(self._data['a_size']), dtype=np.uint32)
+        self._index_count = len(indices)
+        if len(indices):
+            self._index_buffer.set_data(indices)
+        return self._index_count > 0
+
     def _prepare_draw(self, view):
-        if self._symbol is None:
+        if self._symbol is None or self._data is None:
             return False
+        self._upload_data()
         view.view_program['u_px_scale'] = view.transforms.pixel_scale
         if self.scaling:
             tr = view.transforms.get_transform('visual', 'document').simplified
             scale = np.linalg.norm((tr.map([1, 0]) - tr.map([0, 0]))[:2])
-            view.view_program['u_scale'] = scale
         else:
-            view.view_program['u_scale'] = 1
+            scale = 1
+        view.view_program['u_scale'] = scale
+        if self._index_buffer is not None:
+            return (len(self._data['a_position']) > 0 and
+                    self._update_indices(view, scale))
 
     def _compute_bounds(self, axis, view):
         pos = self._data['a_position']
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+A visual drawing many independent lines in a single draw call.
+
+The vertices of all the lines are given one line after the other, with the
+number of vertices of each line. They are stored, with the index of their
+line, in a float texture which the vertex shader reads to expand each
+segment into a quad. The colors, widths and visibility of the lines are
+small per-line tables in two other textures, so that changing them, or the
+vertices of a single line, only uploads what changed.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from ..gloo import IndexBuffer, Texture2D, VertexBuffer
+from ..color import ColorArray
+from .visual import Visual
+from .multichannel_image import _apply_settings
+from ._texels import MAX_TEXELS, upload_texels, write_texels
+
+VERT_SHADER = """
+uniform sampler2D u_vertices;  // x, y, z and index of the line
+uniform sampler2D u_colors;
+uniform sampler2D u_styles;  // width and visibility of the lines
+uniform vec2 u_vertices_shape;  // (width, height) of the textures
+uniform vec2 u_lines_shape;
+uniform vec2 u_ndc_px;  // framebuffer pixels per NDC unit
+uniform float u_px_scale;
+uniform float u_antialias;
+
+// index of the vertex, of the other vertex of the segment, and side of
+// the line
+attribute vec3 a_corner;
+
+varying vec4 v_color;
+varying float v_distance;  // to the middle of the line, in px
+varying float v_half_width;
+
+#include "misc/texel.glsl"
+
+void main() {
+    vec4 vertex = texel(u_vertices, u_vertices_shape, a_corner.x);
+    vec4 other = texel(u_vertices, u_vertices_shape, a_corner.y);
+    vec4 style = texel(u_styles, u_lines_shape, vertex.w);
+    if (style.y == 0.0) {
+        // hidden line, outside of the clipping volume
+        gl_Position = vec4(0.0, 0.0, 2.0, 1.0);
+        return;
+    }
+    v_color = texel(u_colors, u_lines_shape, vertex.w);
+
+    vec4 pos = $transform(vec4(vertex.xyz, 1.0));
+    vec4 end = $transform(vec4(other.xyz, 1.0));
+    // the direction of the segment in px, from its first vertex to its last
+    vec2 dir = (end.xy / end.w - pos.xy / pos.w) * u_ndc_px;
+    float first = a_corner.x < a_corner.y ? 1.0 : -1.0;
+    dir *= first;
+    float len = length(dir);
+    dir = len > 0.0 ? dir / len : vec2(1.0, 0.0);
+
+    v_half_width = style.x * u_px_scale / 2.0;
+    v_distance = a_corner.z * (v_half_width + u_antialias);
+    // square caps, which also fill the joins of the segments
+    vec2 offset = vec2(-dir.y, dir.x) * v_distance -
+                  dir * first * v_half_width;
+    gl_Position = vec4(pos.xy + offset / u_ndc_px * pos.w, pos.zw);
+}
+"""
+
+FRAG_SHADER = """
+uniform float u_antialias;
+
+varying vec4 v_color;
+varying float v_distance;
+varying float v_half_width;
+
+void main() {
+    float alpha = 1.0;
+    if (u_antialias > 0.0) {
+        alpha = clamp((v_half_width - abs(v_distance)) / u_antialias + 0.5,
+                      0.0, 1.0);
+    } else if (abs(v_distance) > v_half_width) {
+        discard;
+    }
+    gl_FragColor = vec4(v_color.rgb, v_color.a * alpha);
+}
+"""
+
+
+class MultiLineVisual(Visual):
+    """Visual drawing many independent lines in a single draw call
+
+    Each segment is drawn as a quad computed by the vertex shader from the
+    vertices of the lines, stored in a texture, so that the lines have
+    their own color, width and visibility without building a ``connect``
+    array or one visual per line. The segments have square caps and are
+    not joined, which is not visible for thin or opaque lines.
+
+    Parameters
+    ----------
+    pos : array | list of arrays | None
+        The (N, 2) or (N, 3) vertices of all the lines, one line after the
+        other, or a list of the vertices of each line.
+    lengths : array | None
+        The number of vertices of each line, when *pos* is an array. By
+        default, *pos* is a single line.
+    offsets : array | None
+        The index of the first vertex of each line in *pos*, starting at 0,
+        instead of *lengths*.
+    color : color | array
+        The color of all the lines, or one color per line.
+    width : float | array
+        The width of all the lines in px, or one width per line.
+    line_visible : bool | array
+        Whether all the lines are drawn, or whether each line is drawn.
+    antialias : float
+        The width of the antialiased edges of the lines in px, or 0 to not
+        antialias the lines.
+    **kwargs : dict
+        Keyword arguments to pass to `Visual`.
+
+    Notes
+    -----
+    The vertices are stored as float32, up to 2 ** 24 of them. Changing
+    the vertices of all the lines without changing their lengths, or the
+    vertices of one line with `set_line`, does not rebuild the segments.
+    """
+
+    def __init__(self, pos=None, lengths=None, offsets=None, color='white',
+                 width=1., line_visible=True, antialias=1., **kwargs):
+        self._vertices = np.zeros((0, 4), np.float32)
+        self._ndim = 2
+        self._lengths = np.zeros(0, np.int64)
+        self._offsets = np.zeros(0, np.int64)
+        self._line_bounds = np.zeros((0, 2, 3))
+        self._colors = np.zeros((0, 4), np.float32)
+        self._styles = np.zeros((0, 4), np.float32)
+        self._n_segments = 0
+        # per-line settings applied when the number of lines changes
+        self._settings = dict(color=color, width=width,
+                              line_visible=line_visible)
+        self._vertices_tex = Texture2D(
+            shape=(1, 1, 4), internalformat='rgba32f',
+            interpolation='nearest')
+        self._colors_tex = Texture2D(
+            shape=(1, 1, 4), internalformat='rgba32f',
+            interpolation='nearest')
+        self._styles_tex = Texture2D(
+            shape=(1, 1, 4), internalformat='rgba32f',
+            interpolation='nearest')
+        self._corners = VertexBuffer(np.zeros((0, 3), np.float32))
+
+        super(MultiLineVisual, self).__init__(vcode=VERT_SHADER,
+                                              fcode=FRAG_SHADER, **kwargs)
+        self._index_buffer = IndexBuffer()
+        self.set_gl_state('translucent', cull_face=False)
+        self._draw_mode = 'triangles'
+        self.shared_program['u_vertices'] = self._vertices_tex
+        self.shared_program['u_colors'] = self._colors_tex
+        self.shared_program['u_styles'] = self._styles_tex
+        self.shared_program['a_corner'] = self._corners
+        self.antialias = antialias
+
+        self.set_data(pos, lengths, offsets)
+        self.freeze()
+
+    def set_data(self, pos=None, lengths=None, offsets=None, color=None,
+                 width=None, line_visible=None):
+        """Set the vertices of the lines and their styles
+
+        Changing the number of lines resets their colors, widths and
+        visibility to the values given when creating the visual, when these
+        have one value per line or a single one, and to the defaults
+        otherwise.
+
+        Parameters
+        ----------
+        pos : array | list of arrays | None
+            The (N, 2) or (N, 3) vertices of all the lines, or a list of
+            the vertices of each line. None keeps the vertices.
+        lengths : array | None
+            The number of vertices of each line, when *pos* is an array.
+        offsets : array | None
+            The index of the first vertex of each line in *pos*, instead of
+            *lengths*.
+        color : color | array | None
+            The color of all the lines, or one color per line.
+        width : float | array | None
+            The width of all the lines in px, or one width per line.
+        line_visible : bool | array | None
+            Whether all the lines are drawn, or whether each line is drawn.
+        """
+        if pos is not None:
+            self._set_pos(pos, lengths, offsets)
+        elif lengths is not None or offsets is not None:
+            raise ValueError('lengths and offsets need pos')
+        for name, value in (('color', color), ('width', width),
+                            ('line_visible', line_visible)):
+            if value is not None:
+                setattr(self, name, value)
+
+    def _set_pos(self, pos, lengths, offsets):
+        if isinstance(pos, (list, tuple)) and lengths is None and \
+                offsets is None:
+            if len(pos) == 0:
+                pos = np.zeros((0, 2))
+            lengths = [len(line) for line in pos]
+            pos = np.concatenate([np.asarray(line, np.float64).reshape(
+                len(line), -1) for line in pos] or [np.zeros((0, 2))])
+        pos = np.asarray(pos, np.float32)
+        if pos.ndim != 2 or pos.shape[1] not in (2, 3):
+            raise ValueError('pos must be an (N, 2) or (N, 3) array, not %s'
+                             % (pos.shape,))
+        if len(pos) > MAX_TEXELS:
+            raise ValueError('too many vertices (%d), the maximum is %d'
+                             % (len(pos), MAX_TEXELS))
+        if lengths is not None and offsets is not None:
+            raise ValueError('only one of lengths and offsets can be given')
+        if offsets is not None:
+            offsets = np.asarray(offsets, np.int64).ravel()
+            if len(offsets) and offsets[0] != 0:
+                raise ValueError('the first offset must be 0')
+            lengths = np.diff(np.append(offsets, len(pos)))
+        elif lengths is None:
+            lengths = [len(pos)] if len(pos) else []
+        lengths = np.asarray(lengths, np.int64).ravel()
+        if (lengths < 0).any() or lengths.sum() != len(pos):
+            raise ValueError('the lengths or offsets of the lines do not '
+                             'match the %d vertices' % len(pos))
+
+        n_lines = len(lengths)
+        vertices = np.zeros((len(pos), 4), np.float32)
+        vertices[:, :pos.shape[1]] = pos
+        vertices[:, 3] = np.repeat(np.arange(n_lines), lengths)
+        self._vertices = vertices
+        self._ndim = pos.shape[1]
+        self._upload(self._vertices_tex, vertices, 'u_vertices_shape')
+
+        if not np.array_equal(lengths, self._lengths):
+            self._lengths = lengths
+            self._offsets = np.cumsum(lengths) - lengths
+            self._build_segments()
+        self._line_bounds = np.empty((n_lines, 2, 3))
+        full = lengths > 0
+        self._line_bounds[~full] = [[np.inf] * 3, [-np.inf] * 3]
+        starts = self._offsets[full]
+        self._line_bounds[full, 0] = np.minimum.reduceat(vertices[:, :3],
+                                                         starts)
+        self._line_bounds[full, 1] = np.maximum.reduceat(vertices[:, :3],
+                                                         starts)
+        self._bounds_changed()
+
+        if n_lines != len(self._colors):
+            self._colors = np.zeros((n_lines, 4), np.float32)
+            self._styles = np.zeros((n_lines, 4), np.float32)
+            _apply_settings(self, self._settings,
+                            (('color', 'white'), ('width', 1.),
+                             ('line_visible', True)))
+        self.update()
+
+    def _build_segments(self):
+        """Build the quads of the segments between consecutive vertices of
+        the same line"""
+        line = self._vertices[:, 3]
+        first = np.nonzero(line[1:] == line[:-1])[0].astype(np.float32)
+        n = len(first)
+        corners = np.empty((n, 4, 3), np.float32)
+        corners[:, :, 0] = first[:, np.newaxis]
+        corners[:, 2:, 0] += 1
+        corners[:, :2, 1] = corners[:, 2:3, 0]
+        corners[:, 2:, 1] = corners[:, :1, 0]
+        corners[:, :, 2] = [-1, 1, -1, 1]
+        self._corners.set_data(corners.reshape(-1, 3))
+        index = np.resize(np.array([0, 1, 2, 1, 2, 3], np.uint32), n * 6)
+        index += np.repeat(4 * np.arange(n, dtype=np.uint32), 6)
+        self._index_buffer.set_data(index)
+        self._n_segments = n
+
+    def _upload(self, tex, data, uniform):
+        """Upload the rows of *data* to the texture *tex*"""
+        self.shared_program[uniform] = upload_texels(tex, data)
+
+    def _per_line(self, value, name, dtype):
+        """One value per line from a single value or a sequence"""
+        value = np.asarray(value, dtype)
+        n = len(self._lengths)
+        if value.ndim == 1 and len(value) in (1, n):
+            return np.resize(value, n)
+        if value.ndim != 0:
+            raise ValueError('%s must have one value per line (%d), not %s'
+                             % (name, n, value.shape))
+        return np.full(n, value, dtype)
+
+    def set_line(self, index, pos=None, color=None, width=None,
+                 visible=None):
+        """Change one line, uploading only what changed
+
+        Parameters
+        ----------
+        index : int
+            The index of the line.
+        pos : array | None
+            The new vertices of the line, as many as it has.
+        color : color | None
+            The new color of the line.
+        width : float | None
+            The new width of the line in px.
+        visible : bool | None
+            Whether the line is drawn.
+        """
+        n_lines = len(self._lengths)
+        if not -n_lines <= index < n_lines:
+            raise IndexError('line %d out of range for %d lines'
+                             % (index, n_lines))
+        index = int(index) % n_lines
+        if pos is not None:
+            pos = np.asarray(pos, np.float32)
+            length = self._lengths[index]
+            if pos.ndim != 2 or len(pos) != length or \
+                    pos.shape[1] not in (2, 3):
+                raise ValueError('pos must be a (%d, 2) or (%d, 3) array, '
+                                 'not %s' % (length, length, pos.shape))
+            start = self._offsets[index]
+            vertices = self._vertices[start:start + length]
+            vertices[:, :pos.shape[1]] = pos
+            vertices[:, pos.shape[1]:3] = 0
+            self._ndim = max(self._ndim, pos.shape[1])
+            write_texels(self._vertices_tex, start, vertices)
+            if length:
+                self._line_bounds[index] = (vertices[:, :3].min(axis=0),
+                                            vertices[:, :3].max(axis=0))
+            self._bounds_changed()
+        if color is not None:
+            color = ColorArray(color).rgba
+            if len(color) != 1:
+                raise ValueError('color must be a single color')
+            self._colors[index] = color[0]
+        if width is not None:
+            if width < 0:
+                raise ValueError('width must be positive, not %s' % width)
+            self._styles[index, 0] = width
+        if visible is not None:
+            self._styles[index, 1] = bool(visible)
+        if color is not None:
+            write_texels(self._colors_tex, index,
+                         self._colors[index:index + 1])
+        if width is not None or visible is not None:
+            write_texels(self._styles_tex, index,
+                         self._styles[index:index + 1])
+        self.update()
+
+    @property
+    def pos(self):
+        """The vertices of all the lines, one line after the other"""
+        return self._vertices[:, :self._ndim].copy()
+
+    @property
+    def n_lines(self):
+        """The number of lines"""
+        return len(self._lengths)
+
+    @property
+    def lengths(self):
+        """The number of vertices of each line"""
+        return self._lengths.copy()
+
+    @property
+    def offsets(self):
+        """The index of the first vertex of each line"""
+        return self._offsets.copy()
+
+    @property
+    def color(self):
+        """The (L, 4) RGBA colors of the lines"""
+        return self._colors.copy()
+
+    @color.setter
+    def color(self, color):
+        colors = ColorArray(color).rgba
+        if len(colors) not in (1, len(self._lengths)):
+            raise ValueError('color must have one value per line (%d), not '
+                             '%d' % (len(self._lengths), len(colors)))
+        self._colors[:] = colors
+        self._upload(self._colors_tex, self._colors, 'u_lines_shape')
+        self.update()
+
+    @property
+    def width(self):
+        """The width of each line in px"""
+        return self._styles[:, 0].copy()
+
+    @width.setter
+    def width(self, width):
+        width = self._per_line(width, 'width', np.float32)
+        if (width < 0).any():
+            raise ValueError('width must be positive')
+        self._styles[:, 0] = width
+        self._upload(self._styles_tex, self._styles, 'u_lines_shape')
+        self.update()
+
+    @property
+    def line_visible(self):
+        """Whether each line is drawn"""
+        return self._styles[:, 1] != 0
+
+    @line_visible.setter
+    def line_visible(self, visible):
+        self._styles[:, 1] = self._per_line(visible, 'line_visible', bool)
+        self._upload(self._styles_tex, self._styles, 'u_lines_shape')
+        self.update()
+
+    @property
+    def antialias(self):
+        """The width of the antialiased edges of the lines in px"""
+        return self._antialias
+
+    @antialias.setter
+    def antialias(self, antialias):
+        antialias = float(antialias)
+        if antialias < 0:
+            raise ValueError('antialias must be positive, not %s'
+                             % antialias)
+        self._antialias = antialias
+        self.shared_program['u_antialias'] = antialias
+        self.update()
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.transforms.get_transform()
+
+    def _prepare_draw(self, view):
+        if self._n_segments == 0:
+            return False
+        fb = view.transforms.get_transform('render', 'framebuffer')
+        ndc_px = np.abs(np.diff(fb.map([[0, 0], [1, 1]])[:, :2], axis=0))
+        view.view_program['u_ndc_px'] = ndc_px[0]
+        view.view_program['u_px_scale'] = view.transforms.pixel_scale
+
+    def _compute_bounds(self, axis, view):
+        if axis >= self._ndim:
+            return (0, 0)
+        full = self._lengths > 0
+        if not full.any():
+            return None
+        bounds = self._line_bounds[full]
+        return bounds[:, 0, axis].min(), bounds[:, 1, axis].max()
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+An image visual compositing several channels (e.g. fluorescence channels)
+in a single draw.
+
+The channels are packed four by four in the RGBA components of 2D
+textures, in their native dtype. The colormaps of the channels are baked
+in the rows of a single lookup texture. The fragment shader reads every
+channel, applies its contrast limits, gamma and colormap, and composites
+the colors additively or by their maximum, so the cost of drawing does not
+grow with the number of visuals and blend passes.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from ..gloo import Texture2D, VertexBuffer
+from ..color import Color, Colormap, get_colormap
+from ..ext.six import string_types
+from .visual import Visual
+
+VERT_SHADER = """
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+varying vec2 v_texcoord;
+
+void main() {
+    v_texcoord = a_texcoord;
+    gl_Position = $transform(vec4(a_position, 0., 1.));
+}
+"""
+
+FRAG_SHADER = """
+{uniforms}
+uniform sampler2D u_lut;
+varying vec2 v_texcoord;
+
+vec4 channel_color(float value, vec2 clim, float gamma, float row) {{
+    float t;
+    if (clim.y == clim.x) {{
+        t = value == clim.x ? 0.0 : 1.0;
+    }}
+    else {{
+        t = (value - clim.x) / (clim.y - clim.x);
+    }}
+    t = pow(clamp(t, 0.0, 1.0), gamma);
+    // sample at the centers of the first and last texels of the row
+    return texture2D(u_lut, vec2((t * {lut_last:.1f} + 0.5) / {lut_size:.1f},
+                                 row));
+}}
+
+void main()
+{{
+    vec4 color = vec4(0.0);
+    vec4 data;
+    vec4 channel;
+{channels}
+    gl_FragColor = clamp(color, 0.0, 1.0);
+}}
+"""
+
+_read_texture = "    data = texture2D(u_data_{i}, v_texcoord);\n"
+
+_channel_uniforms = """\
+uniform vec2 u_clim_{i};
+uniform float u_gamma_{i};
+uniform float u_visible_{i};
+"""
+
+_composite = """\
+    channel = u_visible_{i} * channel_color(data.{c}, u_clim_{i},
+                                            u_gamma_{i}, {row});
+    color = {blend};
+"""
+
+_blend = {
+    'additive': 'color + channel',
+    'max': 'max(color, channel)',
+}
+
+# Number of entries of the colormap lookup table of each channel
+_LUT_SIZE = 256
+
+# Texture internal format and the factor by which the values of each
+# native dtype are divided when sampled (normalized integer formats)
+_texture_formats = {
+    np.dtype(np.uint8): ('rgba', 255.),
+    np.dtype(np.uint16): ('rgba16', 65535.),
+    np.dtype(np.float32): ('rgba32f', 1.),
+}
+
+
+def _frag_shader(n_channels, blending):
+    """The fragment shader compositing *n_channels*"""
+    uniforms = []
+    channels = []
+    for i in range(n_channels):
+        if i % 4 == 0:
+            uniforms.append('uniform sampler2D u_data_%d;\n' % (i // 4))
+            channels.append(_read_texture.format(i=i // 4))
+        uniforms.append(_channel_uniforms.format(i=i))
+        row = (i + 0.5) / n_channels
+        channels.append(_composite.format(i=i, c='rgba'[i % 4], row=row,
+                                          blend=_blend[blending]))
+    return FRAG_SHADER.format(uniforms=''.join(uniforms),
+                              lut_size=_LUT_SIZE, lut_last=_LUT_SIZE - 1,
+                              channels=''.join(channels))
+
+
+def _channel_colormap(cmap):
+    """The colormap of a channel, given as a colormap or its name, or as a
+    color for a ramp from black to that color
+    """
+    if isinstance(cmap, string_types):
+        try:
+            return get_colormap(cmap)
+        except KeyError:
+            pass
+    elif not isinstance(cmap, (tuple, list, np.ndarray)):
+        return get_colormap(cmap)
+    return Colormap([(0., 0., 0., 1.), Color(cmap).rgba])
+
+
+def _apply_settings(visual, settings, defaults):
+    """Set the per-item properties of *visual* to their value in
+    *settings*, or to their default if it does not fit the number of
+    items
+
+    Parameters
+    ----------
+    visual : Visual
+        The visual, whose property setters raise ValueError for values
+        that do not fit.
+    settings : dict
+        The values of the properties.
+    defaults : sequence
+        The (name, default) of the properties.
+    """
+    for name, default in defaults:
+        try:
+            setattr(visual, name, settings[name])
+        except ValueError:
+            setattr(visual, name, default)
+
+
+def _broadcast(values, n, name):
+    """A list of *n* per-channel values from a single value or a sequence"""
+    if isinstance(values, string_types) or not isinstance(values,
+                                                          (tuple, list)):
+        return [values] * n
+    if len(values) == 1:
+        return list(values) * n
+    if len(values) != n:
+        raise ValueError('%s must have one value per channel (%d), not %d'
+                         % (name, n, len(values)))
+    return list(values)
+
+
+class MultiChannelImageVisual(Visual):
+    """Visual compositing several single-channel images in one draw
+
+    Each channel has its own contrast limits, gamma and colormap, and the
+    colors of the channels are summed ('additive') or combined by their
+    maximum ('max'), as when overlaying fluorescence channels. All
+    channels are drawn by a single fragment shader pass.
+
+    Parameters
+    ----------
+    data : array-like | list of array-like
+        The channels, as a (C, M, N) array or a list of C arrays of shape
+        (M, N). Up to 16 channels are supported.
+    cmaps : str | ColorMap | color | list
+        The colormap of each channel, or a single one for all. A color
+        (e.g. 'green' or (1, 0, 1)) gives a ramp from black to that color.
+        By default, the channels are green, magenta, cyan, yellow, red,
+        blue, orange and white, repeated.
+    clims : str | tuple | list
+        The contrast limits of each channel, or the same for all. 'auto'
+        (default) sets them to the min and max of each channel.
+    gammas : float | list
+        The gamma of each channel, or the same for all. Default 1.
+    blending : str
+        How the colors of the channels are combined: 'additive' (default)
+        or 'max'. The result is clamped to [0, 1].
+    interpolation : str
+        The texture interpolation, 'nearest' (default) or 'linear'.
+    texture_format : str | None
+        Internal format of the textures. By default (None) uint8 and uint16
+        data are uploaded as-is as normalized integers ('rgba' and
+        'rgba16'), and all other data as float32 ('rgba32f'). Another
+        format such as 'rgba16f' can be given to save GPU memory.
+    **kwargs : dict
+        Keyword arguments to pass to `Visual`.
+
+    Notes
+    -----
+    The channels are packed in the RGBA components of ``ceil(C / 4)``
+    textures, so all channels are converted to a common dtype. Changing
+    the contrast limits, gammas, colormaps or visibility of the channels
+    does not upload the data again, and changing the number of channels or
+    the blending rebuilds the shader.
+    """
+
+    _default_cmaps = ('green', 'magenta', 'cyan', 'yellow', 'red', 'blue',
+                      'orange', 'white')
+    max_channels = 16
+
+    def __init__(self, data=None, cmaps=None, clims='auto', gammas=1.,
+                 blending='additive', interpolation='nearest',
+                 texture_format=None, **kwargs):
+        if blending not in _blend:
+            raise ValueError("blending must be 'additive' or 'max', not %r"
+                             % (blending,))
+        self._blending = blending
+        self._interpolation = interpolation
+        self._texture_format = texture_format
+        self._textures = []
+        self._texture_scale = 1.
+        self._n_channels = 0
+        self._shape = None
+        self._channels = None
+        self._cmaps = []
+        self._clims = []
+        self._gammas = []
+        self._channel_visible = []
+        # per-channel settings applied when the number of channels changes
+        self._settings = dict(cmaps=cmaps, clims=clims, gammas=gammas)
+        self._lut = Texture2D(np.zeros((1, _LUT_SIZE, 4), np.float32),
+                              interpolation='linear',
+                              wrapping='clamp_to_edge')
+        self._position = VertexBuffer(np.zeros((6, 2), np.float32))
+        self._texcoord = VertexBuffer(np.array(
+            [[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]], np.float32))
+        self._need_shader_update = True
+        self._need_lut_update = True
+        self._need_clim_update = True
+
+        super(MultiChannelImageVisual, self).__init__(
+            vcode=VERT_SHADER, fcode=_frag_shader(1, blending), **kwargs)
+        self.set_gl_state('translucent', cull_face=False)
+        self._draw_mode = 'triangles'
+        self.shared_program['a_position'] = self._position
+        self.shared_program['a_texcoord'] = self._texcoord
+
+        if data is not None:
+            self.set_data(data)
+        self.freeze()
+
+    def set_data(self, data):
+        """Set the channels
+
+        The contrast limits, gammas, colormaps and visibility of the
+        channels are kept when the number of channels does not change.
+        Otherwise they are reset to those given when creating the visual,
+        or to the defaults if these do not match the number of channels.
+
+        Parameters
+        ----------
+        data : array-like | list of array-like
+            The channels, as a (C, M, N) array or a list of C arrays of
+            shape (M, N).
+        """
+        channels = [np.asarray(channel) for channel in data]
+        n = len(channels)
+        if not 1 <= n <= self.max_channels:
+            raise ValueError('data must have between 1 and %d channels, '
+                             'not %d' % (self.max_channels, n))
+        shape = channels[0].shape
+        if len(shape) != 2 or any(c.shape != shape for c in channels):
+            raise ValueError('the channels must be 2D arrays of the same '
+                             'shape')
+        dtype = np.result_type(*channels)
+        if dtype not in _texture_formats:
+            dtype = np.dtype(np.float32)
+        internalformat, scale = _texture_formats[dtype]
+        if self._texture_format is not None:
+            internalformat = self._texture_format
+
+        # Pack the channels four by four into RGBA textures
+        n_textures = -(-n // 4)
+        while len(self._textures) > n_textures:
+            self._textures.pop()
+        while len(self._textures) < n_textures:
+            self._textures.append(Texture2D(
+                (1, 1, 4), interpolation=self._interpolation,
+                wrapping='clamp_to_edge'))
+        for i, tex in enumerate(self._textures):
+            packed = np.zeros(shape + (4,), dtype)
+            group = channels[4 * i:4 * i + 4]
+            packed[..., :len(group)] = np.stack(group, axis=-1)
+            tex.resize(packed.shape, internalformat=internalformat)
+            tex.set_data(packed)
+
+        self._channels = channels
+        if n != self._n_channels:
+            self._n_channels = n
+            self._need_shader_update = True
+            _apply_settings(self, self._settings,
+                            (('cmaps', None), ('clims', 'auto'),
+                             ('gammas', 1.)))
+            self.channel_visible = True
+        if self._shape != shape:
+            self._shape = shape
+            h, w = shape
+            self._position.set_data(np.array(
+                [[0, 0], [w, 0], [w, h], [0, 0], [w, h], [0, h]],
+                np.float32))
+            self._bounds_changed()
+        self._texture_scale = scale
+        self._need_clim_update = True
+        self.update()
+
+    @property
+    def n_channels(self):
+        """The number of channels"""
+        return self._n_channels
+
+    @property
+    def size(self):
+        """The (width, height) of the image"""
+        return self._shape[::-1]
+
+    @property
+    def blending(self):
+        """How the colors of the channels are combined, 'additive' or
+        'max'
+        """
+        return self._blending
+
+    @blending.setter
+    def blending(self, blending):
+        if blending not in _blend:
+            raise ValueError("blending must be 'additive' or 'max', not %r"
+                             % (blending,))
+        if blending != self._blending:
+            self._blending = blending
+            self._need_shader_update = True
+            self.update()
+
+    @property
+    def cmaps(self):
+        """The colormaps of the channels
+
+        Can be set to a list with one colormap, colormap name or color per
+        channel, or to a single one for all channels.
+        """
+        return list(self._cmaps)
+
+    @cmaps.setter
+    def cmaps(self, cmaps):
+        if self._n_channels == 0:
+            self._settings['cmaps'] = cmaps
+            return
+        n = self._n_channels
+        if cmaps is None:
+            cmaps = [self._default_cmaps[i % len(self._default_cmaps)]
+                     for i in range(n)]
+        elif isinstance(cmaps, tuple) and len(cmaps) in (3, 4) and \
+                not isinstance(cmaps[0], (string_types, tuple, list)):
+            cmaps = [cmaps]  # a single RGB(A) color
+        self._cmaps = [_channel_colormap(c) for c in
+                       _broadcast(cmaps, n, 'cmaps')]
+        self._need_lut_update = True
+        self.update()
+
+    @property
+    def clims(self):
+        """The contrast limits of the channels
+
+        Can be set to a list with one (min, max) tuple or 'auto' per
+        channel, or to a single one for all channels.
+        """
+        return [c if isinstance(c, string_types) else tuple(c)
+                for c in self._clims]
+
+    @clims.setter
+    def clims(self, clims):
+        if self._n_channels == 0:
+            self._settings['clims'] = clims
+            return
+        if not isinstance(clims, string_types) and len(clims) == 2 and \
+                np.isscalar(clims[0]):
+            clims = [clims]  # a single (min, max) tuple
+        values = []
+        for clim in _broadcast(clims, self._n_channels, 'clims'):
+            if isinstance(clim, string_types):
+                if clim != 'auto':
+                    raise ValueError('clims must be "auto" if a string')
+            else:
+                clim = np.array(clim, float)
+                if clim.shape != (2,):
+                    raise ValueError('clims must have two elements')
+            values.append(clim)
+        self._clims = values
+        self._need_clim_update = True
+        self.update()
+
+    @property
+    def gammas(self):
+        """The gammas of the channels, applied after normalizing the data
+        by the contrast limits
+        """
+        return list(self._gammas)
+
+    @gammas.setter
+    def gammas(self, gammas):
+        if self._n_channels == 0:
+            self._settings['gammas'] = gammas
+            return
+        gammas = [float(g) for g in
+                  _broadcast(gammas, self._n_channels, 'gammas')]
+        if min(gammas) <= 0:
+            raise ValueError('gammas must be > 0')
+        self._gammas = gammas
+        for i, gamma in enumerate(gammas):
+            self.shared_program['u_gamma_%d' % i] = gamma
+        self.update()
+
+    @property
+    def channel_visible(self):
+        """Whether each channel is drawn"""
+        return list(self._channel_visible)
+
+    @channel_visible.setter
+    def channel_visible(self, visible):
+        visible = [bool(v) for v in
+                   _broadcast(visible, self._n_channels, 'channel_visible')]
+        self._channel_visible = visible
+        for i, v in enumerate(visible):
+            self.shared_program['u_visible_%d' % i] = float(v)
+        self.update()
+
+    # --------------------------------------------------------- drawing ---
+    def _build_shader(self):
+        self.shared_program.frag = _frag_shader(self._n_channels,
+                                                self._blending)
+        for i, tex in enumerate(self._textures):
+            self.shared_program['u_data_%d' % i] = tex
+        self.shared_program['u_lut'] = self._lut
+        self._need_clim_update = True
+        self._need_shader_update = False
+
+    def _build_lut(self):
+        t = np.linspace(0., 1., _LUT_SIZE)[:, np.newaxis]
+        lut = np.array([cmap.map(t) for cmap in self._cmaps], np.float32)
+        self._lut.set_data(lut.reshape(len(self._cmaps), _LUT_SIZE, 4))
+        self._need_lut_update = False
+
+    def _build_clim(self):
+        for i, clim in enumerate(self._clims):
+            if isinstance(clim, string_types):
+                channel = self._channels[i]
+                clim = np.array((np.min(channel), np.max(channel)), float)
+                self._clims[i] = clim
+            self.shared_program['u_clim_%d' % i] = clim / self._texture_scale
+        self._need_clim_update = False
+
+    def _compute_bounds(self, axis, view):
+        if axis > 1 or self._shape is None:
+            return (0, 0)
+        return (0, self.size[axis])
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        if self._n_channels == 0:
+            return False
+        if self._need_shader_update:
+            self._build_shader()
+        if self._need_lut_update:
+            self._build_lut()
+        if self._need_clim_update:
+            self._build_clim()
@@ -9,6 +9,15 @@ from .visual import Visual
 from .. import gloo
 
 
+# the texture format of the data types, the scale of the normalized values
+# read from the texture and the shift of the stored values
+_texture_formats = {
+    np.dtype(np.float32): ('r32f', 1., 0.),
+    np.dtype(np.uint16): ('r16', 65535., 0.),
+    np.dtype(np.int16): ('r16', 65535., -32768.),
+}
+
+
 class ScrollingLinesVisual(Visual):
     """Displays many line strips of equal length, with the option to add new
     vertex data to one end of the lines.
@@ -30,6 +39,25 @@ class ScrollingLinesVisual(Visual):
         option is not compatible with *pos_offset*.
     cell_size : tuple
         The x, y distance between cells in the grid.
+    dtype : str | dtype
+        The type in which the samples are stored and uploaded: 'float32'
+        (default), or 'int16' and 'uint16' to stream integer samples, e.g.
+        from an acquisition board, at half the bandwidth and without
+        converting them to floats.
+    data_scale : float
+        The factor applied to the samples in the shader.
+    data_offset : float
+        The offset added to the scaled samples in the shader, so that the
+        y coordinate of the vertices is ``sample * data_scale +
+        data_offset``.
+    decimate : int | None
+        If given, every block of *decimate* samples is reduced to its
+        minimum and maximum, in the order in which they occur, before being
+        uploaded. With one block per pixel column, this draws the same
+        envelope as all the samples while uploading and drawing
+        ``2 / decimate`` of them. *line_size* is then the number of
+        decimated samples, and the samples not filling a block yet are kept
+        for the next `roll_data`.
     """
 
     vertex_code = """
@@ -41,6 +69,8 @@ class ScrollingLinesVisual(Visual):
     uniform vec2 pos_size;  // x=n_lines, y=n_verts_per_line
     uniform float offset;  // rolling pointer into vertexes
     uniform float dx;  // x step per sample
+    uniform float data_scale;
+    uniform float data_offset;
     
     varying vec2 v_index;
     varying vec4 v_color;
@@ -49,7 +79,8 @@ class ScrollingLinesVisual(Visual):
     void main() {
         v_index = vec2(mod(index.y + offset, pos_size.y), index.x);
         vec2 uv = (v_index + 0.5) / (pos_size.yx);
-        vec4 pos = vec4(index.y * dx, texture2D(position, uv).r, 0, 1);
+        float y = texture2D(position, uv).r * data_scale + data_offset;
+        vec4 pos = vec4(index.y * dx, y, 0, 1);
         
         // fetch starting position from texture lookup:
         pos += vec4(texture1D(pos_offset, (index.x + 0.5) / pos_size.x).rg,
@@ -74,14 +105,26 @@ class ScrollingLinesVisual(Visual):
     """
     
     def __init__(self, n_lines, line_size, dx, color=None, pos_offset=None,
-                 columns=None, cell_size=None):
+                 columns=None, cell_size=None, dtype='float32', data_scale=1.,
+                 data_offset=0., decimate=None):
         self._pos_data = None
         self._offset = 0
         self._dx = dx
+        self._dtype = np.dtype(dtype)
+        if self._dtype not in _texture_formats:
+            raise ValueError("dtype must be 'float32', 'int16' or 'uint16', "
+                             "not %r" % (dtype,))
+        if decimate is not None and decimate < 2:
+            raise ValueError('decimate must be at least 2, not %s'
+                             % decimate)
+        self._decimate = decimate
+        self._pending = np.zeros((n_lines, 0), self._dtype)
         
-        data = np.zeros((n_lines, line_size), dtype='float32')
+        internalformat = _texture_formats[self._dtype][0]
+        data = self._texture_data(np.zeros((n_lines, line_size),
+                                           self._dtype))
         self._pos_tex = gloo.Texture2D(data, format='luminance',
-                                       internalformat='r32f')
+                                       internalformat=internalformat)
         self._index_buf = gloo.VertexBuffer()
         self._data_shape = data.shape
         
@@ -89,7 +132,13 @@ class ScrollingLinesVisual(Visual):
         
         self.shared_program['position'] = self._pos_tex
         self.shared_program['index'] = self._index_buf
+        if decimate is not None:
+            # each block of samples is drawn as two vertices
+            dx = dx * decimate / 2.
         self.shared_program['dx'] = dx
+        self._data_scale = float(data_scale)
+        self._data_offset = float(data_offset)
+        self._update_data_transform()
         self.shared_program['pos_size'] = data.shape
         self.shared_program['offset'] = self._offset
         
@@ -131,6 +180,56 @@ class ScrollingLinesVisual(Visual):
         self.set_gl_state('translucent', line_width=1)
         self.freeze()
 
+    @property
+    def data_scale(self):
+        """The factor applied to the samples"""
+        return self._data_scale
+
+    @data_scale.setter
+    def data_scale(self, scale):
+        self._data_scale = float(scale)
+        self._update_data_transform()
+        self.update()
+
+    @property
+    def data_offset(self):
+        """The offset added to the scaled samples"""
+        return self._data_offset
+
+    @data_offset.setter
+    def data_offset(self, offset):
+        self._data_offset = float(offset)
+        self._update_data_transform()
+        self.update()
+
+    def _update_data_transform(self):
+        """Set the uniforms mapping the values read from the texture to the
+        y coordinates"""
+        _, norm, shift = _texture_formats[self._dtype]
+        self.shared_program['data_scale'] = norm * self._data_scale
+        self.shared_program['data_offset'] = (shift * self._data_scale +
+                                              self._data_offset)
+
+    def _texture_data(self, data):
+        """The samples as stored in the texture"""
+        data = np.asarray(data).astype(self._dtype, copy=False)
+        if self._dtype == np.int16:
+            # offset binary, as signed normalized textures are not available
+            data = data.view(np.uint16) ^ np.uint16(0x8000)
+        return data
+
+    def _decimated(self, data):
+        """The minimum and maximum of each block of samples, in order"""
+        k = self._decimate
+        n = data.shape[1] // k
+        blocks = data[:, :n * k].reshape(data.shape[0], n, k)
+        argmin = blocks.argmin(axis=2)[..., np.newaxis]
+        argmax = blocks.argmax(axis=2)[..., np.newaxis]
+        pairs = np.concatenate([np.minimum(argmin, argmax),
+                                np.maximum(argmin, argmax)], axis=2)
+        pairs = np.take_along_axis(blocks, pairs, axis=2)
+        return pairs.reshape(data.shape[0], 2 * n)
+
     def set_pos_offset(self, po):
         """Set the array of position offsets for each line strip.
         
@@ -169,9 +268,18 @@ class ScrollingLinesVisual(Visual):
         Parameters
         ----------
         data : array-like
-            A data array to append.
+            A data array to append, with one row of samples per line strip.
         """
-        data = data.astype('float32')[..., np.newaxis]
+        data = np.asarray(data)
+        if self._decimate is not None:
+            data = np.concatenate(
+                [self._pending, data.astype(self._dtype, copy=False)], axis=1)
+            n = data.shape[1] // self._decimate * self._decimate
+            self._pending = data[:, n:].copy()
+            data = self._decimated(data[:, :n])
+            if data.shape[1] == 0:
+                return
+        data = self._texture_data(data)[..., np.newaxis]
         s1 = self._data_shape[1] - self._offset
         if data.shape[1] > s1:
             self._pos_tex[:, self._offset:] = data[:, :s1]
@@ -191,7 +299,12 @@ class ScrollingLinesVisual(Visual):
         index : int
             The index of the line strip to be replaced.
         data : array-like
-            The data to assign to the selected line strip.
+            The data to assign to the selected line strip. When
+            decimating, it has ``line_size * decimate / 2`` samples.
         """
-        self._pos_tex[index, :] = data
+        data = np.asarray(data)
+        if self._decimate is not None:
+            data = self._decimated(data.astype(self._dtype, copy=False)
+                                   [np.newaxis])[0]
+        self._pos_tex[index, :] = self._texture_data(data)[..., np.newaxis]
         self.update()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import os.path as op
+import threading
+
+import numpy as np
+from vispy import scene
+from vispy.util import _TempDir
+
+from vispy.testing import (TestingCanvas, requires_application,
+                           run_tests_if_main, requires_pyopengl,
+                           assert_raises)
+
+temp_dir = _TempDir()
+
+
+@requires_pyopengl()
+@requires_application()
+def test_bricked_volume():
+    with TestingCanvas(bgcolor='k', size=(80, 80)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        v.camera.fov = 60
+        vol = np.random.RandomState(0).rand(40, 48, 56).astype(np.float32)
+        vol[10:30, 10:30, 10:40] += 1
+        fname = op.join(temp_dir, 'vol.dat')
+        mmap = np.memmap(fname, np.float32, 'w+', shape=vol.shape)
+        mmap[:] = vol
+        for method in ('mip', 'translucent'):
+            V = scene.visuals.Volume(vol, clim=(0, 2), method=method,
+                                     parent=v.scene)
+            v.camera.set_range()
+            expected = c.render().astype(int)
+            V.parent = None
+            for async_load in (False, True):
+                B = scene.visuals.BrickedVolume(
+                    mmap, clim=(0, 2), method=method, brick_size=16,
+                    cache_size=(4, 4, 4), async_load=async_load,
+                    parent=v.scene)
+                assert B.n_levels == 3
+                image = c.render()
+                if async_load:
+                    # coarse bricks are loaded first
+                    for i in range(B.n_levels):
+                        B.wait()
+                        image = c.render()
+                assert B.level == 0
+                assert np.abs(image - expected).max() <= 2
+                B.parent = None
+
+        # the level of detail is lowered when the cache is too small
+        B = scene.visuals.BrickedVolume(
+            [vol, vol[::2, ::2, ::2]], brick_size=16, cache_size=(2, 2, 2),
+            async_load=False, parent=v.scene)
+        assert B.n_levels == 2
+        assert np.allclose(B.clim, (vol.min(), vol.max()))
+        # the default threshold is normalized by clim
+        mean = vol[::2, ::2, ::2].mean()
+        assert np.isclose(B.threshold, (mean - B.clim[0]) /
+                          (B.clim[1] - B.clim[0]), atol=0.01)
+        image = c.render()
+        assert B.level == 1
+        assert image[..., :3].max() > 0
+
+        assert_raises(ValueError, scene.visuals.BrickedVolume, vol,
+                      brick_size=0)
+        assert_raises(ValueError, B.set_data, np.zeros((10, 10)))
+        del mmap
+
+
+class _BlockingData(object):
+    """Array whose reads wait for an event"""
+
+    def __init__(self, data, event):
+        self._data = data
+        self._event = event
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.ndim = data.ndim
+
+    def __getitem__(self, item):
+        self._event.wait()
+        return self._data[item]
+
+
+@requires_pyopengl()
+@requires_application()
+def test_bricked_volume_set_data_while_reading():
+    """Test that the bricks still being read from replaced data are
+    dropped"""
+    with TestingCanvas(bgcolor='k', size=(80, 80)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        new = np.random.RandomState(0).rand(32, 32, 32).astype(np.float32)
+        V = scene.visuals.Volume(new, clim=(0, 1), parent=v.scene)
+        v.camera.set_range()
+        expected = c.render().astype(int)
+        V.parent = None
+
+        event = threading.Event()
+        event.set()
+        old = _BlockingData(np.zeros((32, 32, 32), np.float32), event)
+        B = scene.visuals.BrickedVolume(old, clim=(0, 1), brick_size=16,
+                                        parent=v.scene)
+        event.clear()
+        try:
+            assert c.render()[..., :3].max() == 0
+            # the same bricks are requested while the old ones are read
+            B.set_data(new, clim=(0, 1))
+            c.render()
+        finally:
+            event.set()
+        for i in range(B.n_levels + 1):
+            B.wait()
+            image = c.render()
+        assert B.level == 0
+        assert np.abs(image - expected).max() <= 2
+
+
+run_tests_if_main()
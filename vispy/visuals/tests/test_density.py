@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.scene.visuals import Density
+from vispy.visuals.transforms import STTransform
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises)
+
+
+@requires_application()
+def test_density():
+    """Test summing points in bins of screen pixels"""
+    rng = np.random.RandomState(0)
+    pos = rng.normal(20, 6, (20000, 2))
+    pos[:, 0] += 10
+    weights = rng.uniform(0.5, 1, len(pos))
+    with TestingCanvas(size=(60, 40), bgcolor='k') as c:
+        for method in ('cpu', 'gpu'):
+            density = Density(pos, weights, bin_size=2, cmap='grays',
+                              norm='linear', method=method, parent=c.scene)
+            aggregations = []
+            aggregate = density._aggregate
+            density._aggregate = lambda *args: (aggregations.append(args),
+                                                aggregate(*args))
+            rendered = c.render()[..., 0].astype(float)
+            expected = np.histogram2d(pos[:, 1], pos[:, 0], (20, 30),
+                                      ((0, 40), (0, 60)), weights=weights)[0]
+            assert np.allclose(density.density_clim,
+                               (expected[expected > 0].min(), expected.max()),
+                               rtol=0.05)
+            extent = density.density_clim
+            expected = expected.repeat(2, 0).repeat(2, 1)
+            expected = expected / density.density_clim[1] * 255
+            # the GPU rounds points on the edges of the bins differently
+            assert np.median(np.abs(rendered - expected)) < 1
+            assert np.abs(rendered - expected).max() < 40
+
+            # the sums are only computed again when the view changes
+            c.render()
+            assert len(aggregations) == 1
+            density.transform = STTransform(scale=(0.5, 0.5))
+            zoomed = c.render()[..., 0]
+            assert len(aggregations) == 2
+            assert zoomed[20:, 30:].max() == 0
+            assert zoomed[:20, :30].max() > 0
+
+            density.clim = (0, 1)
+            density.norm = 'log'
+            assert c.render()[..., 0].max() == 255
+            assert len(aggregations) == 2
+            density.parent = None
+
+            # the sums are read back when switching from a fixed clim
+            density = Density(pos, weights, bin_size=2, clim=(0, 10),
+                              method=method, parent=c.scene)
+            c.render()
+            assert (density.density_clim is None) == (method == 'gpu')
+            density.clim = 'auto'
+            c.render()
+            assert np.allclose(density.density_clim, extent)
+            density.parent = None
+
+        assert_raises(ValueError, Density, pos, method='fast')
+        assert_raises(ValueError, Density, pos, bin_size=0)
+        assert_raises(ValueError, Density, pos[:, :1])
+        assert_raises(ValueError, Density, pos, weights[:10])
+        assert_raises(ValueError, setattr, density, 'norm', 'sqrt')
+
+
+run_tests_if_main()
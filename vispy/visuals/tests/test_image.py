@@ -2,8 +2,10 @@
 import numpy as np
 
 from vispy.scene.visuals import Image
+from vispy.visuals.image import _downsample
+from vispy.visuals.transforms import STTransform
 from vispy.testing import (requires_application, TestingCanvas,
-                           run_tests_if_main)
+                           run_tests_if_main, assert_raises, record_glir)
 from vispy.testing.image_tester import assert_image_approved
 
 
@@ -22,4 +24,137 @@ def test_image():
                                   ("_rgb" if three_d else "_mono"))
 
 
+@requires_application()
+def test_image_clim_gamma():
+    """Test image clim and gamma applied on the GPU for native dtypes"""
+    size = (40, 30)
+    with TestingCanvas(size=size, bgcolor='w') as c:
+        image = Image(cmap='grays', parent=c.scene)
+        data = np.random.RandomState(0).rand(size[1], size[0])
+        for values, clim in [(data, (0.2, 0.8)),
+                             ((data * 255).astype(np.uint8), (50, 200)),
+                             ((data * 65535).astype(np.uint16), (1e4, 5e4)),
+                             ((data * 100).astype(np.int32), (10, 90))]:
+            image.set_data(values)
+            for gamma in (1., 2.):
+                image.clim = clim
+                image.gamma = gamma
+                norm = (values.astype(float) - clim[0]) / (clim[1] - clim[0])
+                expected = 255 * np.clip(norm, 0, 1) ** gamma
+                rendered = c.render()[..., 0].astype(float)
+                assert np.abs(rendered - expected).max() <= 1
+
+        # changing clim only updates uniforms
+        c.render()
+        with record_glir(image._texture) as commands:
+            image.clim = (0, 0.5)
+            c.render()
+        assert commands == []
+
+        image.set_data(data)
+        image.clim = 'auto'
+        c.render()
+        assert image.clim == (data.min(), data.max())
+        assert_raises(ValueError, setattr, image, 'gamma', 0)
+
+
+@requires_application()
+def test_image_set_data_offset():
+    """Test updating a region of the image data"""
+    size = (40, 30)
+    with TestingCanvas(size=size, bgcolor='w') as c:
+        rng = np.random.RandomState(0)
+        for shape in ((30, 40), (30, 40, 3)):
+            data = rng.rand(*shape).astype(np.float32)
+            orig = data.copy()
+            image = Image(data, cmap='grays', clim=(0, 1), parent=c.scene)
+            c.render()
+
+            # several updates between draws are uploaded at once
+            strip = rng.rand(*((2, 40) + shape[2:]))
+            roi = rng.randint(0, 256, (5, 6) + shape[2:]) / 255.
+            image.set_data(strip, offset=(10, 0))
+            image.set_data(roi, offset=(20, 30))
+            with record_glir(image._texture) as commands:
+                updated = c.render()
+            uploads = [cmd for cmd in commands if cmd[0] == 'DATA']
+            assert len(uploads) == 1
+            assert uploads[0][2] == (10, 0)
+            assert uploads[0][3].shape[:2] == (15, 40)
+            # the array given to set_data is not modified
+            assert np.array_equal(data, orig)
+
+            data[10:12] = strip
+            data[20:25, 30:36] = roi
+            image.set_data(data)
+            assert np.array_equal(c.render(), updated)
+
+            assert_raises(ValueError, image.set_data, roi, offset=(26, 0))
+            assert_raises(ValueError, image.set_data, roi, offset=(-1, 0))
+            image.parent = None
+
+
+def test_image_downsample():
+    """Test the block mean of images"""
+    data = np.arange(7 * 5 * 3, dtype=np.uint8).reshape(7, 5, 3)
+    small = _downsample(data, 2)
+    assert small.shape == (4, 3, 3)
+    assert small.dtype == np.uint8
+    assert np.array_equal(small[0, 0], np.round(data[:2, :2].mean((0, 1))))
+    assert np.array_equal(small[3, 2], data[6, 4])
+    small = _downsample(data.astype(np.float64), 4)
+    assert small.shape == (2, 2, 3)
+    assert np.allclose(small[1, 1], data[4:, 4:].mean((0, 1)))
+
+
+@requires_application()
+def test_image_downsampling():
+    """Test drawing downsampled copies and mipmaps of large images"""
+    size = (40, 30)
+    with TestingCanvas(size=size, bgcolor='w') as c:
+        rng = np.random.RandomState(0)
+        data = rng.rand(240, 320).astype(np.float32)
+        expected = data.reshape(30, 8, 40, 8).mean((1, 3))
+        image = Image(data, cmap='grays', clim=(0, 1), downsampling='auto',
+                      parent=c.scene)
+        image.transform = STTransform(scale=(0.125, 0.125))
+        rendered = c.render()[..., 0] / 255.
+        assert image._proxy_factor == 8
+        assert image._texture.shape[:2] == (30, 40)
+        assert np.abs(rendered - expected).max() < 2.5 / 255
+
+        # a finer copy is uploaded when zooming in
+        image.transform.scale = (0.5, 0.5)
+        c.render()
+        assert image._proxy_factor == 2
+        assert image._texture.shape[:2] == (120, 160)
+        image.transform.scale = (0.125, 0.125)
+        assert np.array_equal(c.render()[..., 0] / 255., rendered)
+
+        # only the blocks covering an updated region are uploaded
+        image.set_data(np.ones((3, 5), np.float32), offset=(9, 20))
+        with record_glir(image._texture) as commands:
+            rendered = c.render()[..., 0] / 255.
+        uploads = [cmd for cmd in commands if cmd[0] == 'DATA']
+        assert len(uploads) == 1
+        assert uploads[0][2] == (1, 2)
+        assert uploads[0][3].shape[:2] == (1, 2)
+        data[9:12, 20:25] = 1
+        expected = data.reshape(30, 8, 40, 8).mean((1, 3))
+        assert np.abs(rendered - expected).max() < 2.5 / 255
+
+        image.downsampling = 'mipmap'
+        assert image.downsampling == 'mipmap'
+        rendered = c.render()[..., 0] / 255.
+        assert image._proxy_factor == 1
+        assert image._texture.shape[:2] == (240, 320)
+        assert np.abs(rendered - expected).max() < 4 / 255
+
+        image.downsampling = None
+        rendered = c.render()[..., 0] / 255.
+        assert np.abs(rendered - expected).max() > 0.1
+        assert_raises(ValueError, setattr, image, 'downsampling', 'fast')
+        assert_raises(ValueError, Image, data, downsampling='fast')
+
+
 run_tests_if_main()
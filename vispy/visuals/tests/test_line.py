@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.scene.visuals import Line
+from vispy.visuals.line import line as line_module
+from vispy.visuals.line.decimation import MinMaxPyramid
+from vispy.visuals.transforms import STTransform
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises, record_glir)
+
+
+def test_min_max_pyramid():
+    """Test finding the minima and maxima of ranges of values"""
+    rng = np.random.RandomState(0)
+    for n in (5, 16, 17, 1000):
+        values = rng.normal(size=n)
+        pyramid = MinMaxPyramid(values, block_size=4)
+        starts = rng.randint(0, n, 200)
+        stops = starts + rng.randint(1, n + 1 - starts)
+        argmin, argmax = pyramid.argminmax(starts, stops)
+        for start, stop, i, j in zip(starts, stops, argmin, argmax):
+            assert values[i] == values[start:stop].min()
+            assert values[j] == values[start:stop].max()
+
+
+@requires_application()
+def test_line_decimate():
+    """Test drawing the vertices of a time series needed for each column"""
+    rng = np.random.RandomState(0)
+    n = 100000
+    y = rng.normal(size=n).cumsum()
+    pos = np.column_stack([np.linspace(-10, 110, n),
+                           50 + y / np.abs(y).max() * 45])
+    with TestingCanvas(size=(100, 100), bgcolor='k') as c:
+        line = Line(pos, color='w', parent=c.scene)
+        for transform in (STTransform(), STTransform(scale=(3, 1))):
+            line.transform = transform
+            line.decimate = False
+            full = c.render()[..., 0] > 0
+            line.decimate = True
+            decimated = c.render()[..., 0] > 0
+            # the vertices in and next to the 100 columns of the view
+            assert len(line._decimated) <= 4 * 100 + 2
+            # GL lines can miss pixels that they touch at the extrema
+            assert (full != decimated).sum() < 0.02 * full.sum()
+            assert (decimated <= full).all()
+
+        # the vertices are only selected when the x range changes
+        selected = line._decimated
+        line.transform = STTransform(scale=(3, 0.5))
+        c.render()
+        assert line._decimated is selected
+        line.transform = STTransform(scale=(2, 0.5))
+        c.render()
+        assert line._decimated is not selected
+
+        assert_raises(ValueError, line.set_data, pos[::-1])
+        assert_raises(ValueError, line.set_data, connect='segments')
+        line.decimate = False
+        line.set_data(pos[::-1])
+        assert_raises(ValueError, setattr, line, 'decimate', True)
+
+
+@requires_application()
+def test_line_append():
+    """Test appending vertices to a line"""
+    rng = np.random.RandomState(0)
+    pos = np.column_stack([np.linspace(5, 95, 100),
+                           rng.uniform(10, 90, 100)])
+    color = rng.uniform(0, 1, (100, 4))
+    color[:, 3] = 1
+    with TestingCanvas(size=(100, 100), bgcolor='k') as c:
+        for method in ('gl', 'agg'):
+            line = Line(pos[:50], color=color[:50], method=method,
+                        parent=c.scene)
+            c.render()
+            line.append(pos[50:60], color[50:60])
+            c.render()
+            vbos = dict((name, getattr(line._line_visual, name)) for name in
+                        ('_pos_vbo', '_color_vbo', '_vbo')
+                        if hasattr(line._line_visual, name))
+            with record_glir(vbos) as commands:
+                for start in range(60, 100, 10):
+                    line.append(pos[start:start + 10],
+                                color[start:start + 10])
+                    appended = c.render()
+            uploads = [cmd for cmd in commands if cmd[1] == 'DATA']
+            if method == 'gl':
+                # only the new vertices and colors are uploaded, as the
+                # arrays were made large enough for 120 vertices
+                assert [len(cmd[-1]) for cmd in uploads] == [10] * 8
+            assert line.bounds(0) == (pos[:, 0].min(), pos[:, 0].max())
+            assert line.bounds(1) == (pos[:, 1].min(), pos[:, 1].max())
+            assert np.array_equal(line.pos, pos)
+            line.parent = None
+
+            line = Line(pos, color=color, method=method, parent=c.scene)
+            assert np.array_equal(c.render(), appended)
+            line.parent = None
+
+        line = Line(pos[:50], color='w')
+        assert_raises(ValueError, line.append, pos[50:], color[50:])
+        assert_raises(ValueError, line.append, pos[50:, :1])
+        line.set_data(connect=np.array([[0, 1]]))
+        assert_raises(ValueError, line.append, pos[50:])
+
+
+@requires_application()
+def test_line_agg_gpu():
+    """Test computing the geometry of agg lines in the vertex shader"""
+    rng = np.random.RandomState(0)
+    pos = np.column_stack([np.linspace(10, 90, 20), rng.uniform(10, 90, 20)])
+    color = rng.uniform(0, 1, (20, 4))
+    color[:, 3] = 1
+    with TestingCanvas(size=(100, 100), bgcolor='k') as c:
+        for line_color in ('w', color):
+            for width in (1, 6):
+                line = Line(pos, color=line_color, width=width, method='agg',
+                            parent=c.scene)
+                expected = c.render()
+                line.method = 'agg_gpu'
+                assert np.abs(c.render().astype(int) - expected).max() <= 1
+
+                # the vertices are uploaded without the geometry
+                line.set_data(pos[::2], color=color[::2] if
+                              isinstance(line_color, np.ndarray) else 'w')
+                decimated = c.render()
+                assert line._line_visual._vertices_tex.shape == (1, 10, 4)
+                line.method = 'agg'
+                assert np.abs(c.render().astype(int) - decimated).max() <= 1
+                line.parent = None
+
+        # the vertices must fit in the texture
+        line = Line(pos, method='agg_gpu', parent=c.scene)
+        max_texels = line_module.MAX_TEXELS
+        line_module.MAX_TEXELS = 10
+        try:
+            assert_raises(ValueError, c.render)
+        finally:
+            line_module.MAX_TEXELS = max_texels
+
+
+run_tests_if_main()
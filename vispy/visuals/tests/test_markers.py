@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import numpy as np
 from vispy.scene.visuals import Markers
+from vispy.visuals.transforms import MatrixTransform, STTransform
 from vispy.testing import (requires_application, TestingCanvas,
-                           run_tests_if_main)
+                           run_tests_if_main, assert_raises, record_glir)
 from vispy.testing.image_tester import assert_image_approved
 
 
@@ -26,4 +27,165 @@ def test_markers():
         assert_image_approved(c.render(), "visuals/markers.png")
 
 
+@requires_application()
+def test_markers_update_data():
+    """Test updating some attributes of some markers"""
+    rng = np.random.RandomState(0)
+    pos = rng.uniform(10, 70, (20, 2))
+    face_color = rng.uniform(0, 1, (20, 4))
+    face_color[:, 3] = 1
+    with TestingCanvas(size=(80, 80), bgcolor='w') as c:
+        marker = Markers(parent=c.scene)
+        marker.set_data(pos, face_color=face_color, size=8)
+        c.render()
+
+        with record_glir(marker._vbos) as commands:
+            new_pos = pos + 5
+            marker.update_data(pos=new_pos)
+            marker.update_data(pos=new_pos[5:10] - 10, face_color='red',
+                               offset=5)
+            marker.update_data(size=12, offset=18)
+            updated = c.render()
+        uploads = [cmd for cmd in commands if cmd[1] == 'DATA']
+        # the positions are uploaded once, and only the updated markers of
+        # the other attributes
+        assert sorted(cmd[0] for cmd in uploads) == \
+            ['a_bg_color', 'a_position', 'a_size']
+        for name, _, _, offset, data in uploads:
+            if name == 'a_position':
+                assert offset == 0 and len(data) == 20
+            elif name == 'a_bg_color':
+                assert offset == 5 * 16 and len(data) == 5
+            else:
+                assert offset == 18 * 4 and len(data) == 2
+
+        new_pos[5:10] -= 10
+        face_color[5:10] = (1, 0, 0, 1)
+        size = np.full(20, 8.)
+        size[18:] = 12
+        marker.set_data(new_pos, face_color=face_color, size=size)
+        assert np.array_equal(c.render(), updated)
+
+        assert_raises(ValueError, marker.update_data, pos=pos, offset=1)
+        assert_raises(ValueError, marker.update_data, pos=pos[:3],
+                      size=np.ones(4))
+        assert_raises(ValueError, marker.update_data, edge_width=-1)
+        assert_raises(ValueError, marker.update_data,
+                      face_color=np.full((20, 4), 2.))
+        assert_raises(ValueError, marker.set_data, pos,
+                      face_color=-face_color)
+
+        # the bounds follow the positions, and one color is for all markers
+        marker.update_data(pos=pos * 2)
+        assert np.allclose(marker.bounds(0), (pos[:, 0].min() * 2,
+                                              pos[:, 0].max() * 2))
+        marker.update_data(face_color=np.array([[0., 0., 1., 1.]]))
+        assert (marker._data['a_bg_color'] == (0, 0, 1, 1)).all()
+        assert_raises(RuntimeError, Markers().update_data, pos=pos)
+
+
+@requires_application()
+def test_markers_lod():
+    """Test drawing fewer markers when zooming out"""
+    rng = np.random.RandomState(0)
+    pos = rng.uniform(0, 80, (100000, 2))
+    with TestingCanvas(size=(80, 80)) as c:
+        marker = Markers(pos=pos, size=1, edge_width=0, lod=2,
+                         parent=c.scene)
+        glir_objects = dict(marker._vbos, indices=marker._index_buffer)
+        with record_glir(glir_objects) as commands:
+            drawn = []
+            for scale in (1, 0.1, 10):
+                marker.transform = STTransform(scale=(scale, scale))
+                c.render()
+                uploads = [cmd for cmd in commands if cmd[1] == 'DATA']
+                drawn.append(uploads[-1][-1])
+            # the same indices are not uploaded again
+            c.render()
+        uploads = [cmd[0] for cmd in commands if cmd[1] == 'DATA']
+        assert sorted(uploads[:5]) == sorted(marker._vbos)
+        assert uploads[5:] == ['indices'] * 3
+
+        # one marker per square of 1 to 2 pixels, then all the markers in
+        # the view
+        assert 40 * 40 <= len(drawn[0]) <= 80 * 80
+        assert len(drawn[1]) <= 4 * 4
+        for indices in drawn:
+            assert len(np.unique(indices)) == len(indices)
+        inside = np.nonzero((pos < 8).all(axis=1))[0]
+        assert np.in1d(inside, drawn[2]).all()
+        assert len(drawn[2]) < 2 * len(inside)
+
+    # all the markers are drawn when they are far apart
+    pos = np.mgrid[10:80:20, 10:80:20].reshape(2, -1).T
+    with TestingCanvas(size=(80, 80)) as c:
+        marker = Markers(pos=pos, parent=c.scene)
+        expected = c.render()
+        marker.lod = 1
+        assert np.array_equal(c.render(), expected)
+        marker.lod = None
+        assert marker._index_buffer is None
+        assert_raises(ValueError, setattr, marker, 'lod', 0)
+
+
+def _rotation(angle):
+    """Rotation of the markers about the x axis through their center"""
+    tr = MatrixTransform()
+    tr.translate((-40, -40, 0))
+    tr.rotate(angle, (1, 0, 0))
+    tr.translate((40, 40, 0))
+    return tr
+
+
+@requires_application()
+def test_markers_depth_sort():
+    """Test drawing translucent markers back to front"""
+    pos = np.array([[40, 40, z] for z in (-0.5, 0, 0.5)])
+    colors = np.array([[1, 0, 0, .5], [0, 1, 0, .5], [0, 0, 1, .5]])
+    kwargs = dict(size=20, edge_width=0)
+    with TestingCanvas(size=(80, 80), bgcolor='w') as c:
+        # the markers with the smallest z are the nearest
+        marker = Markers(pos=pos[::-1], face_color=colors[::-1],
+                         parent=c.scene, **kwargs)
+        expected = c.render()
+        marker.set_data(pos, face_color=colors, **kwargs)
+        assert not np.array_equal(c.render(), expected)
+        marker.depth_sort = True
+        assert np.array_equal(c.render(), expected)
+        assert np.array_equal(marker._sorter.order, [2, 1, 0])
+
+        # the markers are only sorted again when the view turns enough
+        with record_glir(marker._index_buffer) as commands:
+            marker.transform = _rotation(0.5)
+            c.render()
+            assert len(commands) == 0
+            marker.transform = _rotation(180)
+            flipped = c.render()
+            assert [cmd[0] for cmd in commands].count('DATA') == 1
+        assert np.array_equal(marker._sorter.order, [0, 1, 2])
+        marker.depth_sort = False
+        assert np.array_equal(c.render(), flipped)
+
+        # the markers are drawn unsorted until the thread is done
+        marker.transform = MatrixTransform()
+        marker.depth_sort = 'thread'
+        c.render()
+        marker._sorter.wait()
+        assert np.array_equal(c.render(), expected)
+
+        # with level of detail, only the selected markers are sorted
+        marker.set_data(np.concatenate([pos, pos + (0, 0, 0.1)]),
+                        face_color=np.concatenate([colors] * 2), **kwargs)
+        marker.depth_sort = True
+        marker.lod = 20
+        c.render()
+        order = marker._sorter.order
+        assert np.array_equal(order, [5, 2, 4, 1, 3, 0])
+        assert len(marker._lod_indices) == 1
+        assert marker._index_count == 1
+
+        assert_raises(ValueError, setattr, marker, 'depth_sort', 'fast')
+        assert_raises(ValueError, setattr, marker, 'depth_sort_angle', -1)
+
+
 run_tests_if_main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.scene.visuals import MultiLine
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises, record_glir)
+
+
+@requires_application()
+def test_multi_line():
+    """Test drawing many lines with per-line styles"""
+    # vertices at the centers of the pixels
+    pos = np.array([[10, 10], [70, 10], [10, 30], [70, 30], [40, 40],
+                    [40, 55]], float) + 0.5
+    with TestingCanvas(size=(80, 60), bgcolor='k') as c:
+        lines = MultiLine(pos, lengths=[2, 2, 2],
+                          color=['red', 'lime', 'blue'], width=[1, 3, 5],
+                          antialias=0, parent=c.scene)
+        assert lines.n_lines == 3
+        assert np.array_equal(lines.offsets, [0, 2, 4])
+        rendered = c.render()
+        # the segments have square caps
+        assert np.array_equal(np.nonzero(rendered[:, 40, 0])[0], [10])
+        assert np.array_equal(np.nonzero(rendered[10, :, 0])[0],
+                              np.arange(10, 71))
+        assert np.array_equal(np.nonzero(rendered[:, 40, 1])[0],
+                              [29, 30, 31])
+        assert np.array_equal(np.nonzero(rendered[47, :, 2])[0],
+                              np.arange(38, 43))
+        assert np.array_equal(np.nonzero(rendered[:, 40, 2])[0],
+                              np.arange(38, 58))
+
+        lines.line_visible = [True, False, True]
+        assert c.render()[..., 1].max() == 0
+        lines.set_line(1, visible=True, width=1, color='white')
+        rendered = c.render()
+        assert np.array_equal(np.nonzero(rendered[:, 20, :3].max(axis=1))[0],
+                              [10, 30])
+        assert (rendered[30, 20, :3] == 255).all()
+
+        # the same lines from a list, or offsets
+        lines.set_data([pos[:2], pos[2:4] + (0, 10), pos[4:]])
+        assert np.array_equal(np.nonzero(c.render()[:, 20, 1])[0], [40])
+        lines.set_data(pos, offsets=[0, 2, 4])
+        assert np.array_equal(np.nonzero(c.render()[:, 20, 1])[0], [30])
+        assert lines.bounds(0) == (10.5, 70.5)
+        assert lines.bounds(1) == (10.5, 55.5)
+
+        # the styles are kept unless the number of lines changes
+        assert lines.color[1].tolist() == [1, 1, 1, 1]
+        lines.set_data(pos, lengths=[3, 3])
+        assert lines.color.tolist() == [[1, 1, 1, 1]] * 2
+        assert lines.width.tolist() == [1, 1]
+
+        assert_raises(ValueError, lines.set_data, pos, lengths=[2, 2])
+        assert_raises(ValueError, lines.set_data, pos, offsets=[1, 2])
+        assert_raises(ValueError, setattr, lines, 'width', [1, 2, 3])
+        assert_raises(ValueError, setattr, lines, 'antialias', -1)
+        assert_raises(ValueError, lines.set_line, 0, pos[:2])
+        assert_raises(IndexError, lines.set_line, 2, color='red')
+
+
+@requires_application()
+def test_multi_line_set_line():
+    """Test that changing one line only uploads its vertices"""
+    rng = np.random.RandomState(0)
+    pos = rng.uniform(0, 100, (9000, 2))
+    with TestingCanvas(size=(100, 100), bgcolor='k') as c:
+        lines = MultiLine(pos, lengths=[3] * 3000, parent=c.scene)
+        c.render()
+        glir_objects = dict((name, getattr(lines, name)) for name in
+                            ('_vertices_tex', '_colors_tex', '_styles_tex',
+                             '_corners', '_index_buffer'))
+        with record_glir(glir_objects) as commands:
+            # the vertices 4095 to 4097 of this line span two rows
+            new = rng.uniform(0, 100, (3, 2))
+            lines.set_line(1365, new, color='red')
+            c.render()
+        uploads = [(cmd[0], cmd[3], cmd[4].shape) for cmd in commands
+                   if cmd[1] == 'DATA']
+        assert uploads == [('_vertices_tex', (0, 4095), (1, 1, 4)),
+                           ('_vertices_tex', (1, 0), (1, 2, 4)),
+                           ('_colors_tex', (0, 1365), (1, 1, 4))]
+        assert np.allclose(lines.pos[4095:4098], new)
+        assert lines.color[1365].tolist() == [1, 0, 0, 1]
+
+
+run_tests_if_main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.color import Color
+from vispy.scene.visuals import MultiChannelImage
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises)
+
+
+def _composite(data, clims, gammas, colors, blending):
+    """The expected colors for channels with black-to-color colormaps"""
+    out = np.zeros(data.shape[1:] + (3,))
+    for channel, clim, gamma, color in zip(data, clims, gammas, colors):
+        t = np.clip((channel - float(clim[0])) / (clim[1] - clim[0]), 0, 1)
+        rgb = t[..., np.newaxis] ** gamma * Color(color).rgb
+        out = out + rgb if blending == 'additive' else np.maximum(out, rgb)
+    return np.clip(out, 0, 1) * 255
+
+
+@requires_application()
+def test_multichannel_image():
+    """Test compositing the channels of a multichannel image"""
+    size = (40, 30)
+    with TestingCanvas(size=size, bgcolor='k') as c:
+        rng = np.random.RandomState(0)
+        data = rng.randint(0, 4000, (5, 30, 40)).astype(np.uint16)
+        colors = ['red', 'green', 'blue', 'magenta', 'yellow']
+        clims = [(0, 4000), (1000, 3000), (0, 8000), (0, 4000), (0, 2000)]
+        gammas = [1., 2., 1., 0.5, 1.]
+        image = MultiChannelImage(data, cmaps=colors, clims=clims,
+                                  gammas=gammas, parent=c.scene)
+        assert image.n_channels == 5
+        assert len(image._textures) == 2
+        assert image.clims == clims
+        for blending in ('additive', 'max'):
+            image.blending = blending
+            rendered = c.render()[..., :3].astype(float)
+            expected = _composite(data, clims, gammas, colors, blending)
+            assert np.abs(rendered - expected).max() <= 3
+
+        # hidden channels are not drawn
+        image.channel_visible = [True, False, False, False, True]
+        rendered = c.render()[..., :3].astype(float)
+        expected = _composite(data[[0, 4]], clims[::4], gammas[::4],
+                              colors[::4], 'max')
+        assert np.abs(rendered - expected).max() <= 3
+
+        # the settings are kept when the data changes, except the number
+        # of channels which resets them
+        image.set_data(data[::-1].astype(np.float32))
+        assert image.clims == clims
+        assert image.channel_visible == [True, False, False, False, True]
+        image.set_data([np.full((30, 40), 0.5)] * 2)
+        assert image.n_channels == 2
+        assert image.clims == ['auto', 'auto']
+        c.render()
+        assert image.clims == [(0.5, 0.5)] * 2
+        assert image.channel_visible == [True, True]
+
+        image.clims = (0, 1)
+        image.cmaps = 'grays'
+        image.gammas = [1, 1]
+        image.blending = 'additive'
+        rendered = c.render()[..., :3]
+        assert np.abs(rendered.astype(int) - 255).max() <= 1
+
+        assert_raises(ValueError, setattr, image, 'clims', [(0, 1)] * 3)
+        assert_raises(ValueError, setattr, image, 'gammas', 0)
+        assert_raises(ValueError, setattr, image, 'blending', 'over')
+        assert_raises(ValueError, image.set_data, np.zeros((17, 4, 4)))
+        assert_raises(ValueError, image.set_data,
+                      [np.zeros((4, 4)), np.zeros((4, 5))])
+
+
+run_tests_if_main()
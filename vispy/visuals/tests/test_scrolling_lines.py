@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from vispy.scene.visuals import ScrollingLines
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises, record_glir)
+
+
+@requires_application()
+def test_scrolling_lines_dtype():
+    """Test streaming integer samples scaled in the shader"""
+    with TestingCanvas(size=(100, 60), bgcolor='k') as c:
+        for dtype, low in (('float32', 0), ('uint16', 0), ('int16', -500)):
+            lines = ScrollingLines(n_lines=2, line_size=100, dx=1, columns=1,
+                                   cell_size=(0, 30), dtype=dtype,
+                                   data_scale=0.01, data_offset=10.5,
+                                   parent=c.scene)
+            data = np.full((2, 100), low)
+            data[:, 50:] += 1000
+            lines.roll_data(data.astype(dtype))
+            rendered = c.render()[..., 0]
+            row = 10 + low // 100
+            assert np.array_equal(np.nonzero(rendered[:, 20])[0],
+                                  [row, row + 30])
+            assert np.array_equal(np.nonzero(rendered[:, 80])[0],
+                                  [row + 10, row + 40])
+
+            # the scale and offset are applied by the shader
+            lines.data_offset = 5.5
+            lines.data_scale = 0.02
+            rendered = c.render()[..., 0]
+            row = 5 + (low + 1000) // 50
+            assert np.array_equal(np.nonzero(rendered[:, 80])[0],
+                                  [row, row + 30])
+            lines.parent = None
+
+        assert_raises(ValueError, ScrollingLines, 2, 10, 1, columns=1,
+                      cell_size=(0, 1), dtype='int32')
+        assert_raises(ValueError, ScrollingLines, 2, 10, 1, columns=1,
+                      cell_size=(0, 1), decimate=1)
+
+
+@requires_application()
+def test_scrolling_lines_decimate():
+    """Test the min/max decimation of the samples"""
+    with TestingCanvas(size=(100, 60), bgcolor='k') as c:
+        lines = ScrollingLines(n_lines=2, line_size=100, dx=0.2, columns=1,
+                               cell_size=(0, 30), dtype='int16', decimate=10,
+                               data_scale=0.01, data_offset=10.5,
+                               parent=c.scene)
+        rng = np.random.RandomState(0)
+        data = rng.randint(-900, 900, (2, 500)).astype(np.int16)
+        data[:, 3::10] = [[1000], [-1000]]
+        data[:, 7::10] = [[-1000], [1000]]
+        with record_glir(lines._pos_tex) as commands:
+            # the samples not filling a block are kept for the next chunk
+            lines.roll_data(data[:, :257])
+            lines.roll_data(data[:, 257:])
+        uploads = [cmd[3] for cmd in commands if cmd[0] == 'DATA']
+        assert [u.shape for u in uploads] == [(2, 50, 1), (2, 50, 1)]
+        assert uploads[0].dtype == np.uint16
+        # the extrema of each block, in order
+        stored = uploads[0][..., 0].astype(int) - 32768
+        assert (stored[0, ::2] == 1000).all()
+        assert (stored[0, 1::2] == -1000).all()
+        assert (stored[1, ::2] == -1000).all()
+        assert (stored[1, 1::2] == 1000).all()
+
+        # the lines go through all the rows between the extrema
+        rendered = c.render()[..., 0]
+        assert (rendered[1:20, 10:90] > 0).all(axis=1).all()
+        assert rendered[21:30].max() == 0
+
+        lines.set_data(0, np.zeros(500, np.int16))
+        rendered = c.render()[..., 0]
+        assert np.array_equal(np.nonzero(rendered[:30, 50])[0], [10])
+
+
+run_tests_if_main()
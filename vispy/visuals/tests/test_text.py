@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import numpy as np
+
 from vispy.scene.visuals import Text
+from vispy.gloo import context
 from vispy.testing import (requires_application, TestingCanvas,
                            run_tests_if_main)
 from vispy.testing.image_tester import assert_image_approved
+from vispy.visuals.text.text import FontManager, _text_to_vbo
 
 
 @requires_application()
@@ -34,4 +38,57 @@ def test_text():
         c.app.process_events()
 
 
+@requires_application()
+def test_text_layout():
+    """Test laying out many texts at once"""
+    with TestingCanvas():
+        font = FontManager().get_font('OpenSans')
+        texts = ['AVAWAY', 'two\nlines', '', 'a\tb', 'x\vy\n\a']
+        vertices = _text_to_vbo(texts, font, 'right', 'top', 64)
+        assert len(vertices) == 4 * sum(len(t) for t in texts)
+        assert np.array_equal(vertices, np.concatenate(
+            [_text_to_vbo(t, font, 'right', 'top', 64) for t in texts]))
+
+        # the glyphs are positioned along the line, with kerning
+        quads = _text_to_vbo('AVAWAY', font, 'left', 'baseline', 64)
+        x = quads['a_position'].reshape(6, 4, 2)[:, 0, 0]
+        assert (np.diff(x) > 0).all()
+        a, v = font['A'], font['V']
+        assert v['kerning']['A'] < 0
+        expected = (a['advance'] + v['kerning']['A'] + v['offset'][0] -
+                    a['offset'][0]) / font.ratio / 64
+        assert np.isclose(x[1] - x[0], expected)
+
+        # only the non-zero kerning is stored, for the pairs of all the
+        # glyphs loaded so far, in any order of loading
+        font.glyph_indices([ord(char) for char in 'Tyo'])
+        chars = font._chars
+        prev, cur = np.mgrid[:len(chars), :len(chars)].reshape(2, -1)
+        expected = [font[chars[j]]['kerning'][chars[i]]
+                    for i, j in zip(prev, cur)]
+        assert np.array_equal(font.kerning(prev, cur), expected)
+        assert 0 < len(font._kerning) == np.count_nonzero(expected)
+
+        # each line is aligned, below the previous one, and the escape
+        # sequences are empty quads
+        quads = _text_to_vbo('ab\ncd', font, 'right', 'top', 64)
+        quads = quads['a_position'].reshape(5, 4, 2)
+        assert (quads[2] == 0).all()
+        assert np.isclose(quads[1, 2, 0], quads[4, 2, 0], atol=0.05)
+        assert quads[3:, :, 1].max() < quads[:2, :, 1].min()
+        tab = _text_to_vbo('a\tb', font, 'left', 'top', 64)
+        space = _text_to_vbo('a    b', font, 'left', 'top', 64)
+        assert np.allclose(tab['a_position'][-4:], space['a_position'][-4:])
+
+        # once the glyphs are loaded, laying out does not use the GL
+        labels = ['%d' % i for i in range(1000)]
+        _text_to_vbo(labels, font, 'center', 'center', 64)
+        get_current_canvas = context.get_current_canvas
+        context.get_current_canvas = None
+        try:
+            _text_to_vbo(labels, font, 'center', 'center', 64)
+        finally:
+            context.get_current_canvas = get_current_canvas
+
+
 run_tests_if_main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy.scene.visuals import Image, TiledImage
+from vispy.scene import STTransform
+from vispy.testing import (requires_application, TestingCanvas,
+                           run_tests_if_main, assert_raises)
+
+
+@requires_application()
+def test_tiled_image():
+    """Test tiled image visual"""
+    with TestingCanvas(size=(100, 80), bgcolor='k') as c:
+        data = np.random.RandomState(0).rand(320, 512).astype(np.float32)
+        image = Image(data, cmap='grays', clim=(0, 1), parent=c.scene)
+        expected = c.render()
+        image.set_data(data[::4, ::4])
+        expected_4 = c.render()
+        image.parent = None
+
+        pyramid = [data, data[::2, ::2], data[::4, ::4], data[::8, ::8]]
+        for source in (data, pyramid):
+            for async_load in (False, True):
+                tiled = TiledImage(source, tile_size=64, cache_size=(4, 4),
+                                   cmap='grays', clim=(0, 1),
+                                   async_load=async_load, parent=c.scene)
+                assert tiled.n_levels == 4
+                assert tiled.size == (512, 320)
+                for scale, level, exp in [(1, 0, expected),
+                                          (0.25, 2, expected_4)]:
+                    tiled.transform = STTransform(scale=(scale, scale))
+                    img = c.render()
+                    if async_load:
+                        tiled.wait()
+                        img = c.render()
+                    assert tiled.level == level
+                    assert_array_equal(img, exp)
+                tiled.parent = None
+
+        # the level of detail is lowered when the cache is too small
+        tiled = TiledImage(data, tile_size=16, cache_size=(2, 2),
+                           cmap='grays', clim=(0, 1), async_load=False,
+                           parent=c.scene)
+        c.render()
+        assert tiled.level == 3
+
+        # errors while reading tiles are raised when drawing
+        def bad_data():
+            pass
+        bad_data.shape = (100, 100)
+        bad_data.dtype = np.float32
+        tiled.set_data(bad_data)
+        tiled.wait()
+        assert_raises(TypeError, c.render)
+        assert_raises(ValueError, tiled.set_data, np.zeros((10, 10, 5)))
+
+
+@requires_application()
+def test_tiled_image_linear():
+    """Test that the linear interpolation is continuous across tiles"""
+    with TestingCanvas(size=(80, 80), bgcolor='k') as c:
+        data = np.random.RandomState(0).rand(50, 70).astype(np.float32)
+        transform = STTransform(scale=(1.7, 1.7), translate=(-13, -11))
+        image = Image(data, cmap='grays', clim=(0, 1), interpolation='bilinear',
+                      parent=c.scene)
+        image.transform = transform
+        expected = c.render().astype(int)
+        image.parent = None
+        tiled = TiledImage(data, tile_size=16, cache_size=(5, 6),
+                           cmap='grays', clim=(0, 1), interpolation='linear',
+                           async_load=False, parent=c.scene)
+        tiled.transform = transform
+        rendered = c.render().astype(int)
+        assert tiled.level == 0
+        assert np.abs(rendered - expected).max() <= 1
+
+
+class _BlockingData(object):
+    """Array whose reads wait for an event"""
+
+    def __init__(self, data, event):
+        self._data = data
+        self._event = event
+        self.shape = data.shape
+        self.dtype = data.dtype
+
+    def __getitem__(self, item):
+        self._event.wait()
+        return self._data[item]
+
+
+@requires_application()
+def test_tiled_image_set_data_while_reading():
+    """Test that the tiles still being read from replaced data are dropped"""
+    with TestingCanvas(size=(64, 64), bgcolor='k') as c:
+        event = threading.Event()
+        old = _BlockingData(np.zeros((64, 64), np.float32), event)
+        tiled = TiledImage(old, tile_size=32, cmap='grays', clim=(0, 1),
+                           parent=c.scene)
+        try:
+            assert c.render()[..., 0].max() == 0
+            # the same tiles are requested while the old ones are read
+            tiled.set_data(np.ones((64, 64), np.float32))
+            c.render()
+        finally:
+            event.set()
+        tiled.wait()
+        c.render()
+        tiled.wait()
+        assert (c.render()[..., 0] == 255).all()
+
+
+run_tests_if_main()
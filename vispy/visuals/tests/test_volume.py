@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import time
+
 import numpy as np
-from vispy import scene
+from vispy import scene, visuals
+from vispy.color import BaseColormap
+from vispy.visuals.transforms import STTransform
+from vispy.visuals.volume import _cell_max, _empty_level
 
 from vispy.testing import (TestingCanvas, requires_application,
                            run_tests_if_main, requires_pyopengl,
@@ -57,4 +62,187 @@ def test_volume_draw():
         assert_image_approved(c.render(), 'visuals/volume.png')
 
 
+@requires_pyopengl()
+@requires_application()
+def test_volume_native_dtype():
+    with TestingCanvas(bgcolor='k', size=(80, 80)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        vol = np.random.RandomState(0).randint(0, 1000, (20, 20, 20))
+        clim = (200, 800)
+        images = {}
+        for dtype, internalformat in [(np.float64, 'r32f'),
+                                      (np.float32, 'r32f'),
+                                      (np.uint16, 'r16')]:
+            V = scene.visuals.Volume(vol.astype(dtype), clim=clim,
+                                     parent=v.scene)
+            # the texture holds the data in its native dtype
+            assert V._tex._internalformat == internalformat
+            v.camera.set_range()
+            images[dtype] = c.render()
+            V.parent = None
+        assert np.array_equal(images[np.float32], images[np.float64])
+        assert np.array_equal(images[np.uint16], images[np.float64])
+
+        # clim is estimated when needed
+        V = scene.visuals.Volume(vol.astype(np.uint16), parent=v.scene)
+        assert V._clim is None
+        assert V.clim == (vol.min(), vol.max())
+        V.set_data(vol.astype(np.uint16), clim=clim)
+        assert V.clim == clim
+
+
+@requires_pyopengl()
+@requires_application()
+def test_volume_default_threshold():
+    with TestingCanvas(bgcolor='k', size=(80, 80)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        rng = np.random.RandomState(0)
+        vol = rng.uniform(0, 1000, (20, 20, 20))
+        vol[5:15, 5:15, 5:15] = 1000
+        for dtype in (np.float32, np.uint16):
+            data = vol.astype(dtype)
+            V = scene.visuals.Volume(data, method='iso', parent=v.scene)
+            # the threshold is normalized by clim, as are the samples
+            cmin, cmax = V.clim
+            expected = (data.astype(float).mean() - cmin) / (cmax - cmin)
+            assert abs(V.threshold - expected) < 0.01
+            assert 0.5 < V.threshold < 0.7
+            v.camera.set_range()
+            assert c.render()[..., :3].max() > 100
+            # and follows it
+            V.set_data(data, clim=(0, 2000))
+            assert abs(V.threshold - data.astype(float).mean() / 2000) < 0.01
+            V.threshold = 0.2
+            assert V.threshold == 0.2
+            V.parent = None
+
+
+class _TransparentGrays(BaseColormap):
+    glsl_map = """
+    vec4 transparent_grays(float t) {
+        return vec4(t, t, t, clamp(t - 0.2, 0.0, 1.0));
+    }
+    """
+
+    def map(self, t):
+        return np.hstack([t, t, t, np.clip(t - 0.2, 0, 1)])
+
+
+def test_volume_grid():
+    vol = np.random.RandomState(0).rand(20, 17, 9)
+    grid = _cell_max(vol, 8)
+    assert grid.shape == (3, 3, 2)
+    for index in np.ndindex(*grid.shape):
+        # cells are extended by one voxel on each side
+        region = tuple(slice(max(i * 8 - 1, 0), i * 8 + 9) for i in index)
+        assert grid[index] == vol[region].max()
+
+    assert _empty_level(scene.visuals.Volume(vol).cmap, 'translucent') < 0
+    assert _empty_level(scene.visuals.Volume(vol).cmap, 'additive') == 0
+    level = _empty_level(_TransparentGrays(), 'translucent')
+    assert 0.19 < level <= 0.2
+
+
+@requires_pyopengl()
+@requires_application()
+def test_volume_empty_space_skipping():
+    with TestingCanvas(bgcolor='k', size=(80, 80)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        vol = np.zeros((40, 48, 56), np.uint16)
+        vol[5:10, 30:40, 20:30] = 30000
+        vol[25:35, 8:12, 40:52] = 60000
+        for method, cmap in [('mip', 'grays'), ('iso', 'grays'),
+                             ('additive', 'grays'),
+                             ('translucent', _TransparentGrays())]:
+            images = []
+            for skip in (False, True):
+                V = scene.visuals.Volume(vol, clim=(0, 65535), method=method,
+                                         threshold=0.3, cmap=cmap,
+                                         empty_space_skipping=skip,
+                                         parent=v.scene)
+                assert (V._skip_fun is V._grid_fun) == skip
+                v.camera.set_range()
+                images.append(c.render().astype(int))
+                V.parent = None
+            assert images[0][..., :3].max() > 100
+            assert np.abs(images[0] - images[1]).max() <= 2
+
+        # not available for multi-channel volumes
+        V = scene.visuals.Volume(np.zeros((10, 10, 10, 3), np.float32))
+        assert V._skip_fun is not V._grid_fun
+
+
+@requires_pyopengl()
+@requires_application()
+def test_volume_interactive_step_size():
+    with TestingCanvas(bgcolor='k', size=(60, 60)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        vol = np.random.RandomState(0).rand(20, 24, 28).astype(np.float32)
+        V = scene.visuals.Volume(vol, relative_step_size=0.8,
+                                 interactive_step_size=3.2, parent=v.scene)
+        V.refine_delay = 0.1
+        v.camera.set_range()
+        c.render()
+        assert V._step_size == 0.8
+
+        def step_size():
+            c.render()
+            return V._step_size
+
+        # coarse while the camera moves
+        v.camera.azimuth += 10
+        assert step_size() == 3.2
+        assert step_size() == 3.2
+        v.camera.azimuth += 10
+        assert step_size() == 3.2
+        expected = c.render()
+        # a draw before the delay schedules one for the remaining time
+        assert V._view_states[V]["timer"].running
+        assert 0 < V._view_states[V]["timer"].interval < 0.1
+        # refined progressively once the camera stops
+        time.sleep(0.15)
+        assert [step_size() for i in range(3)] == [1.6, 0.8, 0.8]
+        image = c.render()
+        assert not np.array_equal(image, expected)
+        V.interactive_step_size = None
+        assert np.array_equal(c.render(), image)
+        v.camera.azimuth += 10
+        assert step_size() == 0.8
+
+        with raises(ValueError):
+            V.interactive_step_size = 0.5
+
+
+@requires_pyopengl()
+@requires_application()
+def test_volume_interactive_step_size_views():
+    with TestingCanvas(bgcolor='k', size=(60, 60)) as c:
+        vol = np.random.RandomState(0).rand(20, 24, 28).astype(np.float32)
+        V = visuals.VolumeVisual(vol, relative_step_size=0.8,
+                                 interactive_step_size=3.2)
+        V.refine_delay = 0
+        W = V.view()
+        for view in (V, W):
+            view.transforms.configure(canvas=c, viewport=(0, 0, 60, 60))
+            view.transform = STTransform(scale=(2, 2, 1e-3))
+
+        def step_sizes():
+            V.draw()
+            W.draw()
+            return [V._view_states[view]['step'] for view in (V, W)]
+
+        # the views drawn alternately are refined
+        assert step_sizes() == [0.8, 0.8]
+        assert step_sizes() == [0.8, 0.8]
+        # only the moved view is coarse
+        W.transform.translate = (5, 0)
+        assert step_sizes() == [0.8, 3.2]
+        assert [step_sizes() for i in range(3)] == [[0.8, 1.6], [0.8, 0.8],
+                                                    [0.8, 0.8]]
+
+
 run_tests_if_main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from vispy import scene
+
+from vispy.testing import (TestingCanvas, requires_application,
+                           run_tests_if_main, requires_pyopengl,
+                           assert_raises)
+
+
+@requires_pyopengl()
+@requires_application()
+def test_volume_series():
+    with TestingCanvas(bgcolor='k', size=(60, 60)) as c:
+        v = c.central_widget.add_view()
+        v.camera = 'turntable'
+        data = np.zeros((6, 20, 24, 28), np.uint16)
+        for t in range(len(data)):
+            data[t, 5:15, 2 + 3 * t:8 + 3 * t, 10:20] = 1000 * (t + 1)
+        clim = (0, 6000)
+
+        expected = []
+        V = scene.visuals.Volume(data[0], clim=clim, parent=v.scene)
+        v.camera.set_range()
+        for vol in data:
+            V.set_data(vol, clim=clim)
+            expected.append(c.render())
+        V.parent = None
+
+        for source in (data, list(data)):
+            S = scene.visuals.VolumeSeries(source, clim=clim, ring_size=3,
+                                           parent=v.scene)
+            assert S.n_timepoints == 6
+            assert S.ring_size == 3
+            assert np.array_equal(c.render(), expected[0])
+            assert S.displayed_index == 0
+            # the next timepoints are prefetched and uploaded one per draw
+            S.wait()
+            c.render()
+            c.render()
+            assert sorted(S._slots) == [0, 1, 2]
+            for t in (1, 2):
+                S.index = t
+                assert np.array_equal(c.render(), expected[t])
+                assert S.displayed_index == t
+            # jumping to a timepoint that is not loaded shows the previous
+            # one until it is available
+            S.index = 5
+            image = c.render()
+            if S.displayed_index == 2:
+                assert np.array_equal(image, expected[2])
+                S.wait()
+                image = c.render()
+            assert S.displayed_index == 5
+            assert np.array_equal(image, expected[5])
+            # backward scrubbing prefetches backward
+            S.index = 4
+            c.render()
+            S.wait()
+            c.render()
+            c.render()
+            assert sorted(S._slots) == [2, 3, 4]
+            S.parent = None
+
+        # synchronous loading
+        S = scene.visuals.VolumeSeries(data, clim=clim, ring_size=1,
+                                       async_load=False, parent=v.scene)
+        for t in (3, 1):
+            S.index = t
+            assert np.array_equal(c.render(), expected[t])
+        # the default threshold is normalized by clim
+        assert np.isclose(S.threshold, data[0].mean() / 6000.)
+
+        assert_raises(IndexError, setattr, S, 'index', 6)
+        assert_raises(ValueError, scene.visuals.VolumeSeries, data,
+                      ring_size=0)
+        assert_raises(ValueError, S.set_data, np.zeros((2, 10, 10)))
+
+
+run_tests_if_main()
@@ -237,6 +237,12 @@ class SDFRendererGPU(object):
 
         # Initialize variables
         self.fbo_to = [FrameBuffer(), FrameBuffer(), FrameBuffer()]
+        # The intermediate textures of the negative and positive halves,
+        # kept between calls and only resized when the glyph shape changes
+        self.comp_texs = [Texture2D((1, 1, 4), format='rgba',
+                                    interpolation='nearest',
+                                    wrapping='clamp_to_edge')
+                          for _ in range(4)]
         vtype = np.dtype([('a_position', np.float32, 2),
                           ('a_texcoord', np.float32, 2)])
         vertices = np.zeros(4, dtype=vtype)
@@ -264,15 +270,20 @@ class SDFRendererGPU(object):
         assert isinstance(texture, Texture2D)
         set_state(blend=False, depth_test=False)
 
+        shape = data.shape[:2] + (4,)
+        for tex in self.comp_texs:
+            if tex.shape != shape:
+                tex.resize(shape)
+
         # calculate the negative half (within object)
         orig_tex = Texture2D(255 - data, format='luminance',
                              wrapping='clamp_to_edge', interpolation='nearest')
-        edf_neg_tex = self._render_edf(orig_tex)
+        edf_neg_tex = self._render_edf(orig_tex, self.comp_texs[:2])
 
         # calculate positive half (outside object)
         orig_tex[:, :, 0] = data
 
-        edf_pos_tex = self._render_edf(orig_tex)
+        edf_pos_tex = self._render_edf(orig_tex, self.comp_texs[2:])
 
         # render final product to output texture
         self.program_insert['u_texture'] = orig_tex
@@ -283,16 +294,10 @@ class SDFRendererGPU(object):
             set_viewport(tuple(offset) + tuple(size))
             self.program_insert.draw('triangle_strip')
 
-    def _render_edf(self, orig_tex):
-        """Render an EDF to a texture"""
-        # Set up the necessary textures
+    def _render_edf(self, orig_tex, comp_texs):
+        """Render an EDF to one of the two given textures, and return that
+        texture"""
         sdf_size = orig_tex.shape[:2]
-
-        comp_texs = []
-        for _ in range(2):
-            tex = Texture2D(sdf_size + (4,), format='rgba',
-                            interpolation='nearest', wrapping='clamp_to_edge')
-            comp_texs.append(tex)
         self.fbo_to[0].color_buffer = comp_texs[0]
         self.fbo_to[1].color_buffer = comp_texs[1]
         for program in self.programs[1:]:  # program_seed does not need this
@@ -12,6 +12,7 @@ from __future__ import division
 
 import numpy as np
 from copy import deepcopy
+from operator import methodcaller
 import sys
 
 from ._sdf_gpu import SDFRendererGPU
@@ -19,7 +20,7 @@ from ._sdf_cpu import _calc_distance_field
 from ...gloo import (TextureAtlas, IndexBuffer, VertexBuffer)
 from ...gloo import context
 from ...gloo.wrappers import _check_valid
-from ...ext.six import string_types
+from ...ext.six import string_types, unichr
 from ...util.fonts import _load_glyph
 from ..transforms import STTransform
 from ...color import ColorArray
@@ -27,6 +28,10 @@ from ..visual import Visual
 from ...io import load_spatial_filters
 
 
+# The multiplier of the index of the previous glyph in the kerning keys
+_KERNING_BASE = 2 ** 32
+
+
 class TextureFont(object):
     """Gather a set of glyphs relative to a given font name and size
 
@@ -63,6 +68,21 @@ class TextureFont(object):
         self._spread = 32
         assert self._spread % self.ratio == 0
         self._glyphs = {}
+        # The metrics of the glyphs, in the order in which they were loaded,
+        # as arrays for laying out text with NumPy
+        self._chars = []
+        self._index = {}
+        self._advance = np.zeros(0)
+        self._offset = np.zeros((0, 2))
+        self._size = np.zeros((0, 2))
+        self._texcoords = np.zeros((0, 4))
+        # The non-zero kerning of pairs of glyphs, by the sorted keys
+        # previous * _KERNING_BASE + current of their indices
+        self._kerning_keys = np.zeros(0, np.int64)
+        self._kerning = np.zeros(0)
+        self._kerning_dicts = []
+        self._kerning_sizes = np.zeros(0, int)
+        self._line_metrics = None
 
     @property
     def ratio(self):
@@ -118,6 +138,146 @@ class TextureFont(object):
         v1 = (y+h) / float(self._atlas.shape[0])
         texcoords = (u0, v0, u1, v1)
         glyph.update(dict(size=(w, h), texcoords=texcoords))
+        self._index[char] = len(self._chars)
+        self._chars.append(char)
+
+    def _load_chars(self, chars):
+        """Load the glyphs of several characters
+
+        The viewport is restored afterwards, as rendering the glyphs with
+        the GPU changes it.
+        """
+        # Necessary to flush commands before requesting current viewport
+        # because there may be a set_viewport command waiting in the queue.
+        # TODO: would be nicer if each canvas just remembers and manages its
+        # own viewport, rather than relying on the context for this.
+        canvas = context.get_current_canvas()
+        canvas.context.flush_commands()
+        orig_viewport = canvas.context.get_viewport()
+        for char in chars:
+            self._load_char(char)
+        if orig_viewport is not None:
+            canvas.context.set_viewport(*orig_viewport)
+
+    def _update_metrics(self):
+        """Append the metrics of the glyphs loaded since the last update to
+        the metric arrays"""
+        old, n = len(self._advance), len(self._chars)
+        if old == n:
+            return
+        glyphs = [self._glyphs[char] for char in self._chars[old:]]
+        self._advance = np.concatenate(
+            [self._advance, [glyph['advance'] for glyph in glyphs]])
+        for name in ('offset', 'size', 'texcoords'):
+            values = np.array([glyph[name] for glyph in glyphs], float)
+            setattr(self, '_' + name, np.concatenate(
+                [getattr(self, '_' + name), values]))
+        # Add the pairs with a new glyph. The kerning of a glyph after the
+        # others is stored with the glyph, and most of it is zero.
+        prev, cur, values = [], [], []
+        new_chars = self._chars[old:]
+        self._kerning_dicts.extend(glyph['kerning'] for glyph in glyphs)
+        for j, char in enumerate(new_chars, old):
+            kerning = self._kerning_dicts[j]
+            others = list(kerning)
+            value = np.fromiter(kerning.values(), float, len(others))
+            for k in np.flatnonzero(value):
+                if others[k] in self._index:
+                    prev.append(self._index[others[k]])
+                    cur.append(j)
+                    values.append(value[k])
+        # The kerning of the new glyphs before the others is stored with
+        # the others, whose kerning only grows when the font has any
+        sizes = np.fromiter(map(len, self._kerning_dicts), int, n)
+        grown = np.flatnonzero(sizes[:old] != self._kerning_sizes)
+        if len(grown):
+            dicts = (self._kerning_dicts[:old] if len(grown) == old else
+                     [self._kerning_dicts[i] for i in grown])
+            for j, char in enumerate(new_chars, old):
+                value = np.fromiter(map(methodcaller('get', char, 0.), dicts),
+                                    float, len(dicts))
+                nonzero = np.flatnonzero(value)
+                prev.extend([j] * len(nonzero))
+                cur.extend(grown[nonzero])
+                values.extend(value[nonzero])
+        self._kerning_sizes = sizes
+        if values:
+            keys = (np.array(prev, np.int64) * _KERNING_BASE +
+                    np.array(cur, np.int64))
+            order = np.argsort(keys)
+            index = np.searchsorted(self._kerning_keys, keys[order])
+            self._kerning_keys = np.insert(self._kerning_keys, index,
+                                           keys[order])
+            self._kerning = np.insert(self._kerning, index,
+                                      np.array(values)[order])
+
+    def kerning(self, prev, cur):
+        """The kerning of glyphs after others
+
+        Parameters
+        ----------
+        prev : ndarray
+            The indices of the previous glyphs in the metric arrays.
+        cur : ndarray
+            The indices of the glyphs following them.
+
+        Returns
+        -------
+        kerning : ndarray
+            The kerning of each glyph of *cur* after the glyph of *prev*.
+        """
+        keys = (np.asarray(prev, np.int64) * _KERNING_BASE +
+                np.asarray(cur, np.int64))
+        kerning = np.zeros(keys.shape)
+        if len(self._kerning_keys):
+            index = np.searchsorted(self._kerning_keys, keys)
+            index = np.minimum(index, len(self._kerning_keys) - 1)
+            found = self._kerning_keys[index] == keys
+            kerning[found] = self._kerning[index[found]]
+        return kerning
+
+    def glyph_indices(self, codes):
+        """The indices of the glyphs of characters in the metric arrays
+
+        The glyphs which are not loaded yet are loaded first.
+
+        Parameters
+        ----------
+        codes : ndarray
+            The code points of the characters.
+
+        Returns
+        -------
+        indices : ndarray
+            The indices of their glyphs.
+        """
+        codes, inverse = np.unique(codes, return_inverse=True)
+        chars = [unichr(code) for code in codes]
+        missing = [char for char in chars if char not in self._glyphs]
+        if missing:
+            self._load_chars(missing)
+        self._update_metrics()
+        indices = np.array([self._index[char] for char in chars], np.intp)
+        return indices[inverse]
+
+    @property
+    def line_metrics(self):
+        """The ascender, descender, line height and space width of the
+        font, at the stored size"""
+        if self._line_metrics is None:
+            # Chars with large ascender and descender, otherwise the
+            # vertical alignment can be very inconsistent
+            index = self.glyph_indices([ord(char) for char in 'hy '])
+            ratio, slop = 1. / self.ratio, self.slop
+            y0 = self._offset[index[:2], 1] * ratio + slop
+            y1 = y0 - self._size[index[:2], 1]
+            ascender = max(0., (y0 - slop).max())
+            descender = min(0., (y1 + slop).min())
+            height = max(0., (self._size[index[:2], 1] - 2 * slop).max())
+            spacewidth = self._advance[index[2]] * ratio
+            self._line_metrics = (ascender, descender, height * 1.5,
+                                  spacewidth)
+        return self._line_metrics
 
 
 class FontManager(object):
@@ -148,132 +308,128 @@ class FontManager(object):
 # The visual
 
 
+# The escape sequences, which are not drawn: tabs move the next characters
+# by 4 spaces, line feeds and vertical tabs by 1 and 4 lines, and bells,
+# backspaces, form feeds and carriage returns are ignored
+_esc_codes = np.array([7, 8, 9, 10, 11, 12, 13])
+_tab_spaces = 4
+_esc_lines = {10: 1, 11: 4}
+
+_text_vtype = np.dtype([('a_position', np.float32, 2),
+                        ('a_texcoord', np.float32, 2)])
+
+
 def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
-    """Convert text characters to VBO"""
-    # Necessary to flush commands before requesting current viewport because
-    # There may be a set_viewport command waiting in the queue.
-    # TODO: would be nicer if each canvas just remembers and manages its own
-    # viewport, rather than relying on the context for this.
-    canvas = context.get_current_canvas()
-    canvas.context.flush_commands()
-
-    text_vtype = np.dtype([('a_position', np.float32, 2),
-                           ('a_texcoord', np.float32, 2)])
-    vertices = np.zeros(len(text) * 4, dtype=text_vtype)
-    prev = None
-    width = height = ascender = descender = 0
-    ratio, slop = 1. / font.ratio, font.slop
-    x_off = -slop
-    # Need to make sure we have a unicode string here (Py2.7 mis-interprets
+    """Convert text characters to VBO
+
+    The characters of all the texts are laid out at once, with the four
+    vertices of the quad of each character, and the missing glyphs are
+    loaded before laying out, which is the only time the GL is used.
+
+    Parameters
+    ----------
+    text : str | list of str
+        The text, or the texts, whose quads are concatenated.
+    font : instance of TextureFont
+        The font.
+    anchor_x : str
+        The horizontal anchor of each line of the texts.
+    anchor_y : str
+        The vertical anchor of the texts.
+    lowres_size : float
+        The size of the glyphs stored in the font.
+
+    Returns
+    -------
+    vertices : ndarray
+        The vertices, 4 per character of the texts. Those of the escape
+        sequences are empty quads.
+    """
+    texts = [text] if isinstance(text, string_types) else list(text)
+    # Need to make sure we have unicode strings here (Py2.7 mis-interprets
     # characters like "•" otherwise)
-    if sys.version[0] == '2' and isinstance(text, str):
-        text = text.decode('utf-8')
-    # Need to store the original viewport, because the font[char] will
-    # trigger SDF rendering, which changes our viewport
-    # todo: get rid of call to glGetParameter!
-
-    # Also analyse chars with large ascender and descender, otherwise the
-    # vertical alignment can be very inconsistent
-    for char in 'hy':
-        glyph = font[char]
-        y0 = glyph['offset'][1] * ratio + slop
-        y1 = y0 - glyph['size'][1]
-        ascender = max(ascender, y0 - slop)
-        descender = min(descender, y1 + slop)
-        height = max(height, glyph['size'][1] - 2*slop)
-
-    # Get/set the fonts whitespace length and line height (size of this ok?)
-    glyph = font[' ']
-    spacewidth = glyph['advance'] * ratio
-    lineheight = height * 1.5
-
-    # Added escape sequences characters: {unicode:offset,...}
-    #   ord('\a') = 7
-    #   ord('\b') = 8
-    #   ord('\f') = 12
-    #   ord('\n') = 10  => linebreak
-    #   ord('\r') = 13
-    #   ord('\t') = 9   => tab, set equal 4 whitespaces?
-    #   ord('\v') = 11  => vertical tab, set equal 4 linebreaks?
-    # If text coordinate offset > 0 -> it applies to x-direction
-    # If text coordinate offset < 0 -> it applies to y-direction
-    esc_seq = {7: 0, 8: 0, 9: -4, 10: 1, 11: 4, 12: 0, 13: 0}
-
-    # Keep track of y_offset to set lines at right position
-    y_offset = 0
-
-    # When a line break occur, record the vertices index value
-    vi_marker = 0
-    ii_offset = 0  # Offset since certain characters won't be drawn
-
-    # The running tracker of characters vertex index
-    vi = 0
-
-    orig_viewport = canvas.context.get_viewport()
-    for ii, char in enumerate(text):
-        if ord(char) in esc_seq:
-            if esc_seq[ord(char)] < 0:
-                # Add offset in x-direction
-                x_off += abs(esc_seq[ord(char)]) * spacewidth
-                width += abs(esc_seq[ord(char)]) * spacewidth
-            elif esc_seq[ord(char)] > 0:
-                # Add offset in y-direction and reset things in x-direction
-                dx = dy = 0
-                if anchor_x == 'right':
-                    dx = -width
-                elif anchor_x == 'center':
-                    dx = -width / 2.
-                vertices['a_position'][vi_marker:vi+4] += (dx, dy)
-                vi_marker = vi+4
-                ii_offset -= 1
-                # Reset variables that affects x-direction positioning
-                x_off = -slop
-                width = 0
-                # Add offset in y-direction
-                y_offset += esc_seq[ord(char)] * lineheight
-        else:
-            # For ordinary characters, normal procedure
-            glyph = font[char]
-            kerning = glyph['kerning'].get(prev, 0.) * ratio
-            x0 = x_off + glyph['offset'][0] * ratio + kerning
-            y0 = glyph['offset'][1] * ratio + slop - y_offset
-            x1 = x0 + glyph['size'][0]
-            y1 = y0 - glyph['size'][1]
-            u0, v0, u1, v1 = glyph['texcoords']
-            position = [[x0, y0], [x0, y1], [x1, y1], [x1, y0]]
-            texcoords = [[u0, v0], [u0, v1], [u1, v1], [u1, v0]]
-            vi = (ii + ii_offset) * 4
-            vertices['a_position'][vi:vi+4] = position
-            vertices['a_texcoord'][vi:vi+4] = texcoords
-            x_move = glyph['advance'] * ratio + kerning
-            x_off += x_move
-            ascender = max(ascender, y0 - slop)
-            descender = min(descender, y1 + slop)
-            width += x_move
-            height = max(height, glyph['size'][1] - 2*slop)
-            prev = char
-
-    if orig_viewport is not None:
-        canvas.context.set_viewport(*orig_viewport)
-
-    dx = dy = 0
+    if sys.version[0] == '2':
+        texts = [t.decode('utf-8') if isinstance(t, str) else t
+                 for t in texts]
+    lengths = np.array([len(t) for t in texts], np.intp)
+    codes = np.frombuffer(u''.join(texts).encode('utf-32-le'), np.uint32)
+    n = len(codes)
+    vertices = np.zeros(n * 4, dtype=_text_vtype)
+    if n == 0:
+        return vertices
+    ratio, slop = 1. / font.ratio, font.slop
+    ascender, descender, lineheight, spacewidth = font.line_metrics
+    drawn = np.nonzero(~np.in1d(codes, _esc_codes))[0]
+    glyphs = font.glyph_indices(codes[drawn])
+
+    # The lines, numbered across the texts, start with the texts and after
+    # the line breaks
+    text_starts = (np.cumsum(lengths) - lengths)[lengths > 0]
+    text_index = np.repeat(np.arange(len(texts)), lengths)
+    line_feeds = np.zeros(n)
+    for code, lines in _esc_lines.items():
+        line_feeds[codes == code] = lines
+    new_line = np.zeros(n, bool)
+    new_line[1:] = line_feeds[:-1] > 0
+    new_line[text_starts] = True
+    line = np.cumsum(new_line) - 1
+    line_starts = np.nonzero(new_line)[0]
+    # the number of lines before the characters in their text
+    y_lines = np.cumsum(line_feeds) - line_feeds
+    y_lines -= np.repeat(y_lines[text_starts], lengths[lengths > 0])
+
+    # The kerning with the previous character of the same line, and the
+    # advance of the pen after each character
+    kerning = np.zeros(n)
+    same = line[drawn[1:]] == line[drawn[:-1]]
+    kerning[drawn[1:][same]] = font.kerning(glyphs[:-1][same],
+                                            glyphs[1:][same]) * ratio
+    moves = kerning.copy()
+    moves[drawn] += font._advance[glyphs] * ratio
+    moves[codes == 9] = _tab_spaces * spacewidth
+    pen = np.cumsum(moves) - moves
+    pen -= np.repeat(pen[line_starts], np.diff(np.append(line_starts, n)))
+    width = np.add.reduceat(moves, line_starts)
+
+    x0 = pen[drawn] - slop + font._offset[glyphs, 0] * ratio + kerning[drawn]
+    y0 = (font._offset[glyphs, 1] * ratio + slop -
+          y_lines[drawn] * lineheight)
+    x1 = x0 + font._size[glyphs, 0]
+    y1 = y0 - font._size[glyphs, 1]
+
+    # Align each line horizontally, and each text vertically
+    if anchor_x == 'right':
+        x_shift = -width
+    elif anchor_x == 'center':
+        x_shift = -width / 2.
+    else:
+        x_shift = np.zeros(len(width))
+    ascenders = np.full(len(texts), ascender)
+    descenders = np.full(len(texts), descender)
+    np.maximum.at(ascenders, text_index[drawn], y0 - slop)
+    np.minimum.at(descenders, text_index[drawn], y1 + slop)
     if anchor_y == 'top':
-        dy = -descender
+        y_shift = -descenders
     elif anchor_y in ('center', 'middle'):
-        dy = (-descender - ascender) / 2
+        y_shift = (-descenders - ascenders) / 2
     elif anchor_y == 'bottom':
-        dy = -ascender
-    if anchor_x == 'right':
-        dx = -width
-    elif anchor_x == 'center':
-        dx = -width / 2.
-
-    # If any linebreaks occured in text, we only want to translate characters
-    # in the last line in text (those after the vi_marker)
-    vertices['a_position'][0:vi_marker] += (0, dy)
-    vertices['a_position'][vi_marker:] += (dx, dy)
-    vertices['a_position'] /= lowres_size
-
+        y_shift = -ascenders
+    else:
+        y_shift = np.zeros(len(texts))
+    x_shift = x_shift[line[drawn]]
+    y_shift = y_shift[text_index[drawn]]
+
+    position = np.empty((len(drawn), 4, 2))
+    position[:, :, 0] = np.column_stack([x0, x0, x1, x1]) + \
+        x_shift[:, np.newaxis]
+    position[:, :, 1] = np.column_stack([y0, y1, y1, y0]) + \
+        y_shift[:, np.newaxis]
+    u0, v0, u1, v1 = font._texcoords[glyphs].T
+    texcoords = np.stack([np.column_stack([u0, u0, u1, u1]),
+                          np.column_stack([v0, v1, v1, v0])], axis=-1)
+    quads = vertices.reshape(n, 4)
+    quads['a_position'][drawn] = position / lowres_size
+    quads['a_texcoord'][drawn] = texcoords
     return vertices
 
 
@@ -523,9 +679,9 @@ class TextVisual(Visual):
             n_char = sum(len(t) for t in text)
             # we delay creating vertices because it requires a context,
             # which may or may not exist when the object is initialized
-            self._vertices = np.concatenate([
-                _text_to_vbo(t, self._font, self._anchors[0], self._anchors[1],
-                             self._font._lowres_size) for t in text])
+            self._vertices = _text_to_vbo(text, self._font, self._anchors[0],
+                                          self._anchors[1],
+                                          self._font._lowres_size)
             self._vertices = VertexBuffer(self._vertices)
             idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
                    np.arange(0, 4*n_char, 4, dtype=np.uint32)[:, np.newaxis])
@@ -0,0 +1,584 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+A multi-resolution, tiled image visual for images that are too large for a
+single texture (or for GPU memory).
+
+The image is represented by a pyramid of levels, level 0 being the full
+resolution. Only the tiles of the level of detail matching the current zoom
+that intersect the view are read from the data, in background threads, and
+uploaded into a fixed-size texture atlas that acts as a LRU cache. Tiles of
+coarser levels are drawn in place of the tiles that are still loading, so
+drawing never waits for the data.
+"""
+
+from __future__ import division
+
+import sys
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ..gloo import Texture2D, VertexBuffer
+from ..color import get_colormap
+from ..ext.six import string_types, reraise
+from ..ext.six.moves import queue
+from .shaders import Function
+from .visual import Visual
+from .image import (_apply_clim, _apply_gamma, _build_color_transform,
+                    _texture_formats)
+
+VERT_SHADER = """
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+varying vec2 v_texcoord;
+
+void main() {
+    v_texcoord = a_texcoord;
+    gl_Position = $transform(vec4(a_position, 0., 1.));
+}
+"""
+
+FRAG_SHADER = """
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+
+void main()
+{
+    gl_FragColor = $color_transform(texture2D(u_texture, v_texcoord));
+}
+"""
+
+
+class _TileLoader(object):
+    """Read tiles in background threads
+
+    The queue of requests is replaced on every call to `request`, so tiles
+    that are no longer visible are not read. Threads are started on demand
+    and exit when there is nothing left to read.
+    """
+
+    def __init__(self, n_workers):
+        self._n_workers = n_workers
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._requests = []
+        self._in_flight = set()
+        self._n_running = 0
+        self._results = queue.Queue()
+
+    @property
+    def busy(self):
+        """Whether tiles are being read or are waiting to be collected"""
+        return (self._n_running > 0 or len(self._requests) > 0 or
+                not self._results.empty())
+
+    def request(self, jobs):
+        """Replace the queued requests by *jobs*, a list of (key, func)"""
+        with self._lock:
+            self._requests = [job for job in jobs
+                              if job[0] not in self._in_flight]
+            n_start = min(len(self._requests),
+                          self._n_workers - self._n_running)
+            for i in range(n_start):
+                self._n_running += 1
+                thread = threading.Thread(target=self._run,
+                                          name='TileLoader')
+                thread.daemon = True
+                thread.start()
+
+    def results(self):
+        """Return the list of (key, tile, exc_info) read so far"""
+        out = []
+        while True:
+            try:
+                out.append(self._results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def wait(self, timeout=None):
+        """Wait for all queued requests to be read"""
+        with self._lock:
+            while self._n_running > 0:
+                self._idle.wait(timeout)
+                if timeout is not None:
+                    break
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._requests:
+                    self._n_running -= 1
+                    if self._n_running == 0:
+                        self._idle.notify_all()
+                    return
+                key, func = self._requests.pop(0)
+                self._in_flight.add(key)
+            try:
+                self._results.put((key, func(), None))
+            except Exception:
+                self._results.put((key, None, sys.exc_info()))
+            with self._lock:
+                self._in_flight.discard(key)
+
+
+def _read_tile(data, step, region, shape, dtype):
+    """Read the region (y0, y1, x0, x1) of a pyramid level with a border of
+    one pixel, the edge pixels being repeated outside of the level *shape*
+    """
+    y0, y1, x0, x1 = region
+    by0, by1 = max(y0 - 1, 0), min(y1 + 1, shape[0])
+    bx0, bx1 = max(x0 - 1, 0), min(x1 + 1, shape[1])
+    tile = np.asarray(data[by0 * step:by1 * step:step,
+                           bx0 * step:bx1 * step:step], dtype=dtype)
+    pad = [(by0 - y0 + 1, y1 + 1 - by1), (bx0 - x0 + 1, x1 + 1 - bx1)]
+    pad += [(0, 0)] * (tile.ndim - 2)
+    return np.ascontiguousarray(np.pad(tile, pad, mode='edge'))
+
+
+class TiledImageVisual(Visual):
+    """Visual displaying a large image as a multi-resolution tile pyramid
+
+    Only the tiles visible in the view, at the resolution needed for the
+    current zoom level, are read from the data and kept on the GPU. This
+    makes it possible to display images larger than the maximum texture
+    size, or than the available memory when the data is a `np.memmap` or
+    another lazily sliceable array (e.g. an HDF5 or zarr dataset).
+
+    Parameters
+    ----------
+    data : array-like | list of array-like
+        The image data of shape (M, N), (M, N, 3) or (M, N, 4), which can
+        be any object supporting numpy-style slicing. If a single array is
+        given, the coarser levels of the pyramid are obtained by
+        subsampling it by powers of two. Alternatively, a list of arrays
+        with decreasing resolution can be given, the first one being the
+        full resolution image; each level should be about half the size of
+        the previous one.
+    tile_size : int
+        The size of the (square) tiles, in pixels. Default 256.
+    cache_size : tuple
+        The number of (rows, columns) of tiles held in the texture cache.
+        Default (8, 8). The level of detail is lowered if the visible tiles
+        do not fit in the cache.
+    cmap : str | ColorMap
+        Colormap to use for luminance images.
+    clim : str | tuple
+        Limits to use for the colormap. Can be 'auto' to auto-set bounds to
+        the min and max of the coarsest level of the pyramid.
+    gamma : float
+        Gamma to use during colormap lookup. Default 1.
+    interpolation : str
+        The texture interpolation, 'nearest' (default) or 'linear'.
+    n_workers : int
+        The number of threads reading tiles. Default 2.
+    async_load : bool
+        If True (default), tiles are read in background threads and drawn
+        once available. If False, the visible tiles are read before
+        drawing, e.g. for rendering a complete image offscreen.
+    **kwargs : dict
+        Keyword arguments to pass to `Visual`.
+
+    Notes
+    -----
+    Single-channel data with dtype uint8, uint16 or float32 are uploaded
+    as-is, other dtypes are converted to float32 tile per tile.
+    """
+
+    def __init__(self, data=None, tile_size=256, cache_size=(8, 8),
+                 cmap='viridis', clim='auto', gamma=1.,
+                 interpolation='nearest', n_workers=2, async_load=True,
+                 **kwargs):
+        self._tile_size = int(tile_size)
+        if self._tile_size < 1:
+            raise ValueError('tile_size must be positive')
+        self._cache_size = (int(cache_size[0]), int(cache_size[1]))
+        if min(self._cache_size) < 1:
+            raise ValueError('cache_size must be positive')
+        self._interpolation = interpolation
+        self._async_load = bool(async_load)
+        self._loader = _TileLoader(int(n_workers))
+        self._levels = []
+        self._dtype = None
+        self._texture = None
+        self._tiles = OrderedDict()  # (level, row, col) -> cache slot
+        self._free_slots = []
+        # incremented by set_data, to drop the tiles of the previous data
+        # that are still being read
+        self._generation = 0
+        self._drawn = None
+        self._level = None
+        self._texture_scale = 1.
+        self._clim_fun = Function(_apply_clim)
+        self._gamma_fun = Function(_apply_gamma)
+        self._need_colortransform_update = True
+        self._need_clim_update = True
+        self._position = VertexBuffer(np.zeros((0, 2), np.float32))
+        self._texcoord = VertexBuffer(np.zeros((0, 2), np.float32))
+
+        super(TiledImageVisual, self).__init__(vcode=VERT_SHADER,
+                                               fcode=FRAG_SHADER, **kwargs)
+        self.set_gl_state('translucent', cull_face=False)
+        self._draw_mode = 'triangles'
+        self.shared_program['a_position'] = self._position
+        self.shared_program['a_texcoord'] = self._texcoord
+
+        self.clim = clim
+        self.gamma = gamma
+        self.cmap = cmap
+        if data is not None:
+            self.set_data(data)
+        self.freeze()
+
+    def set_data(self, data):
+        """Set the data
+
+        Parameters
+        ----------
+        data : array-like | list of array-like
+            The full resolution image, or the list of levels of an image
+            pyramid, full resolution first.
+        """
+        if isinstance(data, (list, tuple)):
+            levels = [(level, 1) for level in data]
+        else:
+            shape = data.shape
+            n = max(int(math.ceil(math.log(max(shape[:2]) / self._tile_size,
+                                           2))), 0) + 1
+            levels = [(data, 2 ** i) for i in range(n)]
+        if len(levels) == 0:
+            raise ValueError('data must contain at least one level')
+        shape = levels[0][0].shape
+        if len(shape) not in (2, 3) or (len(shape) == 3 and
+                                        shape[2] not in (1, 3, 4)):
+            raise ValueError('data must have shape (M, N), (M, N, 3) or '
+                             '(M, N, 4), not %s' % (shape,))
+        dtype = np.dtype(levels[0][0].dtype)
+        if len(shape) == 2 or shape[2] == 1:
+            if dtype not in _texture_formats:
+                dtype = np.dtype(np.float32)
+            internalformat, scale = _texture_formats[dtype]
+        else:
+            if dtype != np.uint8:
+                dtype = np.dtype(np.float32)
+            internalformat, scale = None, 1.
+
+        self._levels = []
+        for level, step in levels:
+            lshape = tuple(-(-s // step) for s in level.shape[:2])
+            self._levels.append((level, step, lshape))
+        self._dtype = dtype
+        self._texture_scale = scale
+        self._need_clim_update = True
+        self._need_colortransform_update = True
+
+        # (Re)create the texture cache, whose slots have a border of one
+        # pixel for the linear interpolation across the tiles
+        ts = self._tile_size + 2
+        rows, cols = self._cache_size
+        nchan = 1 if len(shape) == 2 else shape[2]
+        self._texture = Texture2D(
+            (rows * ts, cols * ts, nchan), internalformat=internalformat,
+            interpolation=self._interpolation)
+        self.shared_program['u_texture'] = self._texture
+        self._tiles.clear()
+        self._free_slots = list(range(rows * cols))[::-1]
+        self._drawn = None
+        self._level = None
+        self._generation += 1
+        self._loader.request([])
+        self._loader.results()
+        self._bounds_changed()
+        self.update()
+
+    @property
+    def size(self):
+        """The (width, height) of the full resolution image"""
+        return self._levels[0][2][::-1]
+
+    @property
+    def n_levels(self):
+        """The number of levels of the image pyramid"""
+        return len(self._levels)
+
+    @property
+    def level(self):
+        """The level of detail used for the last draw (0 is full
+        resolution)
+        """
+        return self._level
+
+    @property
+    def tile_size(self):
+        """The size of the tiles in pixels"""
+        return self._tile_size
+
+    @property
+    def clim(self):
+        return (self._clim if isinstance(self._clim, string_types) else
+                tuple(self._clim))
+
+    @clim.setter
+    def clim(self, clim):
+        if isinstance(clim, string_types):
+            if clim != 'auto':
+                raise ValueError('clim must be "auto" if a string')
+        else:
+            clim = np.array(clim, float)
+            if clim.shape != (2,):
+                raise ValueError('clim must have two elements')
+        self._clim = clim
+        self._need_clim_update = True
+        self.update()
+
+    @property
+    def gamma(self):
+        """The gamma applied after normalizing the data by clim"""
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, gamma):
+        gamma = float(gamma)
+        if gamma <= 0:
+            raise ValueError('gamma must be > 0')
+        self._gamma = gamma
+        self._gamma_fun['gamma'] = gamma
+        self.update()
+
+    @property
+    def cmap(self):
+        return self._cmap
+
+    @cmap.setter
+    def cmap(self, cmap):
+        self._cmap = get_colormap(cmap)
+        self._need_colortransform_update = True
+        self.update()
+
+    def wait(self, timeout=None):
+        """Wait for the tiles being read in the background
+
+        The tiles are uploaded and drawn on the next draw.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Maximum time to wait, in seconds.
+        """
+        self._loader.wait(timeout)
+
+    # ------------------------------------------------------------- tiles ---
+    def _tile_region(self, key):
+        """The region (y0, y1, x0, x1) of a tile in its level"""
+        level, row, col = key
+        shape = self._levels[level][2]
+        ts = self._tile_size
+        return (row * ts, min((row + 1) * ts, shape[0]),
+                col * ts, min((col + 1) * ts, shape[1]))
+
+    def _visible_region(self, view):
+        """The (x0, y0, x1, y1) bounds of the visible part of the image and
+        the number of image pixels per framebuffer pixel
+        """
+        w, h = self.size
+        tr = view.transforms.get_transform('visual', 'render')
+        corners = np.array([[-1, -1, 0, 1], [1, -1, 0, 1],
+                            [1, 1, 0, 1], [-1, 1, 0, 1]], float)
+        try:
+            corners = tr.imap(corners)
+            corners = corners[:, :2] / corners[:, 3:4]
+        except Exception:  # non-invertible transform
+            corners = np.array([[np.nan, np.nan]])
+        if np.all(np.isfinite(corners)):
+            x0, y0 = np.clip(corners.min(axis=0), 0, (w, h))
+            x1, y1 = np.clip(corners.max(axis=0), 0, (w, h))
+        else:
+            x0, y0, x1, y1 = 0, 0, w, h
+        # Footprint of an image pixel in the framebuffer, at the center
+        tr = view.transforms.get_transform('visual', 'framebuffer')
+        cx, cy = (x0 + x1) / 2., (y0 + y1) / 2.
+        pts = tr.map([[cx, cy], [cx + 1, cy], [cx, cy + 1]])
+        pts = pts[:, :2] / pts[:, 3:4]
+        footprint = max(np.hypot(*(pts[1] - pts[0])),
+                        np.hypot(*(pts[2] - pts[0])))
+        if not np.isfinite(footprint) or footprint <= 0:
+            footprint = 1.
+        return (x0, y0, x1, y1), 1. / footprint
+
+    def _level_tiles(self, level, region):
+        """The keys of the tiles of *level* covering *region*"""
+        x0, y0, x1, y1 = region
+        w, h = self.size
+        lshape = self._levels[level][2]
+        sy, sx = lshape[0] / h, lshape[1] / w
+        ts = self._tile_size
+        r0, r1 = int(y0 * sy // ts), int(math.ceil(y1 * sy / ts))
+        c0, c1 = int(x0 * sx // ts), int(math.ceil(x1 * sx / ts))
+        r1 = min(max(r1, r0 + 1), -(-lshape[0] // ts))
+        c1 = min(max(c1, c0 + 1), -(-lshape[1] // ts))
+        # Closest to the center of the view first
+        rc, cc = (r0 + r1 - 1) / 2., (c0 + c1 - 1) / 2.
+        keys = [(level, r, c) for r in range(r0, r1) for c in range(c0, c1)]
+        keys.sort(key=lambda k: (k[1] - rc) ** 2 + (k[2] - cc) ** 2)
+        return keys
+
+    def _parent_tile(self, key, level):
+        """The key of the tile of a coarser *level* covering *key*"""
+        y0, y1, x0, x1 = self._tile_region(key)
+        shape = self._levels[key[0]][2]
+        pshape = self._levels[level][2]
+        cy = (y0 + y1) / 2. * pshape[0] / shape[0]
+        cx = (x0 + x1) / 2. * pshape[1] / shape[1]
+        return level, int(cy // self._tile_size), int(cx // self._tile_size)
+
+    def _load_func(self, key):
+        data, step, shape = self._levels[key[0]]
+        region = self._tile_region(key)
+        dtype = self._dtype
+        return ((self._generation, key),
+                lambda: _read_tile(data, step, region, shape, dtype))
+
+    def _store_tile(self, key, tile, pinned):
+        """Upload a tile into a free (or the least recently used) slot"""
+        if key in self._tiles:
+            return
+        if not self._free_slots:
+            for old in self._tiles:
+                if old not in pinned:
+                    self._free_slots.append(self._tiles.pop(old))
+                    break
+            else:
+                return  # all slots are in use by visible tiles
+        slot = self._free_slots.pop()
+        cols = self._cache_size[1]
+        ts = self._tile_size + 2
+        offset = ((slot // cols) * ts, (slot % cols) * ts)
+        self._texture.set_data(tile, offset=offset)
+        self._tiles[key] = slot
+
+    def _update_tiles(self, view):
+        """Collect loaded tiles, request missing ones and return the keys
+        of the tiles to draw
+        """
+        region, scale = self._visible_region(view)
+        capacity = self._cache_size[0] * self._cache_size[1]
+        top = len(self._levels) - 1
+        level = min(max(int(math.floor(math.log(max(scale, 1e-12), 2))),
+                        0), top)
+        wanted = self._level_tiles(level, region)
+        coarse = self._level_tiles(top, region)
+        while level < top and len(wanted) + len(coarse) > capacity:
+            level += 1
+            wanted = self._level_tiles(level, region)
+        if level == top:
+            coarse = []
+        self._level = level
+        pinned = set(wanted + coarse)
+
+        # Upload the tiles read since the last draw
+        for (generation, key), tile, error in self._loader.results():
+            if generation != self._generation:
+                continue  # read from the previous data
+            if error is not None:
+                reraise(*error)
+            self._store_tile(key, tile, pinned)
+
+        missing = [key for key in coarse + wanted if key not in self._tiles]
+        if not self._async_load:
+            for key in missing:
+                self._store_tile(key, self._load_func(key)[1](), pinned)
+            missing = []
+        self._loader.request([self._load_func(key) for key in missing])
+
+        # Draw the cached wanted tiles, and coarser tiles in place of the
+        # missing ones
+        draw = set()
+        for key in wanted:
+            if key not in self._tiles:
+                for parent_level in range(level + 1, top + 1):
+                    parent = self._parent_tile(key, parent_level)
+                    if parent in self._tiles:
+                        key = parent
+                        break
+            if key in self._tiles:
+                draw.add(key)
+        for key in draw:  # mark as recently used
+            self._tiles[key] = self._tiles.pop(key)
+        # Coarse tiles first, so that finer ones are drawn over them
+        return sorted(draw, key=lambda k: -k[0])
+
+    def _build_vertex_data(self, keys):
+        w, h = self.size
+        ts = self._tile_size + 2
+        rows, cols = self._cache_size
+        quad = np.array([[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]],
+                        np.float32)
+        position = np.empty((len(keys), 6, 2), np.float32)
+        texcoord = np.empty((len(keys), 6, 2), np.float32)
+        for i, key in enumerate(keys):
+            y0, y1, x0, x1 = self._tile_region(key)
+            lshape = self._levels[key[0]][2]
+            sy, sx = h / lshape[0], w / lshape[1]
+            position[i] = ([x0 * sx, y0 * sy] +
+                           quad * [(x1 - x0) * sx, (y1 - y0) * sy])
+            slot = self._tiles[key]
+            # inside the border of the slot
+            u0, v0 = (slot % cols) * ts + 1, (slot // cols) * ts + 1
+            texcoord[i] = ([u0, v0] + quad * [x1 - x0, y1 - y0])
+        texcoord /= [cols * ts, rows * ts]
+        self._position.set_data(position.reshape(-1, 2))
+        self._texcoord.set_data(texcoord.reshape(-1, 2))
+
+    def _build_clim(self):
+        clim = self._clim
+        if isinstance(clim, string_types):
+            data, step, _ = self._levels[-1]
+            if len(data.shape) == 3 and data.shape[2] != 1:
+                return
+            coarse = np.asarray(data[::step, ::step])
+            clim = np.min(coarse), np.max(coarse)
+            self._clim = clim = np.array(clim, float)
+        clim = clim / self._texture_scale
+        self._clim_fun['cmin'] = float(clim[0])
+        self._clim_fun['cmax'] = float(clim[1])
+        self._need_clim_update = False
+
+    # --------------------------------------------------------- drawing ---
+    def _compute_bounds(self, axis, view):
+        if axis > 1 or not self._levels:
+            return (0, 0)
+        return (0, self.size[axis])
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        if not self._levels:
+            return False
+
+        if self._need_colortransform_update:
+            shape = self._levels[0][0].shape
+            self.shared_program.frag['color_transform'] = \
+                _build_color_transform(np.empty((0,) * 2 + shape[2:]),
+                                       self._clim_fun, self._gamma_fun,
+                                       self.cmap)
+            view.view_program['texture2D_LUT'] = self.cmap.texture_lut() \
+                if (hasattr(self.cmap, 'texture_lut')) else None
+            self._need_colortransform_update = False
+
+        if self._need_clim_update:
+            self._build_clim()
+
+        keys = self._update_tiles(view)
+        if self._loader.busy:
+            # Draw again when more tiles are available
+            self.update()
+        if keys != self._drawn:
+            self._drawn = keys
+            self._build_vertex_data(keys)
+        if not keys:
+            return False
@@ -33,6 +33,9 @@ coordinates).
 
 """
 
+from timeit import default_timer
+import weakref
+
 from ..gloo import Texture3D, TextureEmulated3D, VertexBuffer, IndexBuffer
 from . import Visual
 from .shaders import Function
@@ -82,6 +85,7 @@ uniform $sampler_type u_volumetex;
 uniform vec3 u_shape;
 uniform float u_threshold;
 uniform float u_relative_step_size;
+uniform float u_empty_level;
 
 //varyings
 // varying vec3 v_texcoord;
@@ -228,9 +232,22 @@ void main() {{
     // datasets. Ugly, but it works ...
     vec3 loc = start_loc;
     int iter = 0;
+    int next_check = 0;
     while (iter < nsteps) {{
         for (iter=iter; iter<nsteps; iter++)
         {{
+            // Skip the cells of the acceleration grid in which no sample
+            // can change the result
+            if (iter >= next_check) {{
+                int n_skip = $skip_empty(loc, step, {skip_level});
+                if (n_skip > 0) {{
+                    iter += n_skip - 1;
+                    loc += step * float(n_skip);
+                    continue;
+                }}
+                next_check = iter - n_skip;
+            }}
+
             // Get sample color
             vec4 color = $sample(u_volumetex, loc);
             float val = color.g;
@@ -265,6 +282,7 @@ MIP_SNIPPETS = dict(
         float maxval = -99999.0; // The maximum encountered value
         int maxi = 0;  // Where the maximum value was encountered
         """,
+    skip_level="maxval",
     in_loop="""
         if( val > maxval ) {
             maxval = val;
@@ -288,6 +306,7 @@ TRANSLUCENT_SNIPPETS = dict(
     before_loop="""
         vec4 integrated_color = vec4(0., 0., 0., 0.);
         """,
+    skip_level="u_empty_level",
     in_loop="""
             color = $cmap(val);
             float a1 = integrated_color.a;
@@ -320,6 +339,8 @@ ADDITIVE_SNIPPETS = dict(
     before_loop="""
         vec4 integrated_color = vec4(0., 0., 0., 0.);
         """,
+    # Black samples only change the alpha, until it saturates
+    skip_level="integrated_color.a > 0.999 ? u_empty_level : -1.0e9",
     in_loop="""
         color = $cmap(val);
         
@@ -338,6 +359,7 @@ ISO_SNIPPETS = dict(
         vec3 dstep = 1.5 / u_shape;  // step to sample derivative
         gl_FragColor = vec4(0.0);
     """,
+    skip_level="u_threshold - 0.2",
     in_loop="""
         if (val > u_threshold-0.2) {
             // Take the last interval in smaller steps
@@ -367,6 +389,141 @@ frag_dict = {
     'additive': ADDITIVE_FRAG_SHADER,
 }
 
+# Sample the texture, which holds the data in their native dtype, and
+# normalize the values by clim. Single-channel data can be in a 'luminance'
+# or 'r*' texture, so the value is taken from the red channel.
+_SAMPLE_MONO = """
+vec4 sample_normalized(%s tex, vec3 loc) {
+    float val = $texture_sample(tex, loc).r;
+    if ($cmax != $cmin) {
+        val = (val - $cmin) / ($cmax - $cmin);
+    } else if ($cmin != 0.0) {
+        val /= $cmin;
+    }
+    return vec4(val, val, val, 1.0);
+}
+"""
+
+_SAMPLE_MULTI = """
+vec4 sample_normalized(%s tex, vec3 loc) {
+    vec4 color = $texture_sample(tex, loc);
+    if ($cmax != $cmin) {
+        return (color - $cmin) / ($cmax - $cmin);
+    } else if ($cmin != 0.0) {
+        return color / $cmin;
+    }
+    return color;
+}
+"""
+
+# Factor by which the texture values of each dtype are divided when
+# sampled (normalized integer formats), and internal format suffix
+_dtype_formats = {
+    np.dtype(np.uint8): (255., '8'),
+    np.dtype(np.uint16): (65535., '16'),
+    np.dtype(np.float32): (1., '32f'),
+}
+
+
+def _normalize(value, clim):
+    """Normalize *value* by the contrast limits as sample_normalized does
+    with the samples of the volume"""
+    cmin, cmax = map(float, clim)
+    if cmax != cmin:
+        return (value - cmin) / (cmax - cmin)
+    elif cmin != 0:
+        return value / cmin
+    return value
+
+
+def _subsample(vol, max_size=2 ** 21):
+    """Strided view of *vol* with at most about *max_size* voxels"""
+    size = np.prod(vol.shape[:3])
+    step = max(int(np.ceil((size / float(max_size)) ** (1. / 3))), 1)
+    return vol[::step, ::step, ::step]
+
+
+# Number of steps from *loc* to the first sample beyond the cell of the
+# acceleration grid that contains it. It is positive if the maximum
+# normalized value in the cell is at most *level*, so that the ray can skip
+# the cell, and negative otherwise, so that the cell is not checked again.
+_SKIP_EMPTY = """
+int skip_empty(vec3 loc, vec3 ray_step, float level) {
+    vec3 cell = clamp(floor(loc * $cells), vec3(0.0), $grid_shape - 1.0);
+    vec3 bound = (cell + step(0.0, ray_step)) / $cells;
+    vec3 t = abs(bound - loc) / max(abs(ray_step), vec3(1e-12));
+    int n = max(int(floor(min(t.x, min(t.y, t.z)))) + 1, 1);
+
+    float cell_max = texture3D($grid, (cell + 0.5) / $grid_shape).r;
+    if ($cmax != $cmin) {
+        cell_max = (cell_max - $cmin) / ($cmax - $cmin);
+    } else if ($cmin != 0.0) {
+        cell_max /= $cmin;
+    }
+    return cell_max <= level ? n : -n;
+}
+"""
+
+_NO_SKIP = """
+int no_skip(vec3 loc, vec3 ray_step, float level) {
+    return -1000000;
+}
+"""
+
+# Edge length, in voxels, of the cells of the acceleration grid
+_GRID_CELL = 8
+
+
+def _cell_max(vol, cell=_GRID_CELL):
+    """Maximum of *vol* over each cell of cell**3 voxels, extended by one
+    voxel on each side as the samples in a cell interpolate these voxels too
+    """
+    grid = vol
+    for axis in range(3):
+        starts = np.arange(0, vol.shape[axis], cell)
+        cells = np.maximum.reduceat(grid, starts, axis=axis)
+        if len(starts) > 1:
+            # The last voxel of the previous cell and the first one of the
+            # next cell
+            cells = np.swapaxes(cells, 0, axis)
+            before = np.swapaxes(grid.take(starts[1:] - 1, axis=axis),
+                                 0, axis)
+            after = np.swapaxes(grid.take(starts[1:], axis=axis), 0, axis)
+            np.maximum(cells[1:], before, out=cells[1:])
+            np.maximum(cells[:-1], after, out=cells[:-1])
+            cells = np.swapaxes(cells, 0, axis)
+        grid = cells
+    return grid
+
+
+def _empty_level(cmap, method):
+    """The largest normalized value up to which samples do not contribute
+    to a translucent or additive rendering with *cmap*
+    """
+    # Transparent samples do not change a translucent rendering, and black
+    # ones an additive rendering
+    channels = [3] if method == 'translucent' else [0, 1, 2]
+    t = np.linspace(0., 1., 1025)
+    try:
+        colors = np.asarray(cmap.map(t[:, np.newaxis]), float)
+    except NotImplementedError:
+        return -1e9
+    visible = np.any(colors.reshape(len(t), 4)[:, channels] > 0, axis=1)
+    if visible[0]:
+        return -1e9
+    elif not visible.any():
+        return 1e9
+    return t[np.argmax(visible) - 1]
+
+
+def _update_callback(ref):
+    """Timer callback updating the visual referenced by *ref*, if alive"""
+    def callback(event):
+        visual = ref()
+        if visual is not None:
+            visual.update()
+    return callback
+
 
 class VolumeVisual(Visual):
     """ Displays a 3D Volume
@@ -382,9 +539,10 @@ class VolumeVisual(Visual):
     method : {'mip', 'translucent', 'additive', 'iso'}
         The render method to use. See corresponding docs for details.
         Default 'mip'.
-    threshold : float
-        The threshold to use for the isosurface render method. By default
-        the mean of the given volume is used.
+    threshold : float | None
+        The threshold to use for the isosurface render method, in units of
+        the contrast limits (0 at clim[0] and 1 at clim[1]). By default
+        (None) the mean of the given volume is used.
     relative_step_size : float
         The relative step size to step through the volume. Default 0.8.
         Increase to e.g. 1.5 to increase performance, at the cost of
@@ -394,19 +552,69 @@ class VolumeVisual(Visual):
     emulate_texture : bool
         Use 2D textures to emulate a 3D texture. OpenGL ES 2.0 compatible,
         but has lower performance on desktop platforms.
+    texture_format : str | None
+        Internal format of the texture. By default (None), uint8 and
+        uint16 volumes are stored as-is as normalized integers, and other
+        volumes as float32. A suffix such as '16f' can be given to store
+        float volumes as half floats (e.g. 'r16f' for single-channel
+        volumes), halving GPU memory at the cost of precision.
+    empty_space_skipping : bool
+        Whether to skip the regions of the volume that cannot contribute
+        to the rendering while raycasting. Default True. Not available
+        with `emulate_texture` and for multi-channel volumes.
+    interactive_step_size : float | None
+        The relative step size to use while the view changes, e.g. during
+        camera drags. See the `interactive_step_size` property. Default
+        None, which always uses `relative_step_size`.
+
+    Notes
+    -----
+    The volume is uploaded in its native dtype when it is uint8, uint16
+    or float32, and the contrast limits are applied in the shader, so
+    changing them does not upload the volume again.
+
+    For empty space skipping, the maximum of every block of 8x8x8 voxels
+    is computed when the data is set and uploaded as a low resolution 3D
+    texture. Rays advance over the blocks whose maximum shows they hold no
+    contribution, e.g. blocks below the lower contrast limit, where the
+    colormap is transparent (translucent) or black (additive), and blocks
+    below the current maximum (mip) or the threshold (iso). The rendering
+    is unchanged, and sparse volumes are rendered much faster, while
+    dense volumes can be rendered slightly slower (see
+    ``examples/benchmark/volume_empty_space.py``).
     """
 
     def __init__(self, vol, clim=None, method='mip', threshold=None, 
                  relative_step_size=0.8, cmap='grays',
-                 emulate_texture=False):
+                 emulate_texture=False, texture_format=None,
+                 empty_space_skipping=True, interactive_step_size=None):
         
         tex_cls = TextureEmulated3D if emulate_texture else Texture3D
 
         # Storage of information of volume
         self._vol_shape = ()
         self._clim = None
+        self._clim_source = None
+        # None for the mean of the volume, normalized by clim
+        self._threshold = None
+        self._threshold_mean = None
+        self._texture_format = texture_format
+        self._texture_scale = 1.
+        self._sample_fun = None
+        self._n_channels = None
+        self._method = None
+        self._skip_empty = bool(empty_space_skipping) and not emulate_texture
+        self._no_skip_fun = Function(_NO_SKIP)
+        self._grid_fun = Function(_SKIP_EMPTY)
+        self._skip_fun = self._no_skip_fun
+        self._need_clim_update = True
         self._need_vertex_update = True
 
+        # State of the interactive quality, for each view of the visual
+        self._interactive_step_size = None
+        self._step_size = None  # the step size of the last draw
+        self._view_states = weakref.WeakKeyDictionary()
+
         # Set the colormap
         self._cmap = get_colormap(cmap)
 
@@ -425,6 +633,11 @@ class VolumeVisual(Visual):
             ], dtype=np.float32))
         self._tex = tex_cls((10, 10, 10), interpolation='linear', 
                             wrapping='clamp_to_edge')
+        if self._skip_empty:
+            self._grid = Texture3D((1, 1, 1), interpolation='nearest',
+                                   wrapping='clamp_to_edge',
+                                   internalformat='r32f')
+            self._grid_fun['grid'] = self._grid
 
         # Create program
         Visual.__init__(self, vcode=VERT_SHADER, fcode="")
@@ -445,7 +658,11 @@ class VolumeVisual(Visual):
         # Set params
         self.method = method
         self.relative_step_size = relative_step_size
-        self.threshold = threshold if (threshold is not None) else vol.mean()
+        self.interactive_step_size = interactive_step_size
+        if threshold is None:
+            self._threshold_mean = float(self._threshold_sample(vol).mean())
+        else:
+            self.threshold = threshold
         self.freeze()
     
     def set_data(self, vol, clim=None):
@@ -461,47 +678,137 @@ class VolumeVisual(Visual):
         # Check volume
         if not isinstance(vol, np.ndarray):
             raise ValueError('Volume visual needs a numpy array.')
-        if not ((vol.ndim == 3) or (vol.ndim == 4 and vol.shape[-1] <= 4)):
+        self._check_shape(vol.shape)
+        self._set_clim(vol, clim)
+
+        # Upload in the native dtype when possible, clim is applied in the
+        # shader
+        dtype, internalformat = self._texture_format_for(vol)
+        vol = vol.astype(dtype, copy=False)
+        self._tex.resize(vol.shape[:3] + (self._n_channels_of(vol),),
+                         internalformat=internalformat)
+        self._tex.set_data(vol)  # will be efficient if vol is same shape
+        self._set_volume_shape(vol.shape, self._tex.glsl_sample)
+        self._set_grid(self._make_grid(vol))
+
+        # Get some stats
+        self._kb_for_texture = vol.nbytes / 1024
+        self.update()
+
+    def _threshold_sample(self, vol):
+        """The values whose mean is the default threshold"""
+        return _subsample(vol)
+
+    @staticmethod
+    def _check_shape(shape):
+        if not ((len(shape) == 3) or (len(shape) == 4 and shape[-1] <= 4)):
             raise ValueError('Volume visual needs a 3D image.')
-        
-        # Handle clim
+
+    @staticmethod
+    def _n_channels_of(vol):
+        return 1 if len(vol.shape) == 3 else vol.shape[3]
+
+    def _set_clim(self, vol, clim):
         if clim is not None:
             clim = np.array(clim, float)
             if not (clim.ndim == 1 and clim.size == 2):
                 raise ValueError('clim must be a 2-element array-like')
             self._clim = tuple(clim)
-        if self._clim is None:
-            self._clim = vol.min(), vol.max()
-        
-        # Apply clim
-        vol = np.array(vol, dtype='float32', copy=False)
-        if self._clim[1] == self._clim[0]:
-            if self._clim[0] != 0.:
-                vol *= 1.0 / self._clim[0]
+            self._clim_source = None
+        elif self._clim is None:
+            # Estimated from a subsample when needed
+            self._clim_source = vol
+        self._need_clim_update = True
+
+    def _texture_format_for(self, vol):
+        """The dtype in which *vol* is uploaded and the texture internal
+        format
+        """
+        dtype = vol.dtype
+        if dtype not in _dtype_formats:
+            dtype = np.dtype(np.float32)
+        scale, suffix = _dtype_formats[dtype]
+        base = ('r', 'rg', 'rgb', 'rgba')[self._n_channels_of(vol) - 1]
+        if self._texture_format is not None:
+            internalformat = base + self._texture_format.lstrip('rgba')
+        elif dtype == np.uint8:
+            internalformat = None  # 8-bit luminance / rgb(a)
         else:
-            vol -= self._clim[0]
-            vol /= self._clim[1] - self._clim[0]
-        
-        # Apply to texture
-        self._tex.set_data(vol)  # will be efficient if vol is same shape
-        self.shared_program['u_shape'] = (vol.shape[2], vol.shape[1], 
-                                          vol.shape[0])
-        
-        shape = vol.shape[:3]
+            internalformat = base + suffix
+        self._texture_scale = scale
+        return dtype, internalformat
+
+    def _set_volume_shape(self, shape, texture_sample):
+        """Update the program for a volume of the given shape, whose
+        values are sampled with the GLSL function *texture_sample*
+        """
+        self.shared_program['u_shape'] = (shape[2], shape[1], shape[0])
+        n_channels = 1 if len(shape) == 3 else shape[3]
+        if n_channels != self._n_channels:
+            self._n_channels = n_channels
+            code = _SAMPLE_MONO if n_channels == 1 else _SAMPLE_MULTI
+            self._sample_fun = Function(code % self._tex.glsl_sampler_type)
+            self._need_clim_update = True
+            if self._method is not None:
+                self.shared_program.frag['sample'] = self._sample_fun
+        self._sample_fun['texture_sample'] = texture_sample
+
+        shape = tuple(shape[:3])
         if self._vol_shape != shape:
             self._vol_shape = shape
             self._need_vertex_update = True
-        self._vol_shape = shape
-        
-        # Get some stats
-        self._kb_for_texture = np.prod(self._vol_shape) / 1024
-    
+
+    def _make_grid(self, vol):
+        """The acceleration grid of *vol*, or None if empty space skipping
+        is not used
+        """
+        if not (self._skip_empty and self._n_channels_of(vol) == 1):
+            return None
+        grid = _cell_max(vol).astype(np.float32)
+        grid /= self._texture_scale
+        return grid
+
+    def _set_grid(self, grid):
+        """Upload the acceleration *grid* (or None) of the volume"""
+        if grid is not None:
+            self._grid.set_data(grid)
+            shape = np.array(self._vol_shape[::-1], float)
+            self._grid_fun['cells'] = tuple(shape / _GRID_CELL)
+            self._grid_fun['grid_shape'] = tuple(map(float, grid.shape[2::-1]))
+            skip_fun = self._grid_fun
+        else:
+            skip_fun = self._no_skip_fun
+        if skip_fun is not self._skip_fun:
+            self._skip_fun = skip_fun
+            self._need_clim_update = True
+            if self._method is not None:
+                self.shared_program.frag['skip_empty'] = skip_fun
+                self._update_empty_level()
+
     @property
     def clim(self):
         """ The contrast limits that were applied to the volume data.
         Settable via set_data().
         """
+        if self._clim_source is not None:
+            sub = _subsample(self._clim_source)
+            self._clim = sub.min(), sub.max()
+            self._clim_source = None
         return self._clim
+
+    def _build_clim(self):
+        cmin, cmax = self.clim
+        cmin = float(cmin) / self._texture_scale
+        cmax = float(cmax) / self._texture_scale
+        self._sample_fun['cmin'] = cmin
+        self._sample_fun['cmax'] = cmax
+        if self._skip_fun is self._grid_fun:
+            self._grid_fun['cmin'] = cmin
+            self._grid_fun['cmax'] = cmax
+        if self._method == 'iso':
+            # the default threshold follows clim
+            self.shared_program['u_threshold'] = self.threshold
+        self._need_clim_update = False
     
     @property
     def cmap(self):
@@ -511,6 +818,7 @@ class VolumeVisual(Visual):
     def cmap(self, cmap):
         self._cmap = get_colormap(cmap)
         self.shared_program.frag['cmap'] = Function(self._cmap.glsl_map)
+        self._update_empty_level()
         self.update()
 
     @property
@@ -545,21 +853,33 @@ class VolumeVisual(Visual):
 
         self.shared_program.frag = frag_dict[method]
         self.shared_program.frag['sampler_type'] = self._tex.glsl_sampler_type
-        self.shared_program.frag['sample'] = self._tex.glsl_sample
+        self.shared_program.frag['sample'] = self._sample_fun
         self.shared_program.frag['cmap'] = Function(self._cmap.glsl_map)
+        self.shared_program.frag['skip_empty'] = self._skip_fun
+        self._update_empty_level()
+        # u_threshold is set with clim
+        self._need_clim_update = True
         self.update()
+
+    def _update_empty_level(self):
+        if (self._skip_fun is self._grid_fun and
+                self._method in ('translucent', 'additive')):
+            self.shared_program['u_empty_level'] = _empty_level(
+                self._cmap, self._method)
     
     @property
     def threshold(self):
-        """ The threshold value to apply for the isosurface render method.
+        """ The threshold value to apply for the isosurface render method,
+        in units of the contrast limits (0 at clim[0] and 1 at clim[1]).
         """
+        if self._threshold is None:
+            return _normalize(self._threshold_mean, self.clim)
         return self._threshold
     
     @threshold.setter
     def threshold(self, value):
         self._threshold = float(value)
-        if 'u_threshold' in self.shared_program:
-            self.shared_program['u_threshold'] = self._threshold
+        self._need_clim_update = True
         self.update()
     
     @property
@@ -579,7 +899,91 @@ class VolumeVisual(Visual):
         if value < 0.1:
             raise ValueError('relative_step_size cannot be smaller than 0.1')
         self._relative_step_size = value
+        self._set_step_size(value)
+        self.update()
+
+    @property
+    def interactive_step_size(self):
+        """ The relative step size used while the view changes.
+
+        While the camera moves (or the volume is transformed), the volume
+        is rendered with this larger step size, to keep interaction
+        responsive on large volumes. Once the view does not change for
+        `refine_delay` seconds, the volume is drawn again with the step
+        size halved at every frame, until it is `relative_step_size`.
+        None disables the interactive quality.
+
+        Each view of the visual (see `view`) is refined on its own. A scene
+        node drawn in several places, e.g. with several parents, is one
+        view whose position changes at every draw, so it stays at the
+        interactive quality.
+        """
+        return self._interactive_step_size
+
+    @interactive_step_size.setter
+    def interactive_step_size(self, value):
+        if value is not None:
+            value = float(value)
+            if value < self._relative_step_size:
+                raise ValueError('interactive_step_size cannot be smaller '
+                                 'than relative_step_size')
+        self._interactive_step_size = value
+        self._view_states.clear()
+        self._set_step_size(self._relative_step_size)
+        self.update()
+
+    # Time without changes of the view after which the quality is refined
+    refine_delay = 0.2
+
+    def _set_step_size(self, value):
+        # Sets the step size of all the views
+        self._step_size = value
         self.shared_program['u_relative_step_size'] = value
+
+    def _update_step_size(self, view):
+        """Choose the step size of *view* according to its changes"""
+        state = self._view_states.get(view)
+        if state is None:
+            state = self._view_states[view] = dict(
+                key=None, step=self._relative_step_size, refine_time=0.,
+                timer=None)
+
+        # The view changed if the volume is not drawn at the same place
+        shape = np.array(self._vol_shape[::-1], float)
+        corners = np.array([[i & 1, i & 2, i & 4] for i in range(8)], bool)
+        tr = view.transforms.get_transform('visual', 'render')
+        key = tr.map(np.where(corners, shape - 0.5, -0.5))
+        moved = state['key'] is not None and not (
+            key.shape == state['key'].shape and
+            np.array_equal(key, state['key']))
+        state['key'] = key
+
+        now = default_timer()
+        if moved:
+            state['step'] = max(self._interactive_step_size,
+                                self._relative_step_size)
+            state['refine_time'] = now + self.refine_delay
+            self._refine_later(view, state, self.refine_delay)
+        elif now < state['refine_time']:
+            # Drawn before the delay, e.g. if the timer fired early
+            self._refine_later(view, state, state['refine_time'] - now)
+        else:
+            # Refine progressively, drawing again until full quality
+            state['step'] = max(state['step'] / 2.,
+                                self._relative_step_size)
+            if state['step'] > self._relative_step_size:
+                view.update()
+        self._step_size = state['step']
+        view.view_program['u_relative_step_size'] = state['step']
+
+    def _refine_later(self, view, state, delay):
+        """Draw *view* again after *delay* seconds, once it stops
+        changing"""
+        if state['timer'] is None:
+            from ..app import Timer
+            state['timer'] = Timer(connect=_update_callback(weakref.ref(view)))
+        state['timer'].stop()
+        state['timer'].start(delay, iterations=1)
     
     def _create_vertex_data(self):
         """ Create and set positions and texture coords from the given shape
@@ -638,5 +1042,11 @@ class VolumeVisual(Visual):
         view.view_program.vert['viewtransformi'] = view_tr_i
 
     def _prepare_draw(self, view):
+        if self._interactive_step_size is not None:
+            self._update_step_size(view)
+
+        if self._need_clim_update:
+            self._build_clim()
+
         if self._need_vertex_update:
             self._create_vertex_data()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Playback of time series of volumes.
+
+The timepoints following the displayed one (in the direction of playback)
+are read, converted to the texture dtype and given their empty space
+skipping grid in background threads, and uploaded into a ring of 3D
+textures. Advancing to a timepoint that is in the ring only switches the
+texture that is sampled, so playback and scrubbing are not slowed down by
+the conversion and upload of the volumes as long as these keep up with the
+frame rate.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+from ..gloo import Texture3D
+from ..ext.six import reraise
+from .volume import VolumeVisual, _subsample
+from .tiled_image import _TileLoader
+
+
+def _read_timepoint(data, index, dtype, make_grid):
+    """Read and convert a timepoint, and compute its acceleration grid"""
+    vol = np.ascontiguousarray(data[index], dtype=dtype)
+    return vol, make_grid(vol)
+
+
+class VolumeSeriesVisual(VolumeVisual):
+    """Displays a time series of 3D volumes
+
+    Parameters
+    ----------
+    data : array-like | list of array-like
+        The volumes, as a 4D (t, z, y, x) or 5D (t, z, y, x, channels)
+        array, which can be a memory-mapped array, or a list of 3D (or 4D)
+        arrays of the same shape and dtype.
+    clim : tuple of two floats | None
+        The contrast limits, shared by all timepoints. By default (None),
+        they are estimated from the timepoint displayed first.
+    method : {'mip', 'translucent', 'additive', 'iso'}
+        The render method to use. Default 'mip'.
+    threshold : float | None
+        The threshold to use for the isosurface render method, in units of
+        the contrast limits. By default (None) the mean of the timepoint
+        displayed first is used.
+    relative_step_size : float
+        The relative step size to step through the volume. Default 0.8.
+    cmap : str
+        Colormap to use.
+    index : int
+        The timepoint to display first. Default 0.
+    ring_size : int
+        Number of timepoints kept on the GPU: the displayed one and the
+        ones following it. Default 4.
+    n_workers : int
+        Number of threads reading the timepoints. Default 1.
+    async_load : bool
+        If True (default), timepoints that are not in the ring are read in
+        background threads, and the previously displayed timepoint is drawn
+        until they are available. If False, they are read when drawing.
+    texture_format : str | None
+        Internal format of the textures. See `VolumeVisual`.
+    empty_space_skipping : bool
+        Whether to skip empty regions while raycasting. Default True.
+
+    Notes
+    -----
+    Requires 3D textures, i.e. desktop OpenGL. The ring takes ``ring_size``
+    times the GPU memory of a single volume.
+
+    At most one prefetched timepoint is uploaded per draw, besides the
+    displayed one, to keep the duration of the frames even.
+    """
+
+    def __init__(self, data, clim=None, method='mip', threshold=None,
+                 relative_step_size=0.8, cmap='grays', index=0, ring_size=4,
+                 n_workers=1, async_load=True, texture_format=None,
+                 empty_space_skipping=True):
+        ring_size = int(ring_size)
+        if ring_size < 1:
+            raise ValueError('ring_size must be at least 1')
+        self._ring = [Texture3D((1, 1, 1), interpolation='linear',
+                                wrapping='clamp_to_edge')
+                      for i in range(ring_size)]
+        self._async_load = bool(async_load)
+        self._loader = _TileLoader(int(n_workers))
+        self._data = None
+        self._dtype = None
+        self._generation = 0
+        self._index = int(index)
+        self._direction = 1
+        self._displayed = None
+        self._slots = {}  # timepoint -> (slot, grid)
+        self._loaded = {}  # timepoint -> (vol, grid), waiting for upload
+
+        VolumeVisual.__init__(self, data, clim=clim, method=method,
+                              threshold=threshold,
+                              relative_step_size=relative_step_size,
+                              cmap=cmap, texture_format=texture_format,
+                              empty_space_skipping=empty_space_skipping)
+
+    def _threshold_sample(self, vol):
+        return _subsample(self._data[self._index])
+
+    def set_data(self, data, clim=None):
+        """ Set the volumes.
+
+        The displayed timepoint is read and uploaded immediately, and the
+        following ones are prefetched.
+
+        Parameters
+        ----------
+        data : array-like | list of array-like
+            The volumes, see the class documentation.
+        clim : tuple | None
+            Colormap limits to use. None will estimate the min and max
+            values from the displayed timepoint.
+        """
+        if len(data) == 0:
+            raise ValueError('data must contain at least one timepoint')
+        first = data[0]
+        self._check_shape(first.shape)
+        self._data = data
+        self._index = min(max(self._index, 0), len(data) - 1)
+        self._set_clim(data[self._index], clim)
+        self._dtype, internalformat = self._texture_format_for(first)
+
+        shape = first.shape[:3] + (self._n_channels_of(first),)
+        for tex in self._ring:
+            tex.resize(shape, internalformat=internalformat)
+        self._tex = self._ring[0]
+        self.shared_program['u_volumetex'] = self._tex
+        self._generation += 1
+        self._slots.clear()
+        self._loaded.clear()
+        self._displayed = None
+        self._loader.request([])
+        self._loader.results()
+
+        self._set_volume_shape(first.shape, self._tex.glsl_sample)
+        self._show(self._index, self._load_func(self._index)[1]())
+        self._request()
+        self._kb_for_texture = (len(self._ring) * np.prod(shape) *
+                                self._dtype.itemsize / 1024)
+        self.update()
+
+    @property
+    def n_timepoints(self):
+        """The number of timepoints"""
+        return len(self._data)
+
+    @property
+    def index(self):
+        """The timepoint to display
+
+        If it is not in the ring of textures and `async_load` is True,
+        the previously displayed timepoint is drawn until it is loaded.
+        """
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        index = int(index)
+        if not 0 <= index < len(self._data):
+            raise IndexError('index %d out of range for %d timepoints'
+                             % (index, len(self._data)))
+        if index != self._index:
+            # Prefetch backward when scrubbing backward, and forward when
+            # looping back to the first timepoint
+            n = len(self._data)
+            self._direction = 1 if (index - self._index) % n <= n // 2 else -1
+            self._index = index
+            self._request()
+            self.update()
+
+    @property
+    def displayed_index(self):
+        """The timepoint drawn by the last draw"""
+        return self._displayed
+
+    @property
+    def ring_size(self):
+        """The number of timepoints kept on the GPU"""
+        return len(self._ring)
+
+    def wait(self, timeout=None):
+        """Wait for the timepoints being read in the background
+
+        They are uploaded on the next draws.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Maximum time to wait, in seconds.
+        """
+        self._loader.wait(timeout)
+
+    # -------------------------------------------------------------- ring ---
+    def _window(self):
+        """The timepoints to keep in the ring, most urgent first"""
+        n = len(self._data)
+        window = [(self._index + self._direction * i) % n
+                  for i in range(min(len(self._ring), n))]
+        return window
+
+    def _load_func(self, index):
+        data, dtype, make_grid = self._data, self._dtype, self._make_grid
+        return ((self._generation, index),
+                lambda: _read_timepoint(data, index, dtype, make_grid))
+
+    def _request(self):
+        """Request the timepoints of the window that are not loaded yet"""
+        self._loader.request([self._load_func(i) for i in self._window()
+                              if i not in self._slots and
+                              i not in self._loaded])
+
+    def _store(self, index, loaded):
+        """Upload a timepoint into the slot of a timepoint that is no longer
+        needed
+        """
+        window = self._window()
+        if index not in window or index in self._slots:
+            return
+        used = dict((slot, i) for i, (slot, grid) in self._slots.items())
+        for slot in range(len(self._ring)):
+            if slot not in used:
+                break
+        else:
+            # The slot of a timepoint that is no longer needed, keeping the
+            # displayed one until the requested one replaces it
+            stale = [i for i in self._slots if i not in window and
+                     (i != self._displayed or index == self._index)]
+            if not stale:
+                return
+            slot = self._slots.pop(stale[0])[0]
+        vol, grid = loaded
+        self._ring[slot].set_data(vol)
+        self._slots[index] = (slot, grid)
+
+    def _show(self, index, loaded=None):
+        """Switch to the texture of a timepoint, uploading it if given"""
+        if loaded is not None:
+            self._store(index, loaded)
+        slot, grid = self._slots[index]
+        self._tex = self._ring[slot]
+        self.shared_program['u_volumetex'] = self._tex
+        self._set_grid(grid)
+        self._displayed = index
+
+    def _update_ring(self):
+        """Collect the timepoints read since the last draw, upload them and
+        switch to the displayed one
+        """
+        for key, loaded, error in self._loader.results():
+            if error is not None:
+                reraise(*error)
+            if key[0] == self._generation:
+                self._loaded[key[1]] = loaded
+        window = self._window()
+        for index in list(self._loaded):
+            if index not in window or index in self._slots:
+                del self._loaded[index]
+
+        index = self._index
+        if index not in self._slots and index not in self._loaded and \
+                not self._async_load:
+            self._loaded[index] = self._load_func(index)[1]()
+        if index in self._loaded:
+            self._store(index, self._loaded.pop(index))
+        # Upload one prefetched timepoint per draw
+        for i in window:
+            if i in self._loaded:
+                self._store(i, self._loaded.pop(i))
+                break
+        if index in self._slots and index != self._displayed:
+            self._show(index)
+
+        if self._loaded or self._loader.busy:
+            # Draw again to upload the next timepoints
+            self.update()
+
+    def _prepare_draw(self, view):
+        self._update_ring()
+        return VolumeVisual._prepare_draw(self, view)